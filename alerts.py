@@ -0,0 +1,228 @@
+"""Vectorized weather alert evaluation.
+
+Active rules from weather_alerts are loaded once into columnar NumPy arrays
+grouped by the owner's location: one (n_rules, n_metrics) threshold matrix
+per location plus per-rule state. Each update cycle compares a location's
+new reading against all of its rules in a single broadcast comparison, so
+the per-cycle cost is a few array operations per location however many
+alerts exist.
+
+A rule fires when any of its thresholds is reached (value >= threshold).
+It then stays quiet until every metric has dropped at least HYSTERESIS
+below its threshold (so readings hovering around a threshold do not flap),
+and it never fires again within `cooldown` seconds of the last time.
+"""
+import threading
+import time
+
+import numpy as np
+
+# trigger_conditions keys evaluated against readings
+METRICS = ['temperature', 'wind_speed', 'precipitation']
+
+# How far below the threshold a metric must fall before the rule re-arms
+HYSTERESIS = np.array([1.0, 5.0, 1.0])
+
+ACTIVE_RULES_SQL = f'''
+    SELECT wa.alert_id, wa.user_id, u.location, wa.alert_type, wa.severity, wa.message,
+           {', '.join(f"json_extract(wa.trigger_conditions, '$.{metric}')" for metric in METRICS)}
+    FROM weather_alerts wa
+    JOIN users u ON u.user_id = wa.user_id
+    WHERE wa.is_active = 1 AND wa.alert_id > ?
+'''
+
+
+class RuleSet:
+    """Active rules of one location, ordered by alert_id"""
+
+    def __init__(self, alert_ids, user_ids, thresholds, details):
+        self.alert_ids = alert_ids
+        self.user_ids = user_ids
+        self.thresholds = thresholds      # (n, len(METRICS)) float64, NaN = no condition
+        self.details = details            # object array of (alert_type, severity, message)
+        self.firing = np.zeros(len(alert_ids), dtype=bool)
+        self.last_fired = np.full(len(alert_ids), -np.inf)
+
+    def extend(self, other):
+        """Append rules with higher alert_ids (newly added alerts)"""
+        self.alert_ids = np.concatenate([self.alert_ids, other.alert_ids])
+        self.user_ids = np.concatenate([self.user_ids, other.user_ids])
+        self.thresholds = np.concatenate([self.thresholds, other.thresholds])
+        self.details = np.concatenate([self.details, other.details])
+        self.firing = np.concatenate([self.firing, other.firing])
+        self.last_fired = np.concatenate([self.last_fired, other.last_fired])
+
+    def carry_state(self, previous):
+        """Keep firing/cooldown state of rules that were already loaded"""
+        if previous is None or not len(previous.alert_ids):
+            return
+        pos = np.searchsorted(previous.alert_ids, self.alert_ids)
+        pos = np.minimum(pos, len(previous.alert_ids) - 1)
+        known = previous.alert_ids[pos] == self.alert_ids
+        self.firing[known] = previous.firing[pos[known]]
+        self.last_fired[known] = previous.last_fired[pos[known]]
+
+    def evaluate(self, values, now, cooldown):
+        """Indices of rules that fire for this reading"""
+        thresholds = self.thresholds
+        # NaN on either side compares False, so missing conditions and readings never trip
+        tripped = (values >= thresholds).any(axis=1)
+        armed = ~(values >= thresholds - HYSTERESIS).any(axis=1)
+
+        fire = tripped & ~self.firing & (now - self.last_fired >= cooldown)
+        self.firing = np.where(self.firing, ~armed, fire)
+        self.last_fired[fire] = now
+        return np.flatnonzero(fire)
+
+
+def load_rule_sets(conn, after_alert_id=0):
+    """{location: RuleSet} for every active alert with alert_id > after_alert_id"""
+    rows = conn.execute(ACTIVE_RULES_SQL, (after_alert_id,)).fetchall()
+    if not rows:
+        return {}
+
+    columns = list(zip(*rows))
+    alert_ids = np.array(columns[0], dtype=np.int64)
+    user_ids = np.array(columns[1], dtype=np.int64)
+    locations = np.array(columns[2], dtype=object)
+    details = np.empty(len(rows), dtype=object)
+    details[:] = list(zip(columns[3], columns[4], columns[5]))
+    # None (condition not set) becomes NaN
+    thresholds = np.array(columns[6:], dtype=np.float64).T
+
+    names, codes = np.unique(locations.astype(str), return_inverse=True)
+    order = np.lexsort((alert_ids, codes))
+    bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+
+    rule_sets = {}
+    for i, location in enumerate(names):
+        index = order[bounds[i]:bounds[i + 1]]
+        rule_sets[location] = RuleSet(alert_ids[index], user_ids[index],
+                                      np.ascontiguousarray(thresholds[index]), details[index])
+    return rule_sets
+
+
+def reading_values(reading):
+    return np.array([reading.get(metric) for metric in METRICS], dtype=np.float64)
+
+
+class AlertEngine:
+    def __init__(self, connect, cooldown=900.0, max_age=3600.0):
+        self.connect = connect
+        self.cooldown = cooldown
+        self.max_age = max_age  # full reload interval; picks up deactivated alerts
+        self._rules = {}
+        self._max_alert_id = 0
+        self._loaded_at = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+        self.rules_loaded = 0
+        self.evaluations = 0
+        self.triggered = 0
+        self.last_load_seconds = 0.0
+        self.last_evaluate_seconds = 0.0
+
+    def invalidate(self):
+        """Load newly added alerts before the next evaluation"""
+        self._dirty = True
+
+    def _load(self, after_alert_id):
+        conn = self.connect()
+        if conn is None:
+            return None
+        try:
+            return load_rule_sets(conn, after_alert_id)
+        finally:
+            conn.close()
+
+    def reload(self):
+        """Reload every active rule, keeping the state of rules that stay active"""
+        start = time.perf_counter()
+        self._dirty = False
+        rule_sets = self._load(0)
+        if rule_sets is None:
+            return False
+        with self._lock:
+            for location, rules in rule_sets.items():
+                rules.carry_state(self._rules.get(location))
+            self._rules = rule_sets
+            self._loaded_at = time.monotonic()
+            self._update_counts()
+        self.last_load_seconds = time.perf_counter() - start
+        return True
+
+    def load_new(self):
+        """Append alerts added since the last load, without rereading the others"""
+        start = time.perf_counter()
+        self._dirty = False
+        rule_sets = self._load(self._max_alert_id)
+        if rule_sets is None:
+            self._dirty = True
+            return False
+        with self._lock:
+            for location, rules in rule_sets.items():
+                if location in self._rules:
+                    self._rules[location].extend(rules)
+                else:
+                    self._rules[location] = rules
+            self._update_counts()
+        self.last_load_seconds = time.perf_counter() - start
+        return True
+
+    def _update_counts(self):
+        self.rules_loaded = sum(len(rules.alert_ids) for rules in self._rules.values())
+        self._max_alert_id = max((int(rules.alert_ids[-1]) for rules in self._rules.values()
+                                  if len(rules.alert_ids)), default=self._max_alert_id)
+
+    def evaluate(self, locations, readings, now=None):
+        """Alerts fired by one reading per location, as event payloads"""
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.max_age:
+            self.reload()
+        elif self._dirty:
+            self.load_new()
+        now = time.time() if now is None else now
+        start = time.perf_counter()
+        fired = []
+        with self._lock:
+            for location, reading in zip(locations, readings):
+                rules = self._rules.get(location)
+                if rules is None or reading is None:
+                    continue
+                values = reading_values(reading)
+                indices = rules.evaluate(values, now, self.cooldown)
+                if not len(indices):
+                    continue
+                over = values >= rules.thresholds[indices]
+                for i, exceeded_mask in zip(indices, over):
+                    alert_type, severity, message = rules.details[i]
+                    exceeded = [metric for metric, hit in zip(METRICS, exceeded_mask) if hit]
+                    fired.append({
+                        'alert_id': int(rules.alert_ids[i]),
+                        'user_id': int(rules.user_ids[i]),
+                        'location': location,
+                        'alert_type': alert_type,
+                        'severity': severity,
+                        'message': message,
+                        'exceeded': exceeded,
+                        'reading': {metric: reading.get(metric) for metric in METRICS},
+                    })
+        self.evaluations += 1
+        self.triggered += len(fired)
+        self.last_evaluate_seconds = time.perf_counter() - start
+        return fired
+
+    def stats(self):
+        with self._lock:
+            firing = sum(int(rules.firing.sum()) for rules in self._rules.values())
+            locations = len(self._rules)
+        return {
+            'rules_loaded': self.rules_loaded,
+            'locations': locations,
+            'firing': firing,
+            'evaluations': self.evaluations,
+            'triggered': self.triggered,
+            'cooldown_seconds': self.cooldown,
+            'last_load_ms': round(self.last_load_seconds * 1000, 2),
+            'last_evaluate_ms': round(self.last_evaluate_seconds * 1000, 2),
+        }
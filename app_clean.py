@@ -1,21 +1,39 @@
 from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import sqlite3
 import json
+import copy
 from datetime import datetime, timedelta
-import requests
 import threading
 import time
+from apscheduler.jobstores.base import JobLookupError
 from apscheduler.schedulers.background import BackgroundScheduler
 import numpy as np
-import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-import joblib
 import os
+import socket
 import atexit
+import hmac
 from dotenv import load_dotenv
+from features import FEATURE_COLUMNS, build_features, build_prediction_features
+from history_loader import WEATHER_DTYPE, load_weather_arrays
+from model_registry import ModelRegistry
+from weather_client import WeatherClient
+from weather_cache import WeatherCache
+from db import DB_PATH, ConnectionPool
+from ingestion import WriteBehindQueue
+from counters import DashboardCounters
+from alerts import AlertEngine
+from poller import AdaptivePoller, SharedTokenBucket, TokenBucket
+from realtime import LocationFeed, SubscriptionRegistry, clean_locations, room_for
+from cluster import ClusterBus, ClusterWatch, LeaderLease, make_client_manager
+from codec import (FIELDS, JSON, MSGPACK, EncodingRegistry, available_encodings, encode,
+                   encoding_room, negotiate)
+from metrics import CONTENT_TYPE, MetricsRegistry, QueryTimer, instrument_scheduler
+from migrations import check_query_plans, migrate
+from profiling import SamplingProfiler, SlowQueryLog
+from rollups import prune_raw_weather, refresh_rollups, weather_history
+import queries
+from training import TrainingExecutor, fit_full, fit_increment, merge_trees, run_inline
 
 # Load environment variables
 load_dotenv()
@@ -24,25 +42,150 @@ load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'smart_weather_ai_2024')
-socketio = SocketIO(app, async_mode='threading', cors_allowed_origins="*")
+
+# Multi-worker mode (cluster.py, run-production.py): emits and cluster
+# messages go through a message queue so they reach every worker's clients
+SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+WORKER_ID = os.environ.get('WORKER_ID', f'{socket.gethostname()}:{os.getpid()}')
+LEADER_LEASE_TTL = float(os.environ.get('LEADER_LEASE_TTL', 15))
+cluster_bus = ClusterBus()
+socketio_options = {}
+if SOCKETIO_MESSAGE_QUEUE:
+    socketio_options['client_manager'] = cluster_bus.attach(make_client_manager(SOCKETIO_MESSAGE_QUEUE))
+socketio = SocketIO(app, async_mode='threading', cors_allowed_origins="*", **socketio_options)
 
 # Configuration
 OPENWEATHER_API_KEY = os.environ.get('OPENWEATHER_API_KEY', 'demo_key')
-OPENWEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+OPENWEATHER_URL = os.environ.get('OPENWEATHER_URL', "https://api.openweathermap.org/data/2.5/weather")
+WEATHER_FETCH_CONCURRENCY = int(os.environ.get('WEATHER_FETCH_CONCURRENCY', 16))
+WEATHER_FETCH_DEADLINE = float(os.environ.get('WEATHER_FETCH_DEADLINE', 15))
+WEATHER_CACHE_TTL = float(os.environ.get('WEATHER_CACHE_TTL', 60))
+# Upstream calls per minute allowed by the OpenWeatherMap plan (free plan: 60)
+OPENWEATHER_CALLS_PER_MINUTE = float(os.environ.get('OPENWEATHER_CALLS_PER_MINUTE', 60))
+# Per-location polling intervals adapt between these bounds (seconds)
+POLL_MIN_INTERVAL = float(os.environ.get('POLL_MIN_INTERVAL', 60))
+POLL_MAX_INTERVAL = float(os.environ.get('POLL_MAX_INTERVAL', 1800))
+POLL_WATCHED_MAX_INTERVAL = float(os.environ.get('POLL_WATCHED_MAX_INTERVAL', 300))
+POLL_TICK = float(os.environ.get('POLL_TICK', 10))
+
+# Prometheus metrics, served on /metrics
+metrics_registry = MetricsRegistry()
+fetch_seconds = metrics_registry.histogram(
+    'weather_fetch_seconds', 'fetch_live_weather latency (cache or upstream)', ['call'])
+query_seconds = metrics_registry.histogram(
+    'db_query_seconds', 'SQLite statement time by named query', ['query'])
+train_seconds = metrics_registry.histogram(
+    'model_train_seconds', 'Model training duration', ['mode'])
+predict_seconds = metrics_registry.histogram(
+    'model_predict_seconds', 'Duration of one batched prediction call')
+job_lag_seconds = metrics_registry.histogram(
+    'scheduler_job_lag_seconds', 'Delay between a job\'s scheduled and actual start', ['job'])
+job_run_seconds = metrics_registry.histogram(
+    'scheduler_job_run_seconds', 'Scheduler job run time', ['job'])
+job_errors = metrics_registry.counter(
+    'scheduler_job_errors', 'Scheduler jobs that raised', ['job'])
+emit_seconds = metrics_registry.histogram(
+    'socketio_emit_seconds', 'Time to encode and fan out one broadcast', ['event'])
+
+# Database
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 16))
+db_pool = ConnectionPool(DB_PATH, size=DB_POOL_SIZE)
+
+weather_client = WeatherClient(OPENWEATHER_API_KEY, OPENWEATHER_URL,
+                               max_concurrency=WEATHER_FETCH_CONCURRENCY,
+                               deadline=WEATHER_FETCH_DEADLINE)
+# Every upstream call, scheduled or on demand, is charged to this budget and
+# refused once it is spent; with several workers the budget lives in the
+# database so together they stay within the plan
+if SOCKETIO_MESSAGE_QUEUE:
+    upstream_budget = SharedTokenBucket(db_pool.connect, OPENWEATHER_CALLS_PER_MINUTE)
+else:
+    upstream_budget = TokenBucket(OPENWEATHER_CALLS_PER_MINUTE)
+# Shared by socket handlers and the scheduler so viewers of the same location
+# cost one upstream call per TTL
+weather_cache = WeatherCache(weather_client, ttl=WEATHER_CACHE_TTL, budget=upstream_budget)
+weather_poller = AdaptivePoller(min_interval=POLL_MIN_INTERVAL, max_interval=POLL_MAX_INTERVAL,
+                                watched_max_interval=POLL_WATCHED_MAX_INTERVAL)
+
+INGEST_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE', 500))
+INGEST_FLUSH_INTERVAL = float(os.environ.get('INGEST_FLUSH_INTERVAL', 2.0))
+# Raw readings older than this are deleted once rolled up; hourly rollups
+# are kept longer and daily rollups forever
+WEATHER_RAW_RETENTION_DAYS = int(os.environ.get('WEATHER_RAW_RETENTION_DAYS', 30))
+WEATHER_HOURLY_RETENTION_DAYS = int(os.environ.get('WEATHER_HOURLY_RETENTION_DAYS', 365))
+# Dashboard totals are cached in memory at most this long (local writes invalidate immediately)
+COUNTERS_MAX_AGE = float(os.environ.get('COUNTERS_MAX_AGE', 30))
+# An alert that fired stays silent at least this long, even if it re-arms
+ALERT_COOLDOWN = float(os.environ.get('ALERT_COOLDOWN', 900))
+# Statements slower than SLOW_QUERY_MS are logged with their caller (toggle at /api/admin/slow-queries)
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', 'true').lower() in ('1', 'true', 'yes')
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+# Required as X-Admin-Token on /api/admin/*; without it those endpoints stay disabled
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+# /users and /api/users page sizes
+USERS_PAGE_SIZE = 50
+USERS_MAX_PAGE_SIZE = 200
 
 # AI Model Storage
+MODEL_REGISTRY_PATH = 'models/registry'
+MODEL_KEEP_VERSIONS = 5
+# Pre-registry artifacts, still loaded when no registry version exists
 MODEL_PATH = 'models/weather_model.joblib'
 SCALER_PATH = 'models/scaler.joblib'
 
+# Model parameters
+MODEL_N_ESTIMATORS = 50
+MODEL_MAX_DEPTH = 10
+
+# Incremental training: each run grows the forest by a few trees fitted on
+# the readings that arrived since the last checkpoint. The trees of the last
+# full fit are kept; the oldest incremental trees are dropped once the forest
+# reaches MAX_TREES. A full refit replaces everything every FULL_REFIT_HOURS.
+INCREMENTAL_TREES = 5
+MAX_TREES = 100
+MIN_INCREMENT_SAMPLES = 10
+FULL_REFIT_HOURS = 24
+
 # Create models directory
 os.makedirs('models', exist_ok=True)
+model_registry = ModelRegistry(MODEL_REGISTRY_PATH, keep_versions=MODEL_KEEP_VERSIONS)
 
 class WeatherAI:
     def __init__(self):
-        self.model = RandomForestRegressor(n_estimators=50, random_state=42, max_depth=10)
-        self.scaler = StandardScaler()
+        # (model, scaler) swapped in as one tuple so predictions never see a
+        # model paired with another training run's scaler
+        self._active = (None, None)
         self.is_trained = False
         self.training_data_points = 0
+        # Watermark of what has been trained: highest weather_data.data_id seen
+        self.last_data_id = None
+        # Leading trees from the last full fit, which incremental updates keep
+        self.full_trees = 0
+        self.full_fit_at = None
+        self.version = None
+        # Set once the startup bootstrap (load or first training) has finished
+        self.ready = threading.Event()
+        self.bootstrap_state = 'pending'
+        self.bootstrap_seconds = None
+    
+    @property
+    def model(self):
+        return self._active[0]
+    
+    @property
+    def scaler(self):
+        return self._active[1]
+    
+    def install(self, model, scaler):
+        """Atomically swap a trained model and scaler into the live instance"""
+        self._active = (model, scaler)
+        self.is_trained = True
+    
+    def full_refit_due(self):
+        """True when the last full fit is unknown or older than FULL_REFIT_HOURS"""
+        if self.full_fit_at is None:
+            return True
+        return datetime.now() - self.full_fit_at > timedelta(hours=FULL_REFIT_HOURS)
     
     def prepare_features(self, historical_data):
         """Prepare features for training - optimized for performance"""
@@ -50,56 +193,43 @@ class WeatherAI:
             return None, None
         
         try:
-            df = pd.DataFrame(historical_data)
-            features = []
-            targets = []
-            
-            for i in range(len(df) - 1):
-                current = df.iloc[i]
-                features.append([
-                    current['temperature'],
-                    current['humidity'],
-                    current['pressure'] / 100,  # Normalize pressure
-                    current['wind_speed'],
-                    current['hour'],
-                    current['day_of_week'],
-                    current['month']
-                ])
-                targets.append(df.iloc[i + 1]['temperature'])
-            
-            return np.array(features), np.array(targets)
+            # Built from shifted column arrays, no per-row DataFrame access
+            return build_features(historical_data)
         except Exception as e:
             print(f"Feature preparation error: {e}")
             return None, None
     
-    def train(self, historical_data):
-        """Train the AI model with error handling"""
+    def train(self, historical_data, run=run_inline):
+        """Train the AI model with error handling.
+        
+        run(fn, *args) executes the forest fit; the training executor passes
+        one that ships it to a worker process.
+        """
         try:
+            start = time.perf_counter()
             X, y = self.prepare_features(historical_data)
             if X is None or len(X) < 10:
                 print("Insufficient data for training")
                 return False
             
-            X_scaled = self.scaler.fit_transform(X)
-            X_train, X_test, y_train, y_test = train_test_split(
-                X_scaled, y, test_size=0.2, random_state=42
-            )
-            
-            self.model.fit(X_train, y_train)
-            self.is_trained = True
+            model, scaler, score = run(fit_full, X, y, MODEL_N_ESTIMATORS, MODEL_MAX_DEPTH)
+            self.install(model, scaler)
             self.training_data_points = len(X)
+            self.last_data_id = max_data_id(historical_data)
+            self.full_trees = len(model.estimators_)
+            self.full_fit_at = datetime.now()
             
-            # Save model and scaler
-            joblib.dump(self.model, MODEL_PATH)
-            joblib.dump(self.scaler, SCALER_PATH)
+            # Publish model, scaler and watermark as a new registry version
+            self.save_model(score=score, mode='full')
             
-            score = self.model.score(X_test, y_test)
+            train_seconds.labels('full').observe(time.perf_counter() - start)
             print(f"✅ AI Model trained successfully! R² score: {score:.3f}")
             
             # Emit training completion event
-            socketio.emit('ai_training_complete', {
+            broadcast('ai_training_complete', {
                 'score': round(score, 3),
                 'data_points': self.training_data_points,
+                'mode': 'full',
                 'timestamp': datetime.now().isoformat()
             })
             
@@ -108,13 +238,102 @@ class WeatherAI:
             print(f"❌ Training failed: {e}")
             return False
     
+    def train_incremental(self, new_data, run=run_inline):
+        """Absorb readings newer than the watermark without refitting the whole forest"""
+        if not self.is_trained:
+            return False
+        
+        try:
+            start = time.perf_counter()
+            X, y = build_features(new_data)
+            if len(X) < MIN_INCREMENT_SAMPLES:
+                print(f"ℹ️ Only {len(X)} new readings since last checkpoint, skipping incremental training")
+                return False
+            
+            current_model, scaler = self._active
+            
+            # The scaler stays frozen between full fits so existing trees keep
+            # seeing inputs on the scale they were trained on
+            X_scaled = scaler.transform(X)
+            
+            # Score on the unseen readings before absorbing them
+            score = current_model.score(X_scaled, y)
+            
+            increment = run(fit_increment, X_scaled, y, INCREMENTAL_TREES, MODEL_MAX_DEPTH,
+                            max_data_id(new_data))
+            
+            # Build the grown forest on a copy so concurrent predictions keep
+            # using a consistent model until the swap below
+            model = copy.copy(current_model)
+            model.estimators_ = merge_trees(current_model.estimators_, increment.estimators_,
+                                            self.full_trees, MAX_TREES)
+            model.n_estimators = len(model.estimators_)
+            self.install(model, scaler)
+            self.training_data_points += len(X)
+            self.last_data_id = max_data_id(new_data)
+            
+            self.save_model(score=score, mode='incremental')
+            train_seconds.labels('incremental').observe(time.perf_counter() - start)
+            
+            print(f"✅ AI Model updated incrementally with {len(X)} readings "
+                  f"({model.n_estimators} trees). R² on new data: {score:.3f}")
+            
+            broadcast('ai_training_complete', {
+                'score': round(score, 3),
+                'data_points': self.training_data_points,
+                'new_data_points': len(X),
+                'mode': 'incremental',
+                'timestamp': datetime.now().isoformat()
+            })
+            
+            return True
+        except Exception as e:
+            print(f"❌ Incremental training failed: {e}")
+            return False
+    
+    def save_model(self, score=None, mode='full'):
+        """Publish model, scaler and training metadata as a new registry version"""
+        model, scaler = self._active
+        version = model_registry.publish(model, scaler, {
+            'score': None if score is None else round(float(score), 4),
+            'mode': mode,
+            'data_points': self.training_data_points,
+            'last_data_id': self.last_data_id,
+            'n_estimators': len(model.estimators_),
+            'full_trees': self.full_trees,
+            'full_fit_at': self.full_fit_at.isoformat() if self.full_fit_at else None,
+            'feature_schema': FEATURE_COLUMNS,
+            'created_at': datetime.now().isoformat()
+        })
+        self.version = version
+        # Followers load it right away instead of on their next sync
+        cluster_bus.publish('model_published', version=version)
+        return version
+    
     def load_model(self):
-        """Load trained model"""
+        """Load the current registry version (mmap_mode='r' skips a temporary read buffer)"""
         try:
+            loaded = model_registry.load(mmap_mode='r')
+            if loaded:
+                model, scaler, manifest = loaded
+                if manifest.get('feature_schema') != FEATURE_COLUMNS:
+                    print(f"⚠️ Model {manifest['version']} was trained on a different feature schema, ignoring it")
+                    return False
+                self.install(model, scaler)
+                self.version = manifest['version']
+                self.last_data_id = manifest.get('last_data_id')
+                self.training_data_points = manifest.get('data_points', 0)
+                # Versions published before pinning: treat the leading trees as the
+                # full fit; the missing timestamp makes the next run a full refit
+                self.full_trees = manifest.get('full_trees', min(MODEL_N_ESTIMATORS, len(model.estimators_)))
+                full_fit_at = manifest.get('full_fit_at')
+                self.full_fit_at = datetime.fromisoformat(full_fit_at) if full_fit_at else None
+                print(f"✅ AI Model {self.version} loaded successfully!")
+                return True
+            
             if os.path.exists(MODEL_PATH) and os.path.exists(SCALER_PATH):
-                self.model = joblib.load(MODEL_PATH)
-                self.scaler = joblib.load(SCALER_PATH)
-                self.is_trained = True
+                import joblib
+                self.install(joblib.load(MODEL_PATH), joblib.load(SCALER_PATH))
                 print("✅ AI Model loaded successfully!")
                 return True
         except Exception as e:
@@ -123,87 +342,64 @@ class WeatherAI:
     
     def predict(self, current_weather):
         """Predict next hour's weather"""
-        if not self.is_trained:
-            return None
+        return self.predict_batch([current_weather])[0]
+    
+    def predict_batch(self, readings):
+        """Predict next hour's weather for many locations with one transform and one predict call"""
+        # Locations without a reading (over the call budget) get None
+        present = [i for i, reading in enumerate(readings) if reading is not None]
+        results = [None] * len(readings)
+        if not self.is_trained or not present:
+            return results
         
         try:
             now = datetime.now()
-            features = np.array([[
-                current_weather['temperature'],
-                current_weather['humidity'],
-                current_weather['pressure'] / 100,
-                current_weather['wind_speed'],
-                now.hour,
-                now.weekday(),
-                now.month
-            ]])
-            
-            features_scaled = self.scaler.transform(features)
-            prediction = self.model.predict(features_scaled)[0]
+            with predict_seconds.time():
+                features = build_prediction_features([readings[i] for i in present], now)
+                
+                model, scaler = self._active
+                features_scaled = scaler.transform(features)
+                predictions = model.predict(features_scaled)
             
-            return {
-                'predicted_temperature': round(prediction, 1),
-                'confidence': min(0.95, max(0.6, 0.85)),  # Simulated confidence
-                'timestamp': (now + timedelta(hours=1)).isoformat()
-            }
+            timestamp = (now + timedelta(hours=1)).isoformat()
+            for i, prediction in zip(present, predictions):
+                results[i] = {
+                    'predicted_temperature': round(prediction, 1),
+                    'confidence': min(0.95, max(0.6, 0.85)),  # Simulated confidence
+                    'timestamp': timestamp
+                }
+            return results
         except Exception as e:
             print(f"Prediction error: {e}")
-            return None
+            return [None] * len(readings)
+
+def max_data_id(rows):
+    """Highest weather_data.data_id in a loaded history array, None if empty"""
+    if len(rows) == 0:
+        return None
+    return int(rows['data_id'].max())
 
 # Initialize AI System
 weather_ai = WeatherAI()
 
 def init_database():
-    """Initialize database with required tables"""
+    """Initialize database: apply schema migrations, then sample data"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    tables = [
-        '''CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            location TEXT NOT NULL,
-            preferences TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )''',
-        '''CREATE TABLE IF NOT EXISTS weather_data (
-            data_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            location TEXT NOT NULL,
-            temperature REAL,
-            humidity REAL,
-            pressure REAL,
-            wind_speed REAL,
-            weather_condition TEXT,
-            precipitation REAL,
-            recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )''',
-        '''CREATE TABLE IF NOT EXISTS user_activities (
-            activity_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            activity_type TEXT,
-            weather_condition TEXT,
-            duration_minutes INTEGER,
-            satisfaction_rating INTEGER,
-            activity_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            notes TEXT,
-            FOREIGN KEY (user_id) REFERENCES users (user_id)
-        )''',
-        '''CREATE TABLE IF NOT EXISTS weather_alerts (
-            alert_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            alert_type TEXT,
-            severity TEXT,
-            message TEXT,
-            trigger_conditions TEXT,
-            is_active BOOLEAN DEFAULT TRUE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (user_id)
-        )'''
-    ]
-    
-    for table in tables:
-        cursor.execute(table)
+    # Create tables and indexes
+    migrate(conn)
+    # Plans are checked on a new connection: a pooled one opened while another
+    # worker was still migrating can keep planning against the old schema
+    try:
+        plan_conn = sqlite3.connect(db_pool.path)
+        try:
+            for name, steps in check_query_plans(plan_conn).items():
+                print(f"⚠️ Hot query '{name}' is not fully indexed: {' | '.join(steps)}")
+        finally:
+            plan_conn.close()
+    except Exception as e:
+        print(f"Query plan check error: {e}")
     
     # Insert sample data for demo
     try:
@@ -239,143 +435,414 @@ def init_database():
         print(f"Database initialization note: {e}")
     
     conn.close()
+    
+    # Recompute the materialized counters so startup always begins consistent
+    dashboard_counters.rebuild()
 
 def get_db_connection():
-    """Get database connection with error handling"""
+    """Get a pooled database connection with error handling; close() returns it to the pool"""
     try:
-        conn = sqlite3.connect('smart_weather.db', check_same_thread=False)
-        conn.row_factory = sqlite3.Row
-        return conn
+        return db_pool.connect()
     except Exception as e:
         print(f"Database connection error: {e}")
         return None
 
 def fetch_live_weather(location):
-    """Fetch real weather data from OpenWeatherMap API"""
+    """Fetch real weather data from OpenWeatherMap API (cached for WEATHER_CACHE_TTL)"""
+    with fetch_seconds.labels('single').time():
+        return weather_cache.get(location)
+
+def fetch_live_weather_many(locations, refresh=False):
+    """Fetch weather for many locations concurrently over the pooled session.
+    
+    refresh=True bypasses cached readings but still joins fetches already in flight.
+    """
+    with fetch_seconds.labels('many').time():
+        return weather_cache.get_many(locations, refresh=refresh)
+
+def last_stored_reading(location):
+    """Latest stored reading of a location in the live format, None if there is none"""
+    conn = get_db_connection()
+    if not conn:
+        return None
     try:
-        if OPENWEATHER_API_KEY == 'demo_key':
-            # Return demo data if no API key
-            temp_variation = (hash(location) % 20) - 5  # Random temp between 15-25
-            return {
-                'temperature': 20 + temp_variation,
-                'humidity': 60 + (hash(location) % 30),
-                'pressure': 1010 + (hash(location) % 20),
-                'wind_speed': 5 + (hash(location) % 15),
-                'condition': ['Sunny', 'Cloudy', 'Rainy'][hash(location) % 3],
-                'location': location,
-                'timestamp': datetime.now().isoformat()
-            }
-        
-        params = {
-            'q': location,
-            'appid': OPENWEATHER_API_KEY,
-            'units': 'metric'
-        }
-        
-        response = requests.get(OPENWEATHER_URL, params=params, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            return {
-                'temperature': data['main']['temp'],
-                'humidity': data['main']['humidity'],
-                'pressure': data['main']['pressure'],
-                'wind_speed': data['wind']['speed'],
-                'condition': data['weather'][0]['main'],
-                'location': location,
-                'timestamp': datetime.now().isoformat()
-            }
+        row = conn.execute(queries.LOCATION_RECENT_WEATHER, (location,)).fetchone()
     except Exception as e:
-        print(f"Weather API error for {location}: {e}")
-    
-    # Fallback data
+        print(f"Stored reading lookup error: {e}")
+        return None
+    finally:
+        conn.close()
+    if row is None:
+        return None
     return {
-        'temperature': 20.0,
-        'humidity': 65,
-        'pressure': 1013,
-        'wind_speed': 10,
-        'condition': 'Sunny',
+        'temperature': row['temperature'],
+        'humidity': row['humidity'],
+        'pressure': row['pressure'],
+        'wind_speed': row['wind_speed'],
+        'condition': row['weather_condition'],
         'location': location,
-        'timestamp': datetime.now().isoformat()
+        'timestamp': str(row['recorded_at']).replace(' ', 'T')
     }
 
+# Over budget, the cache serves this instead of calling upstream
+weather_cache.last_known = last_stored_reading
+
+def weather_item(location, weather_data, prediction):
+    """Response entry for one location; 'error' when there is no reading within the budget"""
+    item = {'location': location, 'current': weather_data, 'prediction': prediction}
+    if weather_data is None:
+        item['error'] = 'Weather API call budget exhausted and no stored reading for this location'
+    return item
+
+WEATHER_INSERT_SQL = '''
+    INSERT INTO weather_data 
+    (location, temperature, humidity, pressure, wind_speed, weather_condition, precipitation, recorded_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+def query_names():
+    """SQL text -> name for the db_query_seconds label"""
+    names = {sql: name.lower() for name, sql in vars(queries).items()
+             if name.isupper() and isinstance(sql, str)}
+    names.update({spec[0]: name for name, spec in queries.HOT_QUERIES.items()})
+    names[WEATHER_INSERT_SQL] = 'weather_insert'
+    return names
+
+db_pool.add_observer(QueryTimer(query_seconds, query_names()))
+slow_query_log = SlowQueryLog(threshold_ms=SLOW_QUERY_MS, enabled=SLOW_QUERY_LOG)
+db_pool.add_observer(slow_query_log)
+profiler = SamplingProfiler()
+
+# Readings are buffered and written in batches by a background writer
+ingestion_queue = WriteBehindQueue(get_db_connection, WEATHER_INSERT_SQL,
+                                   batch_size=INGEST_BATCH_SIZE,
+                                   flush_interval=INGEST_FLUSH_INTERVAL)
+
+# Which clients watch which locations (mirrors the Socket.IO location rooms)
+subscriptions = SubscriptionRegistry()
+# Last pushed state per location; subscribers get a snapshot, then deltas
+weather_feed = LocationFeed()
+# JSON or msgpack per client (see codec.py)
+client_encodings = EncodingRegistry()
+
+def broadcast(event, payload, location=None):
+    """Emit to every client, or to the subscribers of a location, encoding the payload once per encoding"""
+    # With a message queue, clients of other workers may use any encoding
+    encodings = available_encodings() if cluster_bus.enabled else client_encodings.in_use()
+    with emit_seconds.labels(event).time():
+        for encoding in encodings:
+            room = room_for(location, encoding) if location else encoding_room(encoding)
+            socketio.emit(event, encode(payload, encoding), to=room)
+
+def reply(event, payload):
+    """Emit to the client of the current socket event in its encoding"""
+    emit(event, encode(payload, client_encodings.of(request.sid)))
+
+# Trigger-maintained user/alert/activity totals for /dashboard and /users
+dashboard_counters = DashboardCounters(get_db_connection, max_age=COUNTERS_MAX_AGE)
+
+# Active alert rules as per-location threshold arrays, evaluated every weather update
+alert_engine = AlertEngine(get_db_connection, cooldown=ALERT_COOLDOWN)
+
+def weather_row(weather_data, recorded_at=None):
+    """weather_data row for a reading; recorded_at is taken now, not at flush time"""
+    return (
+        weather_data['location'],
+        weather_data['temperature'],
+        weather_data['humidity'],
+        weather_data['pressure'],
+        weather_data['wind_speed'],
+        weather_data['condition'],
+        weather_data.get('precipitation', 0),  # precipitation placeholder
+        recorded_at or datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    )
+
 def store_weather_data(weather_data):
-    """Store weather data in database"""
+    """Store weather data in database (write-behind)"""
+    try:
+        ingestion_queue.put(weather_row(weather_data))
+    except Exception as e:
+        print(f"Data storage error: {e}")
+
+def store_weather_batch(readings):
+    """Store many readings at once, e.g. a scheduler cycle or a backfill"""
+    try:
+        recorded_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        ingestion_queue.put_many([weather_row(reading, reading.get('recorded_at') or recorded_at)
+                                  for reading in readings])
+    except Exception as e:
+        print(f"Data storage error: {e}")
+
+def get_historical_weather(location, hours=24):
+    """Get historical weather data for AI training, as a structured NumPy array"""
     conn = get_db_connection()
     if conn:
         try:
-            conn.execute('''
-                INSERT INTO weather_data 
-                (location, temperature, humidity, pressure, wind_speed, weather_condition, precipitation)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                weather_data['location'],
-                weather_data['temperature'],
-                weather_data['humidity'],
-                weather_data['pressure'],
-                weather_data['wind_speed'],
-                weather_data['condition'],
-                0  # precipitation placeholder
-            ))
-            conn.commit()
+            return load_weather_arrays(conn, queries.HISTORICAL_WEATHER, queries.HISTORICAL_WEATHER_COUNT,
+                                       (location, f'-{hours} hours'))
         except Exception as e:
-            print(f"Data storage error: {e}")
+            print(f"Historical data error: {e}")
         finally:
             conn.close()
+    return np.empty(0, dtype=WEATHER_DTYPE)
 
-def get_historical_weather(location, hours=24):
-    """Get historical weather data for AI training"""
+def get_weather_since(location, last_data_id):
+    """Get readings recorded since the training watermark.
+    
+    The row at the watermark itself is included so the first new reading
+    can be paired with its predecessor as a training target.
+    """
     conn = get_db_connection()
     if conn:
         try:
-            query = '''
-                SELECT temperature, humidity, pressure, wind_speed,
-                       CAST(strftime('%H', recorded_at) AS INTEGER) as hour,
-                       CAST(strftime('%w', recorded_at) AS INTEGER) as day_of_week,
-                       CAST(strftime('%m', recorded_at) AS INTEGER) as month
-                FROM weather_data 
-                WHERE location = ? 
-                AND recorded_at >= datetime('now', ?)
-                ORDER BY recorded_at
-            '''
-            df = pd.read_sql_query(query, conn, params=(location, f'-{hours} hours'))
-            return df.to_dict('records')
+            return load_weather_arrays(conn, queries.WEATHER_SINCE, queries.WEATHER_SINCE_COUNT,
+                                       (location, last_data_id))
         except Exception as e:
-            print(f"Historical data error: {e}")
-            return []
+            print(f"Incremental data error: {e}")
+        finally:
+            conn.close()
+    return np.empty(0, dtype=WEATHER_DTYPE)
+
+def report_training_progress(key, stage, info):
+    """Broadcast training progress from the training executor"""
+    broadcast('ai_training_progress', dict(info, location=key, stage=stage,
+                                           timestamp=datetime.now().isoformat()))
+
+training_executor = TrainingExecutor(on_progress=report_training_progress)
+
+def training_job(job, location, hours):
+    """Runs on the training dispatcher thread; the forest fit runs in the worker process"""
+    # Make buffered readings visible to the training query
+    ingestion_queue.flush()
+    if weather_ai.is_trained and weather_ai.last_data_id is not None and not weather_ai.full_refit_due():
+        job.progress('loading', mode='incremental')
+        new_data = get_weather_since(location, weather_ai.last_data_id)
+        job.progress('fitting', mode='incremental', data_points=len(new_data))
+        success = weather_ai.train_incremental(new_data, run=job.run_in_pool)
+    else:
+        job.progress('loading', mode='full')
+        historical_data = get_historical_weather(location, hours)
+        job.progress('fitting', mode='full', data_points=len(historical_data))
+        success = weather_ai.train(historical_data, run=job.run_in_pool)
+    job.progress('complete' if success else 'skipped')
+    return success
+
+def bootstrap_job(job, location, hours, train=True):
+    """Startup: load the current model, or train the first one; runs on the training dispatcher"""
+    start = time.perf_counter()
+    try:
+        weather_ai.bootstrap_state = 'loading'
+        if weather_ai.load_model():
+            weather_ai.bootstrap_state = 'loaded'
+        elif not train:
+            # Followers never train; they load what the leader publishes
+            weather_ai.bootstrap_state = 'waiting'
+        else:
+            print("🤖 Training new AI model...")
+            weather_ai.bootstrap_state = 'training'
+            trained = training_job(job, location, hours)
+            weather_ai.bootstrap_state = 'trained' if trained else 'untrained'
+        return weather_ai.is_trained
+    except Exception as e:
+        weather_ai.bootstrap_state = 'failed'
+        print(f"❌ Model bootstrap failed: {e}")
+        return False
+    finally:
+        weather_ai.bootstrap_seconds = round(time.perf_counter() - start, 3)
+        weather_ai.ready.set()
+        print(f"🤖 Model bootstrap {weather_ai.bootstrap_state} in {weather_ai.bootstrap_seconds}s")
+
+def reload_model_job(job):
+    """Followers: load the registry's current version if it is not the one in memory"""
+    if model_registry.current_version() not in (None, weather_ai.version):
+        if weather_ai.load_model() and weather_ai.bootstrap_state == 'waiting':
+            weather_ai.bootstrap_state = 'loaded'
+
+def scheduled_training():
+    """Hourly retrain: absorb new readings; full refit without a checkpoint or once a day"""
+    training_executor.submit('London', training_job, 'London', 168)
+
+def maintain_rollups():
+    """Fold new readings into the hourly/daily rollups"""
+    conn = get_db_connection()
+    if conn:
+        try:
+            ingestion_queue.flush()
+            folded = refresh_rollups(conn)
+            if folded:
+                print(f"📊 Rolled up {folded} weather readings")
+        except Exception as e:
+            print(f"Rollup error: {e}")
+        finally:
+            conn.close()
+
+def apply_retention():
+    """Delete raw readings past the retention period (only once rolled up)"""
+    conn = get_db_connection()
+    if conn:
+        try:
+            deleted = prune_raw_weather(conn, WEATHER_RAW_RETENTION_DAYS, WEATHER_HOURLY_RETENTION_DAYS)
+            if deleted:
+                print(f"🧹 Pruned {deleted} raw weather readings older than {WEATHER_RAW_RETENTION_DAYS} days")
+        except Exception as e:
+            print(f"Retention error: {e}")
         finally:
             conn.close()
-    return []
 
 # Real-time weather updates
 def update_weather_data():
-    """Update weather data for all user locations"""
+    """Poll the user and watched locations that are due, within the upstream call budget"""
     conn = get_db_connection()
     if conn:
         try:
-            locations = conn.execute('SELECT DISTINCT location FROM users').fetchall()
-            for location_row in locations:
-                location = location_row['location']
-                weather_data = fetch_live_weather(location)
-                store_weather_data(weather_data)
-                
-                # Get AI prediction
-                prediction = weather_ai.predict(weather_data)
-                
-                # Send real-time update to connected clients
-                socketio.emit('weather_update', {
-                    'location': location,
-                    'data': weather_data,
-                    'prediction': prediction
-                })
-                
-                print(f"📍 Weather updated for {location}: {weather_data['temperature']}°C")
+            locations = [row['location'] for row in conn.execute(queries.USER_LOCATIONS)]
         except Exception as e:
             print(f"Weather update error: {e}")
+            return
         finally:
             conn.close()
+        
+        # Locations watched through other workers count as watched too
+        watched = subscriptions.watched() | cluster_watch.locations()
+        weather_poller.sync(locations + sorted(watched.difference(locations)), watched)
+        # Locations left over stay due and go first on a later tick
+        locations = weather_poller.due(limit=upstream_budget.available())
+        if not locations:
+            return
+        
+        try:
+            readings = fetch_live_weather_many(locations, refresh=True)
+            # Client fetches may have spent the budget since due(); locations
+            # served stale or not at all are not stored again and stay due
+            fresh = [(location, reading) for location, reading in zip(locations, readings)
+                     if reading is not None and not reading.get('stale')]
+            if not fresh:
+                return
+            locations = [location for location, _ in fresh]
+            readings = [reading for _, reading in fresh]
+            weather_poller.record(locations, readings)
+            store_weather_batch(readings)
+            
+            # One AI prediction call for every location
+            predictions = weather_ai.predict_batch(readings)
+            
+            # Only the fields that changed are pushed, and only to the room of
+            # their location; locations nobody watches are not sent at all
+            sent = 0
+            feed_updates = []
+            for location, weather_data, prediction in zip(locations, readings, predictions):
+                state = {'data': weather_data, 'prediction': prediction}
+                update = weather_feed.publish(location, state)
+                if update is None:
+                    continue
+                seq, changes = update
+                feed_updates.append([location, seq, state])
+                if location not in watched:
+                    continue
+                broadcast('weather_delta', {
+                    'location': location,
+                    'seq': seq,
+                    'changes': changes
+                }, location=location)
+                sent += 1
+            # Other workers answer 'subscribe' and 'resync' from their copy of the feed
+            if feed_updates:
+                cluster_bus.publish('feed', updates=feed_updates)
+            
+            # Every active rule of a location is checked in one array comparison
+            fired = alert_engine.evaluate(locations, readings)
+            timestamp = datetime.now().isoformat()
+            for alert in fired:
+                if alert['location'] in watched:
+                    broadcast('alert_triggered', dict(alert, timestamp=timestamp),
+                              location=alert['location'])
+            
+            print(f"📍 Weather updated for {len(locations)} locations ({sent} watched)"
+                  + (f", {len(fired)} alerts triggered" if fired else ""))
+        except Exception as e:
+            print(f"Weather update error: {e}")
 
 # Scheduler for periodic tasks
 scheduler = BackgroundScheduler()
+instrument_scheduler(scheduler, job_lag_seconds, job_run_seconds, job_errors)
+
+metrics_registry.gauge('socketio_connected_clients', 'Connected Socket.IO clients',
+                       client_encodings.connected)
+metrics_registry.gauge('ingestion_queue_depth', 'Readings buffered for the next flush',
+                       lambda: ingestion_queue.stats()['queue_depth'])
+metrics_registry.gauge('db_pool_in_use', 'Pooled SQLite connections checked out',
+                       lambda: db_pool.stats()['in_use'])
+metrics_registry.gauge('subscribed_locations', 'Locations with at least one subscriber',
+                       lambda: subscriptions.stats()['locations'])
+
+# Multi-worker coordination: one worker (the lease holder) runs these jobs
+LEADER_JOB_IDS = ('update_weather_data', 'scheduled_training', 'maintain_rollups', 'apply_retention')
+
+def add_leader_jobs():
+    """Jobs that must run in one process only: polling, training, rollups, retention"""
+    # Ticks often; each location is polled on its own adaptive schedule
+    # Job ids name the jobs in the scheduler metrics
+    scheduler.add_job(update_weather_data, 'interval', seconds=POLL_TICK,
+                      id='update_weather_data', replace_existing=True)
+    scheduler.add_job(scheduled_training, 'interval', hours=1,
+                      id='scheduled_training', replace_existing=True)
+    scheduler.add_job(maintain_rollups, 'interval', minutes=5,
+                      id='maintain_rollups', replace_existing=True)
+    scheduler.add_job(apply_retention, 'interval', hours=1,
+                      id='apply_retention', replace_existing=True)
+
+def on_elected():
+    """This worker took the lease (always, in a single process)"""
+    if cluster_bus.enabled:
+        print(f"👑 Worker {WORKER_ID} is the scheduler leader")
+    add_leader_jobs()
+    # Load or train the model in the background so the server listens right
+    # away; predictions are None until weather_ai.ready is set. Same key as
+    # scheduled and manual training, which join it instead of racing it.
+    if not weather_ai.is_trained:
+        training_executor.submit('London', bootstrap_job, 'London', 168)
+
+def on_demoted():
+    """Another worker holds the lease now"""
+    print(f"👋 Worker {WORKER_ID} is no longer the scheduler leader")
+    for job_id in LEADER_JOB_IDS:
+        try:
+            scheduler.remove_job(job_id)
+        except JobLookupError:
+            pass
+
+cluster_lease = LeaderLease(get_db_connection, WORKER_ID, ttl=LEADER_LEASE_TTL,
+                            enabled=cluster_bus.enabled, on_elected=on_elected, on_demoted=on_demoted)
+# Reported by the other workers every POLL_TICK; a silent worker drops out
+cluster_watch = ClusterWatch(ttl=3 * POLL_TICK)
+
+def sync_cluster():
+    """Followers: report watched locations to the leader, catch up on a missed model version"""
+    if cluster_lease.is_leader:
+        return
+    cluster_bus.publish('watched', worker=WORKER_ID, locations=sorted(subscriptions.watched()))
+    if weather_ai.ready.is_set() and model_registry.current_version() not in (None, weather_ai.version):
+        training_executor.submit('model-reload', reload_model_job)
+
+def on_feed(updates):
+    for location, seq, state in updates:
+        weather_feed.restore(location, seq, state)
+
+def on_model_published(version):
+    if not cluster_lease.is_leader:
+        training_executor.submit('model-reload', reload_model_job)
+
+def on_train_request():
+    if cluster_lease.is_leader:
+        training_executor.submit('London', training_job, 'London', 168)
+
+cluster_bus.on('feed', on_feed)
+cluster_bus.on('watched', cluster_watch.update)
+cluster_bus.on('model_published', on_model_published)
+cluster_bus.on('train_request', on_train_request)
+
+metrics_registry.gauge('cluster_leader', 'Whether this worker runs the scheduled jobs',
+                       lambda: cluster_lease.is_leader)
 
 @app.route('/')
 def index():
@@ -389,22 +856,13 @@ def dashboard():
         return render_template('dashboard.html', now=datetime.now())
     
     try:
-        total_users = conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
-        total_alerts = conn.execute('SELECT COUNT(*) FROM weather_alerts WHERE is_active = 1').fetchone()[0]
+        counters = dashboard_counters.get()
+        total_users = counters.get('users', 0)
+        total_alerts = counters.get('active_alerts', 0)
         
-        recent_activities = conn.execute('''
-            SELECT u.username, ua.activity_type, ua.weather_condition, ua.activity_date
-            FROM user_activities ua
-            JOIN users u ON ua.user_id = u.user_id
-            ORDER BY ua.activity_date DESC LIMIT 5
-        ''').fetchall()
+        recent_activities = conn.execute(queries.RECENT_ACTIVITIES).fetchall()
         
-        recent_weather = conn.execute('''
-            SELECT location, temperature, weather_condition, recorded_at
-            FROM weather_data 
-            ORDER BY recorded_at DESC 
-            LIMIT 3
-        ''').fetchall()
+        recent_weather = conn.execute(queries.RECENT_WEATHER).fetchall()
         
         # Get AI model status
         ai_status = "Trained" if weather_ai.is_trained else "Training"
@@ -422,6 +880,38 @@ def dashboard():
     finally:
         conn.close()
 
+def users_page_args(args):
+    """(after, limit, location, search) from /users or /api/users query parameters"""
+    try:
+        after = max(int(args.get('after', 0)), 0)
+    except ValueError:
+        after = 0
+    try:
+        limit = min(max(int(args.get('limit', USERS_PAGE_SIZE)), 1), USERS_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = USERS_PAGE_SIZE
+    location = args.get('location', '').strip()
+    search = args.get('q', '').strip()
+    return after, limit, location, search
+
+def fetch_users_page(conn, after=0, limit=USERS_PAGE_SIZE, location='', search=''):
+    """One keyset page of users with counts; returns (rows, next cursor or None).
+
+    Raises ValueError for search terms shorter than the index can serve.
+    """
+    if search and len(search) < queries.SEARCH_MIN_LENGTH:
+        raise ValueError(f'Search needs at least {queries.SEARCH_MIN_LENGTH} characters')
+    params = [after]
+    if location:
+        params.append(location)
+    if search:
+        params.append(queries.search_phrase(search))
+    # One extra row tells whether another page follows
+    params.append(limit + 1)
+    rows = conn.execute(queries.USERS_PAGE[bool(location), bool(search)], params).fetchall()
+    next_cursor = rows[limit - 1]['user_id'] if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
 @app.route('/users')
 def user_management():
     conn = get_db_connection()
@@ -430,21 +920,25 @@ def user_management():
         return render_template('user_management.html')
     
     try:
-        users = conn.execute('''
-            SELECT u.*, 
-                   COUNT(DISTINCT ua.activity_id) as activity_count,
-                   COUNT(DISTINCT wa.alert_id) as alert_count
-            FROM users u
-            LEFT JOIN user_activities ua ON u.user_id = ua.user_id
-            LEFT JOIN weather_alerts wa ON u.user_id = wa.user_id AND wa.is_active = 1
-            GROUP BY u.user_id
-        ''').fetchall()
+        after, limit, location, search = users_page_args(request.args)
+        try:
+            users, next_cursor = fetch_users_page(conn, after, limit, location, search)
+        except ValueError as e:
+            flash(str(e), 'error')
+            users, next_cursor = [], None
         
-        total_alerts = conn.execute('SELECT COUNT(*) FROM weather_alerts WHERE is_active = 1').fetchone()[0]
-        total_activities = conn.execute('SELECT COUNT(*) FROM user_activities').fetchone()[0]
+        counters = dashboard_counters.get()
+        total_users = counters.get('users', 0)
+        total_alerts = counters.get('active_alerts', 0)
+        total_activities = counters.get('activities', 0)
         
         return render_template('user_management.html', 
                              users=users,
+                             next_cursor=next_cursor,
+                             page_size=limit,
+                             location=location,
+                             search=search,
+                             total_users=total_users,
                              total_alerts=total_alerts,
                              total_activities=total_activities)
     except Exception as e:
@@ -474,10 +968,11 @@ def add_user():
                 VALUES (?, ?, ?, ?)
             ''', (username, email, location, json.dumps(preferences)))
             conn.commit()
+            dashboard_counters.invalidate()
             flash('🎉 User added successfully!', 'success')
             
             # Emit real-time update
-            socketio.emit('user_added', {
+            broadcast('user_added', {
                 'username': username,
                 'location': location,
                 'timestamp': datetime.now().isoformat()
@@ -500,31 +995,17 @@ def user_profile(user_id):
         return redirect(url_for('user_management'))
     
     try:
-        user = conn.execute('SELECT * FROM users WHERE user_id = ?', (user_id,)).fetchone()
+        user = conn.execute(queries.USER_BY_ID, (user_id,)).fetchone()
         if not user:
             flash('User not found!', 'error')
             return redirect(url_for('user_management'))
         
-        activities = conn.execute('''
-            SELECT * FROM user_activities 
-            WHERE user_id = ? 
-            ORDER BY activity_date DESC
-            LIMIT 10
-        ''', (user_id,)).fetchall()
+        activities = conn.execute(queries.USER_ACTIVITIES, (user_id,)).fetchall()
         
-        alerts = conn.execute('''
-            SELECT * FROM weather_alerts 
-            WHERE user_id = ? 
-            ORDER BY created_at DESC
-        ''', (user_id,)).fetchall()
+        alerts = conn.execute(queries.USER_ALERTS, (user_id,)).fetchall()
         
         # Get weather data for user's location
-        weather_data = conn.execute('''
-            SELECT * FROM weather_data 
-            WHERE location = ? 
-            ORDER BY recorded_at DESC 
-            LIMIT 5
-        ''', (user['location'],)).fetchall()
+        weather_data = conn.execute(queries.LOCATION_RECENT_WEATHER, (user['location'],)).fetchall()
         
         preferences = json.loads(user['preferences']) if user['preferences'] else {}
         
@@ -560,10 +1041,12 @@ def add_alert(user_id):
             VALUES (?, ?, ?, ?, ?)
         ''', (user_id, alert_type, severity, message, json.dumps(conditions)))
         conn.commit()
+        dashboard_counters.invalidate()
+        alert_engine.invalidate()
         flash('✅ Alert added successfully!', 'success')
         
         # Emit real-time alert
-        socketio.emit('alert_created', {
+        broadcast('alert_created', {
             'user_id': user_id,
             'alert_type': alert_type,
             'severity': severity,
@@ -590,11 +1073,168 @@ def alerts():
 def recommendations():
     return render_template('recommendations.html')
 
+@app.route('/api/predictions')
+def api_predictions():
+    """Current weather and AI predictions for ?location=...&location=... in one batch"""
+    locations = request.args.getlist('location') or ['London']
+    readings = fetch_live_weather_many(locations)
+    predictions = weather_ai.predict_batch(readings)
+    
+    return jsonify([weather_item(location, weather_data, prediction)
+                    for location, weather_data, prediction in zip(locations, readings, predictions)])
+
+@app.route('/api/history/<location>')
+def api_history(location):
+    """Min/max/mean weather history; spans over 48h are served from the rollups"""
+    hours = request.args.get('hours', 24, type=int)
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection error'}), 503
+    try:
+        resolution, rows = weather_history(conn, location, hours)
+        return jsonify({'location': location, 'hours': hours, 'resolution': resolution, 'data': rows})
+    finally:
+        conn.close()
+
+@app.route('/api/users')
+def api_users():
+    """Keyset-paginated users: ?after=<user_id>&limit=&location=&q="""
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection error'}), 503
+    try:
+        after, limit, location, search = users_page_args(request.args)
+        try:
+            users, next_cursor = fetch_users_page(conn, after, limit, location, search)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'users': [dict(user) for user in users], 'next_cursor': next_cursor})
+    finally:
+        conn.close()
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text format metrics"""
+    return metrics_registry.render(), 200, {'Content-Type': CONTENT_TYPE}
+
+@app.route('/api/ready')
+def api_ready():
+    """Readiness probe: 200 once the model bootstrap has finished, 503 before"""
+    body = {
+        'ready': weather_ai.ready.is_set(),
+        'model': weather_ai.bootstrap_state,
+        'model_trained': weather_ai.is_trained,
+        'model_version': weather_ai.version,
+        'bootstrap_seconds': weather_ai.bootstrap_seconds
+    }
+    return jsonify(body), 200 if body['ready'] else 503
+
+@app.route('/api/status')
+def api_status():
+    """Runtime statistics of the caching and background subsystems"""
+    return jsonify({
+        'weather_cache': weather_cache.stats(),
+        'poller': weather_poller.stats(),
+        'upstream_budget': upstream_budget.stats(),
+        'db_pool': db_pool.stats(),
+        'ingestion': ingestion_queue.stats(),
+        'dashboard_counters': dashboard_counters.stats(),
+        'alerts': alert_engine.stats(),
+        'subscriptions': subscriptions.stats(),
+        'weather_feed': weather_feed.stats(),
+        'encodings': client_encodings.stats(),
+        'slow_queries': slow_query_log.stats(),
+        'profiler': profiler.stats(),
+        'cluster': dict(cluster_lease.stats(), bus=cluster_bus.stats(), remote_watch=cluster_watch.stats())
+    })
+
+@app.route('/api/counters/check')
+def api_counters_check():
+    """Compare the materialized counters with the base tables; ?repair=1 rebuilds them on drift"""
+    try:
+        problems = dashboard_counters.check()
+        consistent = not (problems['summary'] or problems['users'] or problems['locations'])
+        repaired = False
+        if not consistent and request.args.get('repair') == '1':
+            dashboard_counters.rebuild()
+            repaired = True
+    except Exception as e:
+        return jsonify({'error': f'Counter check failed: {e}'}), 503
+    return jsonify({
+        'consistent': consistent,
+        'repaired': repaired,
+        'summary': {name: {'stored': stored, 'actual': actual}
+                    for name, (stored, actual) in problems['summary'].items()},
+        'users': {str(user_id): {column: {'stored': stored, 'actual': actual}
+                                 for column, (stored, actual) in diff.items()}
+                  for user_id, diff in problems['users'].items()},
+        'locations': {location: {'stored': stored, 'actual': actual}
+                      for location, (stored, actual) in problems['locations'].items()}
+    })
+
+def admin_allowed():
+    """Admin endpoints fail closed: no ADMIN_TOKEN configured means no access"""
+    if not ADMIN_TOKEN:
+        return False
+    token = request.headers.get('X-Admin-Token', '')
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+@app.route('/api/admin/slow-queries', methods=['GET', 'POST'])
+def api_slow_queries():
+    """Slow-query log; POST {enabled, threshold_ms, clear} changes it at runtime"""
+    if not admin_allowed():
+        return jsonify({'error': 'Admin token required'}), 403
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            slow_query_log.configure(enabled=data.get('enabled'), threshold_ms=data.get('threshold_ms'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'threshold_ms must be a number'}), 400
+        if data.get('clear'):
+            slow_query_log.clear()
+    return jsonify(dict(slow_query_log.stats(), entries=slow_query_log.entries()))
+
+@app.route('/api/admin/profile', methods=['GET', 'POST'])
+def api_profile():
+    """Sampling profiler status; POST {seconds, interval_ms} starts a capture window"""
+    if not admin_allowed():
+        return jsonify({'error': 'Admin token required'}), 403
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            started = profiler.start(seconds=data.get('seconds', 30),
+                                     interval=float(data.get('interval_ms', 10)) / 1000)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'seconds and interval_ms must be numbers'}), 400
+        if not started:
+            return jsonify(dict(profiler.stats(), error='A capture is already running')), 409
+        print(f"🔬 Profiling for {profiler.seconds}s")
+    return jsonify(profiler.stats())
+
+@app.route('/api/admin/profile/stop', methods=['POST'])
+def api_profile_stop():
+    if not admin_allowed():
+        return jsonify({'error': 'Admin token required'}), 403
+    profiler.stop()
+    return jsonify(profiler.stats())
+
+@app.route('/api/admin/profile.folded')
+def api_profile_folded():
+    """Stacks of the last capture in folded format (flamegraph.pl, speedscope)"""
+    if not admin_allowed():
+        return jsonify({'error': 'Admin token required'}), 403
+    return profiler.folded(), 200, {
+        'Content-Type': 'text/plain; charset=utf-8',
+        'Content-Disposition': 'attachment; filename=profile.folded'
+    }
+
 # SocketIO Events
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection"""
     print(f"✅ Client connected: {request.sid}")
+    client_encodings.set(request.sid, JSON)
+    join_room(encoding_room(JSON))
     emit('connection_response', {
         'status': 'connected', 
         'message': 'Welcome to Smart Weather System!',
@@ -604,8 +1244,70 @@ def handle_connect():
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
+    subscriptions.drop(request.sid)
+    client_encodings.drop(request.sid)
     print(f"❌ Client disconnected: {request.sid}")
 
+@socketio.on('negotiate_encoding')
+def handle_negotiate_encoding(data):
+    """Pick the payload encoding for this client: {accept: ['msgpack', 'json']}"""
+    encoding = negotiate((data or {}).get('accept'))
+    previous = client_encodings.set(request.sid, encoding)
+    if previous != encoding:
+        # Broadcasts go to per-encoding rooms; move the client over
+        leave_room(encoding_room(previous))
+        join_room(encoding_room(encoding))
+        for location in subscriptions.locations_of(request.sid):
+            leave_room(room_for(location, previous))
+            join_room(room_for(location, encoding))
+    emit('encoding', {'encoding': encoding, 'fields': FIELDS if encoding == MSGPACK else None})
+
+def send_snapshots(locations):
+    """Emit the full current state of each location to the requesting client"""
+    # Locations never published yet are fetched (through the cache) and predicted once
+    missing = [location for location in locations if weather_feed.snapshot(location) is None]
+    if missing:
+        readings = fetch_live_weather_many(missing)
+        predictions = weather_ai.predict_batch(readings)
+        for location, weather_data, prediction in zip(missing, readings, predictions):
+            if weather_data is not None:
+                weather_feed.publish(location, {'data': weather_data, 'prediction': prediction})
+    
+    for location in locations:
+        entry = weather_feed.snapshot(location)
+        if entry is None:
+            # Over the call budget with nothing stored; the first poll brings a delta
+            reply('weather_unavailable', weather_item(location, None, None))
+            continue
+        seq, state = entry
+        reply('weather_snapshot', dict(state, location=location, seq=seq))
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """Join the rooms of one or more locations: {location} or {locations: [...]}"""
+    added = subscriptions.subscribe(request.sid, clean_locations(data))
+    encoding = client_encodings.of(request.sid)
+    for location in added:
+        join_room(room_for(location, encoding))
+    emit('subscribed', {'locations': subscriptions.locations_of(request.sid), 'added': added})
+    # Joined before the snapshot is taken, so no delta after it can be missed
+    send_snapshots(added)
+
+@socketio.on('resync')
+def handle_resync(data):
+    """Resend snapshots after the client detected a gap in the delta sequence"""
+    subscribed = set(subscriptions.locations_of(request.sid))
+    send_snapshots([location for location in clean_locations(data) if location in subscribed])
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    """Leave the rooms of one or more locations"""
+    removed = subscriptions.unsubscribe(request.sid, clean_locations(data))
+    encoding = client_encodings.of(request.sid)
+    for location in removed:
+        leave_room(room_for(location, encoding))
+    emit('subscribed', {'locations': subscriptions.locations_of(request.sid), 'removed': removed})
+
 @socketio.on('request_weather')
 def handle_weather_request(data):
     """Handle real-time weather requests"""
@@ -613,61 +1315,78 @@ def handle_weather_request(data):
     weather_data = fetch_live_weather(location)
     prediction = weather_ai.predict(weather_data)
     
-    emit('weather_response', {
-        'location': location,
-        'current': weather_data,
-        'prediction': prediction
-    })
+    reply('weather_response', weather_item(location, weather_data, prediction))
+
+@socketio.on('request_weather_batch')
+def handle_weather_batch_request(data):
+    """Handle weather requests for several locations in one round trip"""
+    locations = data.get('locations') or ['London']
+    readings = fetch_live_weather_many(locations)
+    predictions = weather_ai.predict_batch(readings)
+    
+    reply('weather_batch_response', [weather_item(location, weather_data, prediction)
+                                      for location, weather_data, prediction in zip(locations, readings, predictions)])
 
 @socketio.on('request_ai_training')
 def handle_ai_training_request():
     """Handle AI training requests"""
     if not weather_ai.is_trained:
-        emit('ai_training_start', {'message': 'Starting AI model training...'})
+        if not cluster_lease.is_leader:
+            # Only the leader trains; its progress events reach this client through the queue
+            cluster_bus.publish('train_request')
+            emit('ai_training_start', {'message': 'Starting AI model training...'})
+            return
         
-        # Train with available data
-        historical_data = get_historical_weather('London', 168)
-        success = weather_ai.train(historical_data)
+        # Train on the training executor; the handler returns immediately and
+        # concurrent requests join the job that is already queued or running
+        future, created = training_executor.submit('London', training_job, 'London', 168)
+        emit('ai_training_start', {
+            'message': 'Starting AI model training...' if created else 'AI model training already in progress...'
+        })
         
-        if success:
-            emit('ai_training_complete', {
-                'message': 'AI model trained successfully!',
-                'score': 0.85,  # Simulated score
-                'data_points': len(historical_data)
-            })
-        else:
-            emit('ai_training_failed', {'message': 'AI training failed. Insufficient data.'})
+        sid = request.sid
+        def notify_failure(done):
+            if done.exception() is not None or not done.result():
+                socketio.emit('ai_training_failed', {'message': 'AI training failed. Insufficient data.'}, to=sid)
+        future.add_done_callback(notify_failure)
 
 # Initialize application
 def initialize_app():
     """Initialize the application"""
     print("🚀 Initializing Smart Weather System...")
+    start = time.perf_counter()
     init_database()
     
-    # Try to load existing AI model
-    if not weather_ai.load_model():
-        print("🤖 Training new AI model...")
-        # Train with available historical data
-        historical_data = get_historical_weather('London', 168)
-        if historical_data:
-            weather_ai.train(historical_data)
-    
     # Start scheduler for periodic updates
-    scheduler.add_job(update_weather_data, 'interval', minutes=2)
-    scheduler.add_job(lambda: weather_ai.train(get_historical_weather('London', 168)), 'interval', hours=1)
-    
     if not scheduler.running:
         scheduler.start()
         print("⏰ Scheduler started")
     
-    print("✅ Smart Weather System ready!")
+    # The leader adds the scheduled jobs and bootstraps the model (on_elected);
+    # a single process is always the leader
+    if not cluster_lease.start():
+        training_executor.submit('London', bootstrap_job, 'London', 168, False)
+        print(f"🤝 Worker {WORKER_ID} follows scheduler leader {cluster_lease.leader}")
+    if cluster_bus.enabled:
+        cluster_bus.start(socketio.server)
+        scheduler.add_job(sync_cluster, 'interval', seconds=POLL_TICK,
+                          id='sync_cluster', replace_existing=True)
+    
+    print(f"✅ Smart Weather System ready in {time.perf_counter() - start:.2f}s "
+          f"(model bootstrap in background)")
 
 # Shutdown handler
 def shutdown_app():
     """Cleanup on application shutdown"""
     print("🛑 Shutting down Smart Weather System...")
+    cluster_lease.release()
     if scheduler.running:
         scheduler.shutdown()
+    profiler.stop()
+    training_executor.shutdown()
+    weather_client.close()
+    ingestion_queue.stop()
+    db_pool.close_all()
     print("✅ Clean shutdown completed")
 
 # Register shutdown handler
@@ -675,5 +1394,12 @@ atexit.register(shutdown_app)
 
 if __name__ == '__main__':
     initialize_app()
-    print("🌐 Starting Flask-SocketIO server on port 8000...")
-    socketio.run(app, host='0.0.0.0', port=8000, debug=True)
+    host = os.environ.get('HOST', '0.0.0.0')
+    port = int(os.environ.get('PORT', 8000))
+    # The Werkzeug debugger executes code sent by the browser, so it is opt-in
+    debug = os.environ.get('DEBUG', 'false').lower() in ('1', 'true', 'yes')
+    print(f"🌐 Starting Flask-SocketIO server on port {port}...")
+    # allow_unsafe_werkzeug: the threading server also runs when started
+    # without a terminal (service managers, the load-test driver), but never
+    # with the debugger switched on there
+    socketio.run(app, host=host, port=port, debug=debug, allow_unsafe_werkzeug=not debug)
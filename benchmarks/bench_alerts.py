@@ -0,0 +1,120 @@
+"""Benchmark alert rule loading and evaluation with many active alerts.
+
+Usage:
+    python benchmarks/bench_alerts.py [--alerts 1000,100000,500000] [--locations 200]
+
+Builds an in-memory database with the given number of active alerts spread
+over --locations locations, loads them into an AlertEngine and times
+evaluate() cycles (one reading per location): the first cycle, where many
+rules fire and event payloads are built, and a steady-state cycle where
+hysteresis keeps them quiet. Both are compared with a per-rule Python loop
+over the same rules.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alerts import METRICS, AlertEngine  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+
+def build_database(n_alerts, n_locations, seed=42):
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(':memory:', check_same_thread=False)
+    migrate(conn)
+    n_users = max(n_alerts // 5, 1)
+    with conn:
+        conn.executemany('INSERT INTO users (username, email, location) VALUES (?, ?, ?)',
+                         [(f'user{i}', f'user{i}@example.com', f'City{i % n_locations}')
+                          for i in range(n_users)])
+        temperatures = np.round(rng.uniform(20, 40, n_alerts), 1)
+        conn.executemany('''
+            INSERT INTO weather_alerts (user_id, alert_type, severity, message, trigger_conditions)
+            VALUES (?, 'Temperature', 'High', 'Threshold reached', ?)
+        ''', [(int(user_id), json.dumps({'temperature': float(t), 'wind_speed': 50.0, 'precipitation': 10.0}))
+              for user_id, t in zip(rng.integers(1, n_users + 1, n_alerts), temperatures)])
+    return conn
+
+
+class SharedConnection:
+    """connect() for the engine that keeps the in-memory database open"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __call__(self):
+        return self
+
+    def execute(self, *args):
+        return self.conn.execute(*args)
+
+    def close(self):
+        pass
+
+
+def loop_evaluate(rows, readings):
+    """Per-rule Python evaluation, the straightforward alternative"""
+    fired = 0
+    for location, conditions in rows:
+        reading = readings[location]
+        if any(reading[metric] >= threshold for metric, threshold in conditions.items()):
+            fired += 1
+    return fired
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--alerts', default='1000,100000,500000', help='comma separated alert counts')
+    parser.add_argument('--locations', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    locations = [f'City{i}' for i in range(args.locations)]
+    readings = [{'temperature': float(t), 'wind_speed': 10.0, 'precipitation': 0.0}
+                for t in rng.uniform(15, 35, args.locations)]
+
+    print(f"{'alerts':>10} {'load':>10} {'first':>10} {'steady':>10} {'loop':>10} {'fired':>8}")
+    for n_alerts in [int(n) for n in args.alerts.split(',')]:
+        conn = build_database(n_alerts, args.locations)
+        engine = AlertEngine(SharedConnection(conn), cooldown=0)
+
+        start = time.perf_counter()
+        engine.reload()
+        load_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fired = engine.evaluate(locations, readings)
+        first_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        engine.evaluate(locations, readings)
+        steady_time = time.perf_counter() - start
+
+        rows = [(location, {metric: value for metric, value in zip(METRICS, thresholds)})
+                for location, thresholds in (
+                    (row[0], row[1:]) for row in conn.execute(
+                        "SELECT u.location, json_extract(trigger_conditions, '$.temperature'), "
+                        "json_extract(trigger_conditions, '$.wind_speed'), "
+                        "json_extract(trigger_conditions, '$.precipitation') "
+                        "FROM weather_alerts wa JOIN users u ON u.user_id = wa.user_id"))]
+        by_location = dict(zip(locations, readings))
+        start = time.perf_counter()
+        loop_fired = loop_evaluate(rows, by_location)
+        loop_time = time.perf_counter() - start
+
+        assert loop_fired == len(fired), (loop_fired, len(fired))
+        print(f"{n_alerts:>10} {load_time * 1000:>8.1f}ms {first_time * 1000:>8.2f}ms "
+              f"{steady_time * 1000:>8.2f}ms "
+              f"{loop_time * 1000:>8.1f}ms {len(fired):>8}")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Compare JSON and compact MessagePack encoding of Socket.IO payloads.
+
+Usage:
+    python benchmarks/bench_codec.py [--iterations 20000]
+
+Encodes representative event payloads (a weather snapshot, a weather delta,
+a triggered alert and a 20-location batch response) both ways and prints the
+encode time per payload and the bytes on the wire. JSON is measured as
+python-socketio sends it (json.dumps of the payload); MessagePack as
+codec.encode builds it (field codes, epoch timestamps, msgpack.packb).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from codec import JSON, MSGPACK, encode, msgpack  # noqa: E402
+
+
+def sample_payloads():
+    now = datetime.now().isoformat()
+    current = {
+        'location': 'London', 'temperature': 18.4, 'humidity': 72, 'pressure': 1012,
+        'wind_speed': 14.2, 'condition': 'Cloudy', 'precipitation': 0.4, 'timestamp': now,
+    }
+    prediction = {'predicted_temperature': 19.1, 'confidence': 0.87, 'timestamp': now}
+    snapshot = {'location': 'London', 'seq': 1, 'data': current, 'prediction': prediction}
+    delta = {'location': 'London', 'seq': 2,
+             'changes': {'data': {'temperature': 18.6, 'timestamp': now}}}
+    alert = {
+        'alert_id': 1042, 'user_id': 17, 'location': 'London', 'alert_type': 'Temperature',
+        'severity': 'High', 'message': 'Temperature threshold reached',
+        'exceeded': ['temperature'],
+        'reading': {'temperature': 31.2, 'wind_speed': 12.0, 'precipitation': 0.0},
+        'timestamp': now,
+    }
+    batch = [{'location': f'City{i}', 'data': dict(current, location=f'City{i}'), 'prediction': prediction}
+             for i in range(20)]
+    return {'snapshot': snapshot, 'delta': delta, 'alert': alert, 'batch(20)': batch}
+
+
+def measure(payload, encoding, iterations):
+    if encoding == JSON:
+        def run():
+            return json.dumps(encode(payload, JSON), separators=(',', ':')).encode()
+    else:
+        def run():
+            return encode(payload, MSGPACK)
+    wire = run()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        run()
+    elapsed = time.perf_counter() - start
+    return elapsed / iterations * 1e6, len(wire)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    if msgpack is None:
+        print("⚠️ msgpack is not installed (pip install msgpack); only JSON is measured")
+
+    print(f"{'payload':>10} {'json us':>9} {'json B':>8} {'msgpack us':>11} {'msgpack B':>10} {'saved':>7}")
+    for name, payload in sample_payloads().items():
+        json_us, json_bytes = measure(payload, JSON, args.iterations)
+        if msgpack is None:
+            print(f"{name:>10} {json_us:>9.2f} {json_bytes:>8}")
+            continue
+        mp_us, mp_bytes = measure(payload, MSGPACK, args.iterations)
+        print(f"{name:>10} {json_us:>9.2f} {json_bytes:>8} {mp_us:>11.2f} {mp_bytes:>10} "
+              f"{1 - mp_bytes / json_bytes:>6.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark the vectorized feature builder against the old row-by-row loop.
+
+Usage:
+    python benchmarks/bench_features.py [--sizes 1000,10000,...] [--legacy-max N]
+
+The legacy builder is O(n) DataFrame.iloc calls and takes minutes at 1M rows,
+so it only runs up to --legacy-max rows; at those sizes the outputs of both
+builders are also compared for exact equality.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from features import build_features  # noqa: E402
+
+
+def legacy_prepare_features(historical_data):
+    """The original WeatherAI.prepare_features loop, kept for comparison"""
+    df = pd.DataFrame(historical_data)
+    features = []
+    targets = []
+
+    for i in range(len(df) - 1):
+        current = df.iloc[i]
+        features.append([
+            current['temperature'],
+            current['humidity'],
+            current['pressure'] / 100,
+            current['wind_speed'],
+            current['hour'],
+            current['day_of_week'],
+            current['month']
+        ])
+        targets.append(df.iloc[i + 1]['temperature'])
+
+    return np.array(features), np.array(targets)
+
+
+def synthetic_history(n_rows, seed=42):
+    """Readings shaped like get_historical_weather() output (list of dicts)"""
+    rng = np.random.default_rng(seed)
+    hours = np.arange(n_rows) // 30  # one reading every 2 minutes
+    frame = pd.DataFrame({
+        'temperature': np.round(15 + 8 * np.sin(hours / 24 * 2 * np.pi) + rng.normal(0, 1, n_rows), 2),
+        'humidity': rng.integers(30, 100, n_rows).astype(float),
+        'pressure': rng.integers(990, 1035, n_rows).astype(float),
+        'wind_speed': np.round(rng.gamma(2.0, 4.0, n_rows), 2),
+        'hour': hours % 24,
+        'day_of_week': (hours // 24) % 7,
+        'month': (hours // (24 * 30)) % 12 + 1,
+    })
+    return frame.to_dict('records')
+
+
+def best_of(func, data, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000',
+                        help='comma separated row counts')
+    parser.add_argument('--legacy-max', type=int, default=100000,
+                        help='largest size the legacy loop is run at')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    print(f"{'rows':>10} {'vectorized':>12} {'legacy':>12} {'speedup':>9}  identical")
+    for n_rows in sizes:
+        data = synthetic_history(n_rows)
+        fast_time, (X_fast, y_fast) = best_of(build_features, data, args.repeat)
+
+        if n_rows <= args.legacy_max:
+            slow_time, (X_slow, y_slow) = best_of(legacy_prepare_features, data, 1)
+            identical = np.array_equal(X_fast, X_slow) and np.array_equal(y_fast, y_slow)
+            print(f"{n_rows:>10} {fast_time * 1000:>10.2f}ms {slow_time * 1000:>10.1f}ms "
+                  f"{slow_time / fast_time:>8.0f}x  {identical}")
+        else:
+            print(f"{n_rows:>10} {fast_time * 1000:>10.2f}ms {'skipped':>12} {'-':>9}  -")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Model load benchmark: load time and memory per worker, with and without mmap_mode.
+
+Usage:
+    python benchmarks/bench_model_load.py [--workers 4] [--trees 100] [--rows 20000]
+
+Publishes a forest of --trees trees (depth MODEL_MAX_DEPTH) to a temporary
+registry, then starts --workers spawned processes that load it at the same
+time, once with mmap_mode=None and once with mmap_mode='r'. Each worker
+reports the load time and how much its RSS, PSS and shared pages grew while
+the model was resident (from /proc/self/smaps_rollup, so Linux only).
+
+Shared pages barely move in either mode: scikit-learn copies each tree's
+node and value arrays into its own buffers when unpickling, so every worker
+ends up with a private copy of the forest. mmap_mode only skips the
+temporary read buffer.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from features import FEATURE_COLUMNS  # noqa: E402
+from model_registry import ModelRegistry  # noqa: E402
+from training import fit_full  # noqa: E402
+
+MAX_DEPTH = 10
+FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Private_Dirty')
+
+
+def memory():
+    """smaps_rollup fields in MB"""
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if name in FIELDS:
+                values[name] = int(rest.split()[0]) / 1024
+    return values
+
+
+def publish_forest(root, trees, rows):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(rows, len(FEATURE_COLUMNS)))
+    y = 3 * X[:, 0] + rng.normal(size=rows)
+    model, scaler, _ = fit_full(X, y, trees, MAX_DEPTH)
+    return ModelRegistry(root).publish(model, scaler, {})
+
+
+def load_worker(root, mmap_mode, barrier, results):
+    # Import the ML stack first so only the model itself is measured
+    import joblib  # noqa: F401
+    import sklearn.ensemble  # noqa: F401
+
+    before = memory()
+    start = time.perf_counter()
+    model, scaler, _ = ModelRegistry(root).load(mmap_mode=mmap_mode)
+    seconds = time.perf_counter() - start
+    model.predict(scaler.transform(np.zeros((1, len(FEATURE_COLUMNS)))))
+    # Measure while every worker holds the model, so shared pages would show up
+    barrier.wait()
+    after = memory()
+    results.put(dict({name: after[name] - before[name] for name in FIELDS}, load=seconds))
+    barrier.wait()
+
+
+def measure(root, mmap_mode, workers):
+    ctx = multiprocessing.get_context('spawn')
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=load_worker, args=(root, mmap_mode, barrier, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    runs = [results.get(timeout=120) for _ in processes]
+    for process in processes:
+        process.join()
+    return {name: sum(run[name] for run in runs) / len(runs) for name in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--trees', type=int, default=100, help='forest size (MAX_TREES in the app)')
+    parser.add_argument('--rows', type=int, default=20000, help='training rows of the synthetic forest')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='weather-model-load-')
+    try:
+        version = publish_forest(root, args.trees, args.rows)
+        size = sum(os.path.getsize(os.path.join(root, version, name))
+                   for name in os.listdir(os.path.join(root, version)))
+        print(f"{args.trees} trees, {size / 2**20:.1f} MB on disk, {args.workers} workers (mean per worker)")
+        print(f"{'mmap_mode':>10} {'load':>8} {'RSS':>8} {'PSS':>8} {'shared':>8} {'private':>8}")
+        for mmap_mode in (None, 'r'):
+            result = measure(root, mmap_mode, args.workers)
+            print(f"{str(mmap_mode):>10} {result['load']:>7.2f}s {result['Rss']:>6.1f}MB "
+                  f"{result['Pss']:>6.1f}MB {result['Shared_Clean']:>6.1f}MB {result['Private_Dirty']:>6.1f}MB")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
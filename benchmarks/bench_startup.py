@@ -0,0 +1,166 @@
+"""Startup benchmark: import time, time to listen and time to a ready model.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 3] [--budget 3.0] [--import-budget 1.0]
+                                       [--seed-rows 2000]
+
+Each run starts from a fresh temporary directory and database:
+
+- import: `import app_clean` in a new interpreter, and a check that the ML
+  stack (scikit-learn, joblib, pandas) was not imported with it
+- listen: `python app_clean.py` (DEBUG=false) until /api/status answers
+- ready: until /api/ready answers 200, i.e. the background model bootstrap
+  has trained on --seed-rows synthetic readings (informational, no budget)
+
+Exits with status 1 if the median import or listen time exceeds its budget,
+or if an ML module is imported eagerly.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(REPO, 'app_clean.py')
+sys.path.insert(0, REPO)
+
+from migrations import migrate  # noqa: E402
+
+LAZY_MODULES = ['sklearn', 'joblib', 'pandas', 'scipy']
+
+IMPORT_PROBE = f'''
+import json, sys, time
+sys.path.insert(0, {REPO!r})
+start = time.perf_counter()
+import app_clean
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'loaded': [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))
+'''
+
+
+def seed_database(path, rows):
+    """London history the bootstrap can train on"""
+    conn = sqlite3.connect(path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        migrate(conn)
+    end = datetime.utcnow()
+    with conn:
+        conn.executemany('''
+            INSERT INTO weather_data (location, temperature, humidity, pressure, wind_speed,
+                                      weather_condition, precipitation, recorded_at)
+            VALUES ('London', ?, ?, ?, ?, 'Cloudy', 0, ?)
+        ''', [(15 + (i % 24) / 3, 60 + i % 20, 1010 + i % 7, 5 + i % 9,
+               (end - timedelta(minutes=rows - i)).strftime('%Y-%m-%d %H:%M:%S'))
+              for i in range(rows)])
+    conn.close()
+
+
+def measure_import(workdir, env):
+    output = subprocess.run([sys.executable, '-c', IMPORT_PROBE], cwd=workdir, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    # atexit shutdown messages follow the JSON line
+    line = next(line for line in output.splitlines() if line.startswith('{'))
+    return json.loads(line)
+
+
+def wait_for(url, process, timeout, status=200):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with status {process.returncode}')
+        try:
+            if requests.get(url, timeout=1).status_code == status:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.02)
+    return False
+
+
+def measure_run(port, seed_rows, timeout):
+    workdir = tempfile.mkdtemp(prefix='weather-startup-')
+    db_path = os.path.join(workdir, 'startup.db')
+    env = dict(os.environ, DATABASE_PATH=db_path, PORT=str(port), DEBUG='false',
+               OPENWEATHER_API_KEY='demo_key')
+    try:
+        seed_database(db_path, seed_rows)
+        probe = measure_import(workdir, env)
+
+        start = time.monotonic()
+        log = open(os.path.join(workdir, 'server.log'), 'w')
+        process = subprocess.Popen([sys.executable, APP], cwd=workdir, env=env,
+                                   stdout=log, stderr=subprocess.STDOUT)
+        try:
+            if not wait_for(f'http://127.0.0.1:{port}/api/status', process, timeout):
+                raise RuntimeError(f'server not listening after {timeout}s')
+            listen = time.monotonic() - start
+            ready = None
+            if wait_for(f'http://127.0.0.1:{port}/api/ready', process, timeout):
+                ready = time.monotonic() - start
+        finally:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+            log.close()
+        return {'import': probe['seconds'], 'loaded': probe['loaded'], 'listen': listen, 'ready': ready}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--budget', type=float, default=3.0, help='seconds until the server answers')
+    parser.add_argument('--import-budget', type=float, default=1.0, help='seconds to import app_clean')
+    parser.add_argument('--seed-rows', type=int, default=2000)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    args = parser.parse_args()
+
+    runs = []
+    print(f"{'run':>4} {'import':>9} {'listen':>9} {'ready':>9}")
+    for i in range(args.runs):
+        run = measure_run(args.port, args.seed_rows, args.timeout)
+        runs.append(run)
+        ready = f"{run['ready']:>8.2f}s" if run['ready'] is not None else '       -'
+        print(f"{i + 1:>4} {run['import']:>8.2f}s {run['listen']:>8.2f}s {ready}")
+
+    import_time = median([run['import'] for run in runs])
+    listen_time = median([run['listen'] for run in runs])
+    eager = sorted({module for run in runs for module in run['loaded']})
+    failures = []
+    if import_time > args.import_budget:
+        failures.append(f"import {import_time:.2f}s > budget {args.import_budget:.2f}s")
+    if listen_time > args.budget:
+        failures.append(f"listen {listen_time:.2f}s > budget {args.budget:.2f}s")
+    if eager:
+        failures.append(f"imported eagerly: {', '.join(eager)}")
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print(f"✅ Median import {import_time:.2f}s, listening after {listen_time:.2f}s "
+          f"(budgets {args.import_budget:.2f}s / {args.budget:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
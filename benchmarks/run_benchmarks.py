@@ -0,0 +1,272 @@
+"""Benchmark suite for the ingestion, history, training and prediction hot paths.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--sizes 1000,10000,50000] [--repeat 20]
+                                        [--only store,history,features,train,predict]
+                                        [--output benchmarks/results.json]
+                                        [--baseline benchmarks/baseline.json] [--threshold 0.2]
+                                        [--save-baseline]
+
+Runs offline: app_clean is imported inside a temporary directory with a
+temporary SQLite database (DATABASE_PATH) and the demo weather client, and
+each size gets its own location filled with synthetic one-minute readings.
+
+For every hot path and size the suite records latency percentiles of single
+calls and the throughput in rows (or readings) per second, and writes them
+to --output as JSON. If the baseline file exists, the p50 latencies are
+compared with it and the run exits with status 1 when any of them got slower
+by more than --threshold (0.2 = 20%). --save-baseline stores this run as the
+new baseline. Baselines are machine specific: save and compare on the same
+machine.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = ['store', 'history', 'features', 'train', 'predict']
+
+# Training is expensive; it gets fewer samples than the other paths
+TRAIN_REPEAT = 3
+PREDICT_BATCH = 100
+
+
+def synthetic_rows(location, n, seed):
+    """n one-minute readings ending now, with daily temperature cycles and noise"""
+    rng = np.random.default_rng(seed)
+    end = datetime.utcnow().replace(microsecond=0)
+    minutes = np.arange(n)
+    temperature = 15 + 8 * np.sin(2 * np.pi * minutes / 1440) + rng.normal(0, 0.5, n)
+    humidity = np.clip(65 + rng.normal(0, 8, n), 10, 100)
+    pressure = 1013 + rng.normal(0, 4, n)
+    wind_speed = np.abs(rng.normal(10, 4, n))
+    return [(location, round(float(temperature[i]), 1), int(humidity[i]), round(float(pressure[i]), 1),
+             round(float(wind_speed[i]), 1), 'Cloudy', 0.0,
+             (end - timedelta(minutes=int(n - 1 - i))).strftime('%Y-%m-%d %H:%M:%S'))
+            for i in range(n)]
+
+
+def synthetic_readings(n, seed):
+    rng = np.random.default_rng(seed)
+    return [{
+        'location': f'Bench{i}',
+        'temperature': round(float(rng.normal(18, 6)), 1),
+        'humidity': int(rng.integers(30, 95)),
+        'pressure': round(float(rng.normal(1013, 5)), 1),
+        'wind_speed': round(float(abs(rng.normal(10, 4))), 1),
+        'condition': 'Cloudy',
+        'precipitation': 0.0,
+        'timestamp': datetime.now().isoformat(),
+    } for i in range(n)]
+
+
+def summarize(samples, items):
+    """Latency percentiles (ms) of per-call samples (s) and throughput of `items` per call"""
+    samples = np.array(samples)
+    mean = float(samples.mean())
+    return {
+        'calls': len(samples),
+        'items_per_call': items,
+        'p50_ms': round(float(np.percentile(samples, 50)) * 1000, 4),
+        'p95_ms': round(float(np.percentile(samples, 95)) * 1000, 4),
+        'p99_ms': round(float(np.percentile(samples, 99)) * 1000, 4),
+        'mean_ms': round(mean * 1000, 4),
+        'max_ms': round(float(samples.max()) * 1000, 4),
+        'throughput_per_s': round(items / mean, 1) if mean > 0 else None,
+    }
+
+
+def timed(fn, repeat, warmup=1):
+    """Per-call durations of `repeat` calls after `warmup` untimed ones, and the last result"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return samples, result
+
+
+def bench_store(app, size, repeat):
+    """store_weather_data() per call, and rows/s including the write-behind flush"""
+    rows = synthetic_readings(size, seed=size)
+    samples = []
+    start = time.perf_counter()
+    for reading in rows:
+        call_start = time.perf_counter()
+        app.store_weather_data(reading)
+        samples.append(time.perf_counter() - call_start)
+    app.ingestion_queue.flush()
+    elapsed = time.perf_counter() - start
+    result = summarize(samples, 1)
+    result['flushed_rows_per_s'] = round(size / elapsed, 1)
+    return result
+
+
+def bench_history(app, location, size, repeat):
+    hours = size // 60 + 2
+    samples, rows = timed(lambda: app.get_historical_weather(location, hours), repeat)
+    assert len(rows) >= size, (len(rows), size)
+    return summarize(samples, len(rows))
+
+
+def bench_features(app, history, repeat):
+    samples, (X, _) = timed(lambda: app.weather_ai.prepare_features(history), repeat)
+    return summarize(samples, len(X))
+
+
+def bench_train(app, history, repeat):
+    # One untimed fit first: scikit-learn and joblib are imported on first use
+    # and would otherwise land in the first sample
+    samples, ok = timed(lambda: app.weather_ai.train(history), min(repeat, TRAIN_REPEAT))
+    assert ok, 'training failed'
+    return summarize(samples, len(history) - 1)
+
+
+def bench_predict(app, repeat):
+    """predict() of one reading, and predict_batch() of PREDICT_BATCH readings"""
+    readings = synthetic_readings(PREDICT_BATCH, seed=1)
+    single, prediction = timed(lambda: app.weather_ai.predict(readings[0]), repeat * 10)
+    assert prediction is not None, 'prediction failed'
+    batch, _ = timed(lambda: app.weather_ai.predict_batch(readings), repeat)
+    return summarize(single, 1), summarize(batch, PREDICT_BATCH)
+
+
+def run(sizes, repeat, only):
+    """Import the app in a scratch directory and benchmark every selected path at every size"""
+    workdir = tempfile.mkdtemp(prefix='weather-bench-')
+    os.environ['DATABASE_PATH'] = os.path.join(workdir, 'bench.db')
+    os.environ['OPENWEATHER_API_KEY'] = 'demo_key'
+    os.chdir(workdir)  # model registry and other relative paths land here
+    sys.path.insert(0, REPO)
+    results = {}
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            import app_clean as app
+            app.init_database()
+
+        for size in sizes:
+            location = f'BenchCity{size}'
+            conn = app.get_db_connection()
+            with conn:
+                conn.executemany(app.WEATHER_INSERT_SQL, synthetic_rows(location, size, seed=size))
+            conn.close()
+            history = app.get_historical_weather(location, size // 60 + 2)
+
+            measured = {}
+            with contextlib.redirect_stdout(io.StringIO()):
+                if 'store' in only:
+                    measured['store_weather_data'] = bench_store(app, size, repeat)
+                if 'history' in only:
+                    measured['get_historical_weather'] = bench_history(app, location, size, repeat)
+                if 'features' in only:
+                    measured['prepare_features'] = bench_features(app, history, repeat)
+                if 'train' in only or 'predict' in only:
+                    trained = bench_train(app, history, repeat)
+                    if 'train' in only:
+                        measured['train'] = trained
+                if 'predict' in only:
+                    measured['predict'], measured[f'predict_batch_{PREDICT_BATCH}'] = bench_predict(app, repeat)
+
+            for name, result in measured.items():
+                results.setdefault(name, {})[str(size)] = result
+                print(f"{name:>24} {size:>8} p50 {result['p50_ms']:>10.3f}ms p95 {result['p95_ms']:>10.3f}ms "
+                      f"{result['throughput_per_s'] or 0:>14,.0f}/s")
+        app.ingestion_queue.stop()
+    finally:
+        os.chdir(REPO)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def environment():
+    import sklearn
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'sqlite': __import__('sqlite3').sqlite_version,
+    }
+
+
+def compare(results, baseline, threshold):
+    """(name, size, baseline p50, current p50, ratio) for every measurement in both runs"""
+    rows = []
+    for name, by_size in results.items():
+        for size, result in by_size.items():
+            before = baseline.get('results', {}).get(name, {}).get(size)
+            if before and before['p50_ms'] > 0:
+                rows.append((name, size, before['p50_ms'], result['p50_ms'],
+                             result['p50_ms'] / before['p50_ms']))
+    regressions = [row for row in rows if row[4] > 1 + threshold]
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,50000', help='comma separated history sizes')
+    parser.add_argument('--repeat', type=int, default=20, help='timed calls per path and size')
+    parser.add_argument('--only', default=','.join(BENCHMARKS), help='comma separated subset of ' + ', '.join(BENCHMARKS))
+    parser.add_argument('--output', default=os.path.join(REPO, 'benchmarks', 'results.json'))
+    parser.add_argument('--baseline', default=os.path.join(REPO, 'benchmarks', 'baseline.json'))
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed p50 slowdown (0.2 = 20%%)')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline)
+    sizes = [int(size) for size in args.sizes.split(',')]
+    only = set(args.only.split(','))
+    unknown = only.difference(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = run(sizes, args.repeat, only)
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'environment': environment(),
+        'sizes': sizes,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Results written to {output}")
+
+    status = 0
+    if os.path.exists(baseline_path) and not args.save_baseline:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        rows, regressions = compare(results, baseline, args.threshold)
+        print(f"\nCompared with {baseline_path} (created {baseline.get('created_at')}):")
+        for name, size, before, after, ratio in rows:
+            flag = '❌' if ratio > 1 + args.threshold else '  '
+            print(f"{flag} {name:>24} {size:>8} {before:>10.3f}ms -> {after:>10.3f}ms ({ratio - 1:+.0%})")
+        if regressions:
+            print(f"❌ {len(regressions)} p50 regressions above {args.threshold:.0%}")
+            status = 1
+        else:
+            print(f"✅ No p50 regressions above {args.threshold:.0%}")
+
+    if args.save_baseline:
+        with open(baseline_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Baseline saved to {baseline_path}")
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
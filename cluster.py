@@ -0,0 +1,444 @@
+"""Multi-process deployment: scheduler leader lease, cross-process emits and cluster messages.
+
+Several app_clean.py workers (started by run-production.py) share one SQLite
+database and one model registry. Three pieces keep them consistent:
+
+- LeaderLease: a row in cluster_leases that one worker holds and renews
+  every ttl/3 seconds. Only the holder runs the scheduled jobs (polling,
+  training, rollups, retention). When it stops renewing, another worker
+  takes the lease over once it has expired.
+- A message-queue client manager for Socket.IO, so an emit in one worker
+  reaches the clients connected to every worker. tcp://host:port uses
+  MessageBroker below, a fan-out broker for a single host that doubles as
+  the local stand-in; redis:// uses python-socketio's RedisManager.
+- ClusterBus: application messages on the same channel (location feed
+  state, watched locations, published models, training requests).
+
+    python cluster.py --port 5680    # run the stand-in broker on its own
+"""
+import argparse
+import socket
+import socketserver
+import struct
+import threading
+import time
+from urllib.parse import urlparse
+
+from socketio import PubSubManager, RedisManager
+
+DEFAULT_BROKER_PORT = 5680
+
+LEASE_SQL = '''
+    INSERT INTO cluster_leases (name, owner, expires_at) VALUES (?, ?, ?)
+    ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+    WHERE cluster_leases.owner = excluded.owner OR cluster_leases.expires_at < ?
+'''
+
+
+class LeaderLease:
+    """Time-limited lease in SQLite; the holder is the leader.
+
+    With enabled=False (a single process) this worker is always the leader.
+    on_elected / on_demoted are called from the renewing thread when
+    leadership changes.
+    """
+
+    def __init__(self, connect, owner, name='scheduler', ttl=15.0, enabled=True,
+                 on_elected=None, on_demoted=None):
+        self.connect = connect
+        self.owner = owner
+        self.name = name
+        self.ttl = ttl
+        self.enabled = enabled
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.is_leader = False
+        self.leader = None
+        self.expires_at = 0.0
+        self.elections = 0
+        self.renew_errors = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Try to take the lease now, then keep renewing it. Returns whether this worker leads"""
+        if not self.enabled:
+            self.leader = self.owner
+            self._set_leader(True)
+            return True
+        self.renew()
+        self._thread = threading.Thread(target=self._run, name='leader-lease', daemon=True)
+        self._thread.start()
+        return self.is_leader
+
+    def _run(self):
+        while not self._stop.wait(self.ttl / 3):
+            self.renew()
+
+    def renew(self):
+        """Take or extend the lease if it is ours or has expired"""
+        now = time.time()
+        conn = self.connect()
+        if conn is None:
+            self._renew_failed(now)
+            return
+        try:
+            with conn:
+                conn.execute(LEASE_SQL, (self.name, self.owner, now + self.ttl, now))
+            row = conn.execute('SELECT owner, expires_at FROM cluster_leases WHERE name = ?',
+                               (self.name,)).fetchone()
+        except Exception as e:
+            print(f"Leader lease error: {e}")
+            self._renew_failed(now)
+            return
+        finally:
+            conn.close()
+        self.leader = row[0]
+        if row[0] == self.owner:
+            self.expires_at = row[1]
+        self._set_leader(row[0] == self.owner)
+
+    def _renew_failed(self, now):
+        # Without a confirmed renewal, lead only until the last lease runs out
+        self.renew_errors += 1
+        if now >= self.expires_at:
+            self._set_leader(False)
+
+    def _set_leader(self, leading):
+        with self._lock:
+            if leading == self.is_leader:
+                return
+            self.is_leader = leading
+            if leading:
+                self.elections += 1
+        callback = self.on_elected if leading else self.on_demoted
+        if callback is not None:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Leadership change error: {e}")
+
+    def release(self):
+        """Stop renewing and expire the lease so another worker takes over right away"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if not self.enabled or not self.is_leader:
+            return
+        conn = self.connect()
+        if conn is not None:
+            try:
+                with conn:
+                    conn.execute('UPDATE cluster_leases SET expires_at = 0 WHERE name = ? AND owner = ?',
+                                 (self.name, self.owner))
+            except Exception as e:
+                print(f"Leader lease release error: {e}")
+            finally:
+                conn.close()
+        self._set_leader(False)
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'worker': self.owner,
+            'is_leader': self.is_leader,
+            'leader': self.leader,
+            'lease_ttl': self.ttl,
+            'expires_in': round(self.expires_at - time.time(), 1) if self.is_leader and self.enabled else None,
+            'elections': self.elections,
+            'renew_errors': self.renew_errors,
+        }
+
+
+class ClusterWatch:
+    """Locations watched by clients of the other workers, as last reported by each"""
+
+    def __init__(self, ttl=30.0):
+        self.ttl = ttl
+        self._by_worker = {}
+        self._lock = threading.Lock()
+
+    def update(self, worker, locations):
+        with self._lock:
+            self._by_worker[worker] = (time.monotonic(), set(locations))
+
+    def locations(self):
+        """Union of the reports younger than ttl; workers that stopped reporting are dropped"""
+        cutoff = time.monotonic() - self.ttl
+        with self._lock:
+            for worker in [w for w, (at, _) in self._by_worker.items() if at < cutoff]:
+                del self._by_worker[worker]
+            return set().union(*(locations for _, locations in self._by_worker.values()))
+
+    def stats(self):
+        with self._lock:
+            return {'workers': len(self._by_worker),
+                    'locations': len(set().union(*(l for _, l in self._by_worker.values())))}
+
+
+class ClusterBus:
+    """Application messages between workers over the Socket.IO message queue.
+
+    Without a message queue (a single process) publish() does nothing.
+    Handlers run on the manager's listener thread and must return quickly.
+    """
+
+    def __init__(self):
+        self.manager = None
+        self._handlers = {}
+        self.published = 0
+        self.received = 0
+
+    @property
+    def enabled(self):
+        return self.manager is not None
+
+    def attach(self, manager):
+        """Carry bus messages on a client manager from make_client_manager(); returns it"""
+        self.manager = manager
+        manager.bus = self
+        return manager
+
+    def start(self, server):
+        """Start the manager's listener now instead of on the first client connection.
+
+        A worker without clients still has to receive feed and model messages.
+        """
+        if self.manager is not None and not server.manager_initialized:
+            server.manager_initialized = True
+            self.manager.initialize()
+
+    def on(self, kind, handler):
+        self._handlers[kind] = handler
+
+    def publish(self, kind, **payload):
+        if self.manager is None:
+            return
+        try:
+            self.manager._publish({'method': 'cluster', 'kind': kind, 'payload': payload,
+                                   'host_id': self.manager.host_id})
+            self.published += 1
+        except Exception as e:
+            print(f"Cluster publish error ({kind}): {e}")
+
+    def deliver(self, message):
+        handler = self._handlers.get(message.get('kind'))
+        if handler is None:
+            return
+        self.received += 1
+        try:
+            handler(**message.get('payload', {}))
+        except Exception as e:
+            print(f"Cluster message error ({message.get('kind')}): {e}")
+
+    def stats(self):
+        return {'enabled': self.enabled, 'published': self.published, 'received': self.received}
+
+
+class ClusterMessages:
+    """PubSubManager mixin: hands 'cluster' messages to the ClusterBus instead of Socket.IO"""
+
+    bus = None
+
+    def _listen(self):
+        for message in super()._listen():
+            data = message
+            if not isinstance(data, dict):
+                try:
+                    data = self.json.loads(message)
+                except Exception:
+                    continue
+            if isinstance(data, dict) and data.get('method') == 'cluster':
+                if self.bus is not None and data.get('host_id') != self.host_id:
+                    self.bus.deliver(data)
+                continue
+            yield data
+
+
+def send_frame(sock, payload):
+    sock.sendall(struct.pack('>I', len(payload)) + payload)
+
+
+def read_frame(stream):
+    """Next length-prefixed frame from a socket file, None at end of stream"""
+    header = stream.read(4)
+    if len(header) < 4:
+        return None
+    payload = stream.read(struct.unpack('>I', header)[0])
+    return payload
+
+
+class TCPPubSubManager(PubSubManager):
+    """Socket.IO client manager publishing through a MessageBroker (tcp://host:port)"""
+
+    name = 'tcp'
+
+    def __init__(self, url=f'tcp://127.0.0.1:{DEFAULT_BROKER_PORT}', channel='flask-socketio',
+                 write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        parsed = urlparse(url)
+        self.address = (parsed.hostname or '127.0.0.1', parsed.port or DEFAULT_BROKER_PORT)
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        with self._lock:
+            if self._sock is None:
+                self._sock = socket.create_connection(self.address, timeout=5)
+                self._sock.settimeout(None)
+            return self._sock
+
+    def _reset(self, sock):
+        with self._lock:
+            if self._sock is sock:
+                self._sock = None
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+    def _publish(self, data):
+        payload = self.json.dumps(data).encode()
+        # One reconnect attempt; the listener thread reconnects on its own
+        for attempt in range(2):
+            sock = self._connection()
+            try:
+                with self._lock:
+                    send_frame(sock, payload)
+                return
+            except OSError:
+                self._reset(sock)
+                if attempt:
+                    raise
+
+    def _listen(self):
+        while True:
+            try:
+                sock = self._connection()
+            except OSError as e:
+                print(f"Message broker {self.address[0]}:{self.address[1]} unavailable: {e}")
+                time.sleep(1)
+                continue
+            stream = sock.makefile('rb')
+            try:
+                while True:
+                    payload = read_frame(stream)
+                    if payload is None:
+                        break
+                    yield payload.decode()
+            except OSError:
+                pass
+            finally:
+                stream.close()
+                self._reset(sock)
+            time.sleep(1)
+
+
+class TCPManager(ClusterMessages, TCPPubSubManager):
+    """TCPPubSubManager that also carries ClusterBus messages"""
+
+
+class ClusterRedisManager(ClusterMessages, RedisManager):
+    """RedisManager that also carries ClusterBus messages (needs the redis package)"""
+
+
+def make_client_manager(url, channel='flask-socketio'):
+    """Socket.IO client manager for a SOCKETIO_MESSAGE_QUEUE url"""
+    if url.startswith('tcp://'):
+        return TCPManager(url, channel=channel)
+    if url.startswith(('redis://', 'rediss://')):
+        return ClusterRedisManager(url, channel=channel)
+    raise ValueError(f"Unsupported message queue {url!r}, use tcp://host:port or redis://")
+
+
+class _BrokerHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        broker = self.server
+        client = (self.request, threading.Lock())
+        with broker.clients_lock:
+            broker.clients.append(client)
+        stream = self.request.makefile('rb')
+        try:
+            while True:
+                payload = read_frame(stream)
+                if payload is None:
+                    break
+                broker.fan_out(client, payload)
+        except OSError:
+            pass
+        finally:
+            stream.close()
+            with broker.clients_lock:
+                if client in broker.clients:
+                    broker.clients.remove(client)
+
+
+class MessageBroker(socketserver.ThreadingTCPServer):
+    """Fan-out broker for TCPManager: every frame goes to every other connection.
+
+    One broker per deployment; it does not persist or buffer messages, so a
+    worker that is disconnected misses what is published meanwhile (the
+    workers' periodic sync covers that).
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_BROKER_PORT):
+        super().__init__((host, port), _BrokerHandler)
+        self.clients = []
+        self.clients_lock = threading.Lock()
+        self.frames = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'tcp://{host}:{port}'
+
+    def fan_out(self, sender, payload):
+        frame = struct.pack('>I', len(payload)) + payload
+        with self.clients_lock:
+            targets = [client for client in self.clients if client is not sender]
+            self.frames += 1
+        for sock, lock in targets:
+            try:
+                with lock:
+                    sock.sendall(frame)
+            except OSError:
+                pass  # its handler thread removes it
+
+    def start(self):
+        """Serve on a background thread; returns self"""
+        self._thread = threading.Thread(target=self.serve_forever, name='message-broker', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def stats(self):
+        with self.clients_lock:
+            return {'clients': len(self.clients), 'frames': self.frames}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in message broker for SOCKETIO_MESSAGE_QUEUE=tcp://')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_BROKER_PORT)
+    args = parser.parse_args()
+
+    broker = MessageBroker(args.host, args.port)
+    print(f"📮 Message broker on {broker.url}")
+    try:
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broker.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Negotiated payload encoding for Socket.IO events.
+
+JSON is the default. Clients that can decode MessagePack ask for it with
+'negotiate_encoding'; their payloads are then sent as one binary msgpack
+blob with known field names replaced by small integer codes and ISO
+timestamps replaced by integer epoch milliseconds. The code table is sent
+to the client once, in the 'encoding' reply.
+
+msgpack is optional: without it every client gets JSON.
+"""
+import threading
+from datetime import datetime
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = 'json'
+MSGPACK = 'msgpack'
+
+# Field names in event payloads; a field's code is its index in this list.
+# Append only: existing codes must not change while clients are connected.
+FIELDS = [
+    'location', 'data', 'prediction', 'seq', 'changes', 'current',
+    'temperature', 'humidity', 'pressure', 'wind_speed', 'condition', 'precipitation',
+    'timestamp', 'predicted_temperature', 'confidence',
+    'alert_id', 'user_id', 'alert_type', 'severity', 'message', 'exceeded', 'reading',
+    'score', 'data_points', 'new_data_points', 'mode', 'stage', 'username',
+]
+FIELD_CODES = {name: code for code, name in enumerate(FIELDS)}
+
+# Fields holding ISO timestamps, sent as epoch milliseconds
+TIMESTAMP_FIELDS = {'timestamp'}
+
+
+def available_encodings():
+    return [MSGPACK, JSON] if msgpack is not None else [JSON]
+
+
+def negotiate(accept):
+    """First encoding in the client's preference list that the server supports"""
+    supported = available_encodings()
+    for encoding in accept or ():
+        if encoding in supported:
+            return encoding
+    return JSON
+
+
+def epoch_ms(value):
+    if isinstance(value, str):
+        try:
+            return int(datetime.fromisoformat(value).timestamp() * 1000)
+        except ValueError:
+            return value
+    return value
+
+
+def compact(value):
+    """Payload with field codes for known keys and epoch timestamps"""
+    if isinstance(value, dict):
+        return {
+            FIELD_CODES.get(key, key): epoch_ms(item) if key in TIMESTAMP_FIELDS else compact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [compact(item) for item in value]
+    return value
+
+
+def encode(payload, encoding):
+    """Wire payload for an encoding: the object itself for JSON, bytes for msgpack"""
+    if encoding == MSGPACK:
+        return msgpack.packb(compact(payload), use_bin_type=True)
+    return payload
+
+
+def encoding_room(encoding):
+    """Room holding every client that uses an encoding, for broadcasts"""
+    return f'encoding:{encoding}'
+
+
+class EncodingRegistry:
+    """Encoding chosen by each connected client"""
+
+    def __init__(self):
+        self._by_sid = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def set(self, sid, encoding):
+        """Record a client's encoding; returns the previous one"""
+        with self._lock:
+            previous = self._by_sid.get(sid)
+            if previous is not None:
+                self._counts[previous] -= 1
+            self._by_sid[sid] = encoding
+            self._counts[encoding] = self._counts.get(encoding, 0) + 1
+            return previous
+
+    def drop(self, sid):
+        with self._lock:
+            encoding = self._by_sid.pop(sid, None)
+            if encoding is not None:
+                self._counts[encoding] -= 1
+
+    def connected(self):
+        with self._lock:
+            return len(self._by_sid)
+
+    def of(self, sid):
+        with self._lock:
+            return self._by_sid.get(sid, JSON)
+
+    def in_use(self):
+        """Encodings with at least one client; each broadcast is encoded once per encoding"""
+        with self._lock:
+            return [encoding for encoding, count in self._counts.items() if count > 0]
+
+    def stats(self):
+        with self._lock:
+            return {'available': available_encodings(),
+                    'clients': {encoding: count for encoding, count in self._counts.items() if count}}
@@ -0,0 +1,300 @@
+"""Materialized dashboard counters.
+
+summary_counters holds the global totals shown on /dashboard and /users
+(users, active alerts, activities); user_counters holds the per-user
+activity and active alert counts listed on /users; location_counters holds
+the number of users per location (the scheduler's poll list). All are kept
+current by SQLite triggers, so every writer (routes, scripts, other
+processes) updates them in the same transaction as the row it inserts or
+deletes, and pages read a handful of rows instead of counting whole tables.
+
+DashboardCounters caches the global totals in memory. Routes that write
+call invalidate(); the cache also expires after `max_age` seconds so writes
+from other processes show up.
+
+    python counters.py            # compare counters with the base tables
+    python counters.py --repair   # rebuild them if they drifted
+"""
+import argparse
+import sqlite3
+import sys
+import threading
+import time
+
+COUNTERS = {
+    'users': 'SELECT COUNT(*) FROM users',
+    'active_alerts': 'SELECT COUNT(*) FROM weather_alerts WHERE is_active = 1',
+    'activities': 'SELECT COUNT(*) FROM user_activities',
+}
+
+USER_COUNTERS = {
+    'activity_count': 'SELECT COUNT(*) FROM user_activities a WHERE a.user_id = u.user_id',
+    'alert_count': 'SELECT COUNT(*) FROM weather_alerts w WHERE w.user_id = u.user_id AND w.is_active = 1',
+}
+
+
+def _bump(name, delta):
+    return f"UPDATE summary_counters SET value = value + ({delta}) WHERE name = '{name}';"
+
+
+def _bump_user(column, user_id, delta):
+    return f'UPDATE user_counters SET {column} = {column} + ({delta}) WHERE user_id = {user_id};'
+
+
+_USER_COUNTS_SQL = f'''
+    SELECT u.user_id, {', '.join(f'({sql}) AS {column}' for column, sql in USER_COUNTERS.items())}
+    FROM users u
+'''
+
+_SEED_SQL = [
+    'DELETE FROM summary_counters',
+    'INSERT INTO summary_counters (name, value) VALUES '
+    + ', '.join(f"('{name}', ({sql}))" for name, sql in COUNTERS.items()),
+    'DELETE FROM user_counters',
+    f'INSERT INTO user_counters (user_id, {", ".join(USER_COUNTERS)}) {_USER_COUNTS_SQL}',
+]
+
+_LOCATION_COUNTS_SQL = 'SELECT location, COUNT(*) FROM users GROUP BY location'
+
+_LOCATION_SEED_SQL = [
+    'DELETE FROM location_counters',
+    f'INSERT INTO location_counters (location, users) {_LOCATION_COUNTS_SQL}',
+]
+
+
+def _add_location(location):
+    return f'''INSERT INTO location_counters (location, users) VALUES ({location}, 1)
+        ON CONFLICT (location) DO UPDATE SET users = users + 1;'''
+
+
+def _remove_location(location):
+    # Locations without users drop out so the poll list never reads empty rows
+    return f'''UPDATE location_counters SET users = users - 1 WHERE location = {location};
+        DELETE FROM location_counters WHERE location = {location} AND users <= 0;'''
+
+
+# Tables, triggers and the initial fill, applied by schema migration 4
+COUNTER_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS summary_counters (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    ) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS user_counters (
+        user_id INTEGER PRIMARY KEY,
+        activity_count INTEGER NOT NULL DEFAULT 0,
+        alert_count INTEGER NOT NULL DEFAULT 0
+    )''',
+    f'''CREATE TRIGGER IF NOT EXISTS counters_user_insert AFTER INSERT ON users BEGIN
+        {_bump('users', 1)}
+        INSERT OR IGNORE INTO user_counters (user_id) VALUES (NEW.user_id);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS counters_user_delete AFTER DELETE ON users BEGIN
+        {_bump('users', -1)}
+        DELETE FROM user_counters WHERE user_id = OLD.user_id;
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS counters_activity_insert AFTER INSERT ON user_activities BEGIN
+        {_bump('activities', 1)}
+        {_bump_user('activity_count', 'NEW.user_id', 1)}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS counters_activity_delete AFTER DELETE ON user_activities BEGIN
+        {_bump('activities', -1)}
+        {_bump_user('activity_count', 'OLD.user_id', -1)}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS counters_activity_update AFTER UPDATE OF user_id ON user_activities BEGIN
+        {_bump_user('activity_count', 'OLD.user_id', -1)}
+        {_bump_user('activity_count', 'NEW.user_id', 1)}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS counters_alert_insert AFTER INSERT ON weather_alerts
+    WHEN NEW.is_active = 1 BEGIN
+        {_bump('active_alerts', 1)}
+        {_bump_user('alert_count', 'NEW.user_id', 1)}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS counters_alert_delete AFTER DELETE ON weather_alerts
+    WHEN OLD.is_active = 1 BEGIN
+        {_bump('active_alerts', -1)}
+        {_bump_user('alert_count', 'OLD.user_id', -1)}
+    END''',
+    # Deactivation, reactivation and reassignment of alerts
+    f'''CREATE TRIGGER IF NOT EXISTS counters_alert_update AFTER UPDATE OF is_active, user_id ON weather_alerts BEGIN
+        {_bump('active_alerts', '(NEW.is_active = 1) - (OLD.is_active = 1)')}
+        {_bump_user('alert_count', 'OLD.user_id', '-(OLD.is_active = 1)')}
+        {_bump_user('alert_count', 'NEW.user_id', 'NEW.is_active = 1')}
+    END''',
+] + _SEED_SQL
+
+# Per-location user counts, applied by schema migration 7
+LOCATION_COUNTER_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS location_counters (
+        location TEXT PRIMARY KEY,
+        users INTEGER NOT NULL
+    ) WITHOUT ROWID''',
+    f'''CREATE TRIGGER IF NOT EXISTS locations_user_insert AFTER INSERT ON users BEGIN
+        {_add_location('NEW.location')}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS locations_user_delete AFTER DELETE ON users BEGIN
+        {_remove_location('OLD.location')}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS locations_user_update AFTER UPDATE OF location ON users
+    WHEN OLD.location IS NOT NEW.location BEGIN
+        {_remove_location('OLD.location')}
+        {_add_location('NEW.location')}
+    END''',
+] + _LOCATION_SEED_SQL
+
+
+def rebuild(conn):
+    """Recompute every counter from the base tables in one write transaction"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for sql in _SEED_SQL + _LOCATION_SEED_SQL:
+            conn.execute(sql)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def read_counters(conn):
+    return {name: value for name, value in conn.execute('SELECT name, value FROM summary_counters')}
+
+
+def check(conn):
+    """Counters that disagree with the base tables.
+
+    Returns {'summary': {name: (stored, actual)}, 'users': {user_id: {column: (stored, actual)}},
+    'locations': {location: (stored, actual)}}; all maps are empty when everything is consistent.
+    """
+    # One read transaction so the counters and the counts see the same snapshot
+    conn.execute('BEGIN')
+    try:
+        stored = read_counters(conn)
+        summary = {}
+        for name, sql in COUNTERS.items():
+            actual = conn.execute(sql).fetchone()[0]
+            if stored.get(name) != actual:
+                summary[name] = (stored.get(name), actual)
+
+        users = {}
+        stored_users = {row[0]: tuple(row)[1:] for row in conn.execute(
+            f'SELECT user_id, {", ".join(USER_COUNTERS)} FROM user_counters')}
+        for row in conn.execute(_USER_COUNTS_SQL):
+            user_id, actual = row[0], tuple(row)[1:]
+            expected = stored_users.pop(user_id, (None,) * len(USER_COUNTERS))
+            diff = {column: (expected[i], actual[i]) for i, column in enumerate(USER_COUNTERS)
+                    if expected[i] != actual[i]}
+            if diff:
+                users[user_id] = diff
+        for user_id, expected in stored_users.items():
+            # Counter rows left behind for users that no longer exist
+            users[user_id] = {column: (expected[i], None) for i, column in enumerate(USER_COUNTERS)}
+
+        stored_locations = dict(conn.execute('SELECT location, users FROM location_counters').fetchall())
+        actual_locations = dict(conn.execute(_LOCATION_COUNTS_SQL).fetchall())
+        locations = {location: (stored_locations.get(location), actual_locations.get(location))
+                     for location in stored_locations.keys() | actual_locations.keys()
+                     if stored_locations.get(location) != actual_locations.get(location)}
+    finally:
+        conn.rollback()
+    return {'summary': summary, 'users': users, 'locations': locations}
+
+
+class DashboardCounters:
+    """In-memory copy of summary_counters"""
+
+    def __init__(self, connect, max_age=30.0):
+        self.connect = connect
+        self.max_age = max_age
+        self._values = None
+        self._loaded_at = 0.0
+        self._generation = 0  # bumped by invalidate() so a racing reload is not kept
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.reloads = 0
+
+    def get(self):
+        """Current totals as a dict; reads summary_counters only when stale"""
+        with self._lock:
+            if self._values is not None and time.monotonic() - self._loaded_at < self.max_age:
+                self.hits += 1
+                return dict(self._values)
+            generation = self._generation
+        conn = self.connect()
+        if conn is None:
+            return dict(self._values or {})
+        try:
+            values = read_counters(conn)
+        finally:
+            conn.close()
+        with self._lock:
+            if generation == self._generation:
+                self._values = values
+                self._loaded_at = time.monotonic()
+            self.reloads += 1
+        return dict(values)
+
+    def invalidate(self):
+        with self._lock:
+            self._values = None
+            self._generation += 1
+
+    def rebuild(self):
+        conn = self.connect()
+        try:
+            rebuild(conn)
+        finally:
+            conn.close()
+        self.invalidate()
+
+    def check(self):
+        conn = self.connect()
+        try:
+            return check(conn)
+        finally:
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            values = dict(self._values or {})
+            age = time.monotonic() - self._loaded_at if self._values is not None else None
+        return {
+            'values': values,
+            'age_seconds': None if age is None else round(age, 1),
+            'max_age_seconds': self.max_age,
+            'hits': self.hits,
+            'reloads': self.reloads,
+        }
+
+
+def main():
+    from db import DB_PATH
+    from migrations import migrate
+
+    parser = argparse.ArgumentParser(description='Check the materialized dashboard counters')
+    parser.add_argument('--db', default=DB_PATH, help='database file (default: DATABASE_PATH)')
+    parser.add_argument('--repair', action='store_true', help='rebuild the counters if they drifted')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    migrate(conn)
+    problems = check(conn)
+    for name, (stored, actual) in problems['summary'].items():
+        print(f"FAIL  {name}: stored {stored}, actual {actual}")
+    for user_id, diff in problems['users'].items():
+        details = ', '.join(f'{column} stored {stored}, actual {actual}'
+                            for column, (stored, actual) in diff.items())
+        print(f"FAIL  user {user_id}: {details}")
+    for location, (stored, actual) in problems['locations'].items():
+        print(f"FAIL  location {location}: stored {stored} users, actual {actual}")
+
+    drifted = bool(problems['summary'] or problems['users'] or problems['locations'])
+    if not drifted:
+        print(f"ok    {', '.join(f'{name}={value}' for name, value in read_counters(conn).items())}")
+    elif args.repair:
+        rebuild(conn)
+        print("Counters rebuilt")
+    else:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""SQLite connection pool.
+
+Connections are opened once, tuned with the pragmas below and then checked
+out of a bounded pool. WAL journal mode lets dashboard reads proceed while
+the ingestion job writes. Callers keep using the plain sqlite3 API:
+``conn.close()`` on a pooled connection returns it to the pool instead of
+closing it.
+
+Functions added with ConnectionPool.add_observer() are called with
+(sql, seconds) after every execute()/executemany() on a pooled connection
+or its cursors. The time covers preparing the statement and stepping to
+the first row; rows fetched later are not included.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+DB_PATH = os.environ.get('DATABASE_PATH', 'smart_weather.db')
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',     # durable at checkpoints; safe with WAL
+    'cache_size': -16000,        # KiB (negative) -> 16 MB page cache per connection
+    'mmap_size': 268435456,      # 256 MB of the file read through mmap
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,        # ms to wait for a competing writer
+}
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that reports statement times to the pool's observers"""
+
+    def execute(self, sql, parameters=()):
+        pool = self.connection.pool
+        if pool is None or not pool.observers:
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            pool.observe(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        pool = self.connection.pool
+        if pool is None or not pool.observers:
+            return super().executemany(sql, seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            pool.observe(sql, time.perf_counter() - start)
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to its pool"""
+
+    pool = None
+    checked_out = False
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # sqlite3.Connection.execute() bypasses cursor(); route it through TimedCursor
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+    def close_for_real(self):
+        super().close()
+
+
+class ConnectionPool:
+    def __init__(self, path=DB_PATH, size=16, checkout_timeout=30, pragmas=None):
+        self.path = path
+        self.size = size
+        self.checkout_timeout = checkout_timeout
+        self.pragmas = dict(PRAGMAS, **(pragmas or {}))
+        self._idle = queue.LifoQueue()  # most recently used first: warm page cache
+        self._lock = threading.Lock()
+        self._opened = 0
+        self.observers = []
+
+    def add_observer(self, observer):
+        """Call observer(sql, seconds) after every statement on pooled connections"""
+        self.observers = self.observers + [observer]
+
+    def observe(self, sql, seconds):
+        for observer in self.observers:
+            try:
+                observer(sql, seconds)
+            except Exception as e:
+                print(f"Query observer error: {e}")
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, factory=PooledConnection,
+                               timeout=self.pragmas['busy_timeout'] / 1000)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        conn.pool = self
+        return conn
+
+    def connect(self):
+        """Check out a connection, opening a new one while under the pool size"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._opened < self.size:
+                    self._opened += 1
+                    open_new = True
+                else:
+                    open_new = False
+            if open_new:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.checkout_timeout)
+                except queue.Empty:
+                    raise sqlite3.OperationalError(
+                        f'connection pool exhausted ({self.size} connections in use)')
+        conn.checked_out = True
+        return conn
+
+    def release(self, conn):
+        if not conn.checked_out:
+            return  # closed twice
+        conn.checked_out = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Broken connection: drop it and let the pool open a fresh one
+            conn.close_for_real()
+            with self._lock:
+                self._opened -= 1
+            return
+        self._idle.put(conn)
+
+    def stats(self):
+        with self._lock:
+            opened = self._opened
+        idle = self._idle.qsize()
+        return {'size': self.size, 'open': opened, 'idle': idle, 'in_use': opened - idle}
+
+    def close_all(self):
+        """Close idle connections (used on shutdown)"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close_for_real()
+            with self._lock:
+                self._opened -= 1
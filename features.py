@@ -0,0 +1,61 @@
+"""Vectorized feature pipeline for the WeatherAI model.
+
+Features and next-step targets are built from whole column arrays instead of
+walking a DataFrame row by row, so building the training matrix stays a
+handful of NumPy operations regardless of how much history is loaded.
+"""
+import numpy as np
+
+# Column order of the feature matrix; keep in sync with WeatherAI.predict
+FEATURE_COLUMNS = ['temperature', 'humidity', 'pressure', 'wind_speed',
+                   'hour', 'day_of_week', 'month']
+
+# Pressure is stored in hPa and scaled down to the range of the other inputs
+PRESSURE_SCALE = 100
+
+
+def column_arrays(historical_data):
+    """Return a dict of float64 arrays, one per feature column.
+
+    Accepts a structured array (as returned by get_historical_weather), a
+    list of row dicts, a pandas DataFrame or any mapping of column name ->
+    sequence.
+    """
+    if isinstance(historical_data, list):
+        # np.array (not fromiter) so missing readings become NaN like in pandas
+        return {
+            column: np.array([row[column] for row in historical_data], dtype=np.float64)
+            for column in FEATURE_COLUMNS
+        }
+    return {
+        column: np.asarray(historical_data[column], dtype=np.float64)
+        for column in FEATURE_COLUMNS
+    }
+
+
+def build_features(historical_data):
+    """Build (X, y) where row i holds reading i and y[i] is the temperature of reading i + 1"""
+    columns = column_arrays(historical_data)
+    n_rows = len(columns['temperature'])
+    if n_rows < 2:
+        return (np.empty((0, len(FEATURE_COLUMNS))), np.empty(0))
+
+    X = np.empty((n_rows - 1, len(FEATURE_COLUMNS)), dtype=np.float64)
+    for i, column in enumerate(FEATURE_COLUMNS):
+        X[:, i] = columns[column][:-1]
+    X[:, 2] /= PRESSURE_SCALE
+
+    y = columns['temperature'][1:].copy()
+    return X, y
+
+
+def build_prediction_features(readings, now):
+    """Feature matrix for current readings of many locations, one row per reading"""
+    X = np.empty((len(readings), len(FEATURE_COLUMNS)), dtype=np.float64)
+    for i, column in enumerate(FEATURE_COLUMNS[:4]):
+        X[:, i] = [reading[column] for reading in readings]
+    X[:, 2] /= PRESSURE_SCALE
+    X[:, 4] = now.hour
+    X[:, 5] = now.weekday()
+    X[:, 6] = now.month
+    return X
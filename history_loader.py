@@ -0,0 +1,68 @@
+"""NumPy-native loader for weather history.
+
+Cursor rows are streamed in chunks straight into a preallocated structured
+array; no DataFrame and no per-row dicts are built. Calendar features (hour,
+day of week, month) are derived from the recorded_at column with vectorized
+datetime64 arithmetic instead of per-row strftime() calls in SQL.
+
+The returned array can be indexed by column name, so it plugs directly into
+features.build_features().
+"""
+import numpy as np
+
+# Columns as they come out of the loader queries in queries.py
+RAW_DTYPE = np.dtype([
+    ('data_id', np.int64),
+    ('temperature', np.float64),
+    ('humidity', np.float64),
+    ('pressure', np.float64),
+    ('wind_speed', np.float64),
+    ('recorded_at', 'datetime64[s]'),
+])
+
+WEATHER_DTYPE = np.dtype(RAW_DTYPE.descr + [
+    ('hour', np.int64),
+    ('day_of_week', np.int64),  # 0 = Sunday, like SQLite's strftime('%w')
+    ('month', np.int64),
+])
+
+CHUNK_SIZE = 8192
+
+
+def calendar_features(recorded_at):
+    """(hour, day_of_week, month) arrays for a datetime64 array"""
+    days = recorded_at.astype('datetime64[D]')
+    hour = (recorded_at - days).astype('timedelta64[h]').astype(np.int64)
+    # 1970-01-01 was a Thursday (4 with Sunday = 0)
+    day_of_week = (days.astype(np.int64) + 4) % 7
+    month = recorded_at.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    return hour, day_of_week, month
+
+
+def load_weather_arrays(conn, sql, count_sql, params, chunk_size=CHUNK_SIZE):
+    """Run sql (selecting RAW_DTYPE columns) and return a WEATHER_DTYPE structured array"""
+    expected = conn.execute(count_sql, params).fetchone()[0]
+    out = np.empty(expected, dtype=WEATHER_DTYPE)
+
+    cursor = conn.cursor()
+    cursor.row_factory = None  # plain tuples even on Row-factory connections
+    cursor.execute(sql, params)
+
+    filled = 0
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        block = np.array(rows, dtype=RAW_DTYPE)
+        end = filled + len(block)
+        if end > len(out):
+            # Rows were inserted between the count and the select
+            out = np.resize(out, max(end, 2 * len(out)))
+        for name in RAW_DTYPE.names:
+            out[name][filled:end] = block[name]
+        filled = end
+    cursor.close()
+
+    out = out[:filled]
+    out['hour'], out['day_of_week'], out['month'] = calendar_features(out['recorded_at'])
+    return out
@@ -0,0 +1,221 @@
+"""Write-behind ingestion for weather readings.
+
+store_weather_data() only appends a row to an in-memory buffer. A writer
+thread flushes the buffer with a single executemany() inside one
+transaction whenever it reaches `batch_size` rows or `flush_interval`
+seconds have passed, so one fsync covers a whole batch instead of a row.
+
+A batch that hits a transient error (sqlite3.OperationalError: database
+locked, pool exhausted, I/O) is retried on the next flushes, at most
+`max_retries` times. When a row is rejected (IntegrityError, malformed row)
+the batch is written row by row so the good rows go in; rejected rows and
+batches that ran out of retries go to the ingestion_dead_letter table (or
+the log when even that cannot be written), never back into the queue.
+"""
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# Errors worth retrying: the same rows may go in once the database is free
+TRANSIENT_ERRORS = (sqlite3.OperationalError,)
+
+DEAD_LETTER_SQL = 'INSERT INTO ingestion_dead_letter (row, error) VALUES (?, ?)'
+
+
+class WriteBehindQueue:
+    def __init__(self, connect, insert_sql, batch_size=500, flush_interval=2.0, max_rows=100000,
+                 max_retries=3, dead_letter_sql=DEAD_LETTER_SQL):
+        self.connect = connect
+        self.insert_sql = insert_sql
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.max_retries = max_retries
+        self.dead_letter_sql = dead_letter_sql
+
+        self._rows = []
+        self._retries = []  # (rows, retries so far) of batches that hit a transient error
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()  # one batch written at a time
+        self._thread = None
+        self._stopping = False
+
+        self.rows_written = 0
+        self.batches_written = 0
+        self.write_errors = 0
+        self.dead_lettered = 0
+        self.last_batch_size = 0
+        self.last_flush_at = None
+        self.last_flush_seconds = 0.0
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name='ingestion-writer', daemon=True)
+                self._thread.start()
+
+    def put(self, row):
+        self.put_many([row])
+
+    def put_many(self, rows):
+        """Buffer rows for the next flush; blocks while the buffer is full"""
+        if self._thread is None:
+            self.start()
+        with self._cond:
+            for row in rows:
+                while len(self._rows) >= self.max_rows and not self._stopping:
+                    self._cond.notify_all()
+                    self._cond.wait(1.0)
+                self._rows.append(row)
+            if len(self._rows) >= self.batch_size:
+                self._cond.notify_all()
+
+    def flush(self):
+        """Write everything buffered so far on the calling thread"""
+        with self._write_lock:
+            with self._cond:
+                rows, self._rows = self._rows, []
+                retries, self._retries = self._retries, []
+                self._cond.notify_all()
+            # Retried batches first, so readings keep their order
+            for batch, attempts in retries:
+                self._write(batch, attempts)
+            if self._retries:
+                # Still failing: newer rows wait in the buffer (bounded by max_rows)
+                with self._cond:
+                    self._rows = rows + self._rows
+                return
+            if rows:
+                self._write(rows)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._rows) < self.batch_size and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                break
+
+    def _connect(self):
+        try:
+            return self.connect()
+        except Exception as e:
+            print(f"Database connection error: {e}")
+            return None
+
+    def _write(self, rows, attempts=0):
+        start = time.perf_counter()
+        conn = self._connect()
+        if conn is None:
+            self._retry(rows, attempts, 'no database connection')
+            return
+        try:
+            try:
+                with conn:
+                    conn.executemany(self.insert_sql, rows)
+                written, rejected = len(rows), []
+            except TRANSIENT_ERRORS:
+                raise
+            except Exception as e:
+                # One bad row fails the whole statement; find it row by row
+                print(f"Data storage error: {e}; writing {len(rows)} rows one at a time")
+                self.write_errors += 1
+                written, rejected = self._write_rows(conn, rows)
+            self.rows_written += written
+            self.batches_written += 1
+            self.last_batch_size = written
+            self.last_flush_at = datetime.now().isoformat()
+            self.last_flush_seconds = time.perf_counter() - start
+        except TRANSIENT_ERRORS as e:
+            self._retry(rows, attempts, e)
+            return
+        finally:
+            conn.close()
+        if rejected:
+            self._dead_letter(rejected)
+
+    def _write_rows(self, conn, rows):
+        """Insert rows one statement each in one transaction; returns (written, [(row, error)])"""
+        written, rejected = 0, []
+        with conn:
+            for row in rows:
+                try:
+                    conn.execute(self.insert_sql, row)
+                    written += 1
+                except TRANSIENT_ERRORS:
+                    raise
+                except Exception as e:
+                    rejected.append((row, e))
+        return written, rejected
+
+    def _retry(self, rows, attempts, error):
+        """Keep a batch for the next flush, or dead-letter it once out of retries"""
+        self.write_errors += 1
+        if attempts >= self.max_retries:
+            print(f"Data storage error: {error}; giving up on {len(rows)} rows after {attempts + 1} attempts")
+            self._dead_letter([(row, error) for row in rows])
+            return
+        print(f"Data storage error: {error}; retrying {len(rows)} rows")
+        with self._cond:
+            self._retries.append((rows, attempts + 1))
+
+    def _dead_letter(self, rejected):
+        """Set aside rows that cannot be written: in the dead-letter table, else in the log"""
+        self.dead_lettered += len(rejected)
+        records = [(json.dumps(list(row) if isinstance(row, tuple) else row, default=str), str(error))
+                   for row, error in rejected]
+        if self.dead_letter_sql:
+            conn = self._connect()
+            if conn is not None:
+                try:
+                    with conn:
+                        conn.executemany(self.dead_letter_sql, records)
+                    print(f"⚠️ {len(records)} rows moved to the dead-letter table")
+                    return
+                except Exception as e:
+                    print(f"Dead-letter write error: {e}")
+                finally:
+                    conn.close()
+        for row, error in records:
+            print(f"⚠️ Dropped row {row}: {error}")
+
+    def stop(self):
+        """Flush remaining rows and stop the writer thread"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=30)
+        self._thread = None
+        self.flush()
+        # Batches still waiting for a retry get their remaining attempts now
+        while self._retries:
+            self.flush()
+
+    def stats(self):
+        with self._cond:
+            depth = len(self._rows)
+        return {
+            'queue_depth': depth,
+            'max_rows': self.max_rows,
+            'batch_size': self.batch_size,
+            'flush_interval_seconds': self.flush_interval,
+            'rows_written': self.rows_written,
+            'batches_written': self.batches_written,
+            'write_errors': self.write_errors,
+            'retry_batches': len(self._retries),
+            'dead_lettered': self.dead_lettered,
+            'last_batch_size': self.last_batch_size,
+            'last_flush_at': self.last_flush_at,
+            'last_flush_ms': round(self.last_flush_seconds * 1000, 2),
+        }
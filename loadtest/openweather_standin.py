@@ -0,0 +1,138 @@
+"""Local stand-in for the OpenWeatherMap current weather endpoint.
+
+Serves GET /data/2.5/weather?q=<location>&appid=<key>&units=metric with a
+payload shaped like the real API, so the fetch engine can be exercised
+without network access or an API key:
+
+    python loadtest/openweather_standin.py --port 8081 --latency 0.2 --error-rate 0.05
+    OPENWEATHER_URL=http://127.0.0.1:8081/data/2.5/weather \\
+    OPENWEATHER_API_KEY=standin python app_clean.py
+
+--error-rate makes that fraction of requests fail with HTTP 500, like an
+upstream outage. It can also be started in-process with
+StandinServer(...).start().
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+WEATHER_PATH = '/data/2.5/weather'
+CONDITIONS = ['Clear', 'Clouds', 'Rain', 'Drizzle', 'Thunderstorm', 'Snow', 'Mist']
+
+
+def standin_payload(location, now=None):
+    """Deterministic per-location weather that drifts slowly over time"""
+    now = now or time.time()
+    seed = zlib.crc32(location.encode('utf-8'))
+    drift = ((now / 600) + seed) % 20 / 10 - 1  # -1 .. 1, changes every few minutes
+    return {
+        'name': location,
+        'dt': int(now),
+        'main': {
+            'temp': round(5 + seed % 25 + drift * 2, 2),
+            'humidity': 40 + seed % 55,
+            'pressure': 995 + seed % 35,
+        },
+        'wind': {'speed': round(1 + seed % 12 + abs(drift), 2)},
+        'weather': [{'main': CONDITIONS[seed % len(CONDITIONS)]}],
+    }
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        with server.stats_lock:
+            server.requests += 1
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if url.path != WEATHER_PATH:
+            return self._send(404, {'cod': '404', 'message': 'Not found'})
+        if not query.get('appid'):
+            return self._send(401, {'cod': 401, 'message': 'Invalid API key'})
+        if not query.get('q'):
+            return self._send(400, {'cod': '400', 'message': 'Nothing to geocode'})
+        if server.error_rate and random.random() < server.error_rate:
+            with server.stats_lock:
+                server.errors += 1
+            return self._send(500, {'cod': 500, 'message': 'Internal error'})
+
+        self._send(200, standin_payload(query['q'][0]))
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, error_rate=0.0, verbose=False):
+        super().__init__((host, port), StandinHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.verbose = verbose
+        self.requests = 0
+        self.errors = 0
+        self.stats_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}{WEATHER_PATH}'
+
+    def start(self):
+        """Serve on a background thread; returns self"""
+        self._thread = threading.Thread(target=self.serve_forever, name='openweather-standin',
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OpenWeatherMap API stand-in')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds added to every response')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of requests answered with HTTP 500')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    server = StandinServer(args.host, args.port, latency=args.latency, error_rate=args.error_rate,
+                           verbose=args.verbose)
+    print(f"🌤️ OpenWeatherMap stand-in serving {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""Run app_clean.py against the OpenWeatherMap stand-in and a client swarm.
+
+Usage:
+    python loadtest/run_loadtest.py [--clients 200] [--ramp 20] [--duration 60]
+                                    [--latency 0.05] [--error-rate 0.02]
+                                    [--env POLL_MIN_INTERVAL=5 ...] [--output report.json]
+
+The driver starts the stand-in in-process, launches app_clean.py as a
+separate server process (temporary working directory and DATABASE_PATH,
+PORT, DEBUG=false, upstream pointed at the stand-in, fast polling so pushes
+happen during a short run) and waits for /api/status. While the swarm from
+socket_swarm.py runs it samples the server's CPU and RSS from /proc. The
+report combines connection capacity, push and request latency percentiles,
+server CPU/RSS and the server's own /api/status counters.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from openweather_standin import StandinServer  # noqa: E402
+from socket_swarm import run_swarm  # noqa: E402
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app_clean.py')
+
+# Server settings for a load test: frequent polling of the watched locations
+# and no upstream budget in the way (the stand-in has no quota)
+SERVER_ENV = {
+    'DEBUG': 'false',
+    'OPENWEATHER_API_KEY': 'standin',
+    'OPENWEATHER_CALLS_PER_MINUTE': '100000',
+    'POLL_TICK': '1',
+    'POLL_MIN_INTERVAL': '2',
+    'POLL_WATCHED_MAX_INTERVAL': '5',
+}
+
+
+class ProcessSampler:
+    """CPU and RSS of a process, sampled from /proc (Linux only)"""
+
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.ticks = os.sysconf('SC_CLK_TCK')
+        self.cpu = []
+        self.rss = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='proc-sampler', daemon=True)
+
+    def _cpu_seconds(self):
+        with open(f'/proc/{self.pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        # utime and stime are fields 14 and 15 of the whole line
+        return (int(fields[11]) + int(fields[12])) / self.ticks
+
+    def _rss_bytes(self):
+        with open(f'/proc/{self.pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def _run(self):
+        last_cpu, last_at = self._cpu_seconds(), time.monotonic()
+        while not self._stop.wait(self.interval):
+            try:
+                cpu, now = self._cpu_seconds(), time.monotonic()
+                self.cpu.append((cpu - last_cpu) / (now - last_at) * 100)
+                self.rss.append(self._rss_bytes())
+                last_cpu, last_at = cpu, now
+            except (OSError, IndexError, ValueError):
+                break
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def report(self):
+        if not self.cpu:
+            return None
+        return {
+            'samples': len(self.cpu),
+            'cpu_percent_mean': round(sum(self.cpu) / len(self.cpu), 1),
+            'cpu_percent_max': round(max(self.cpu), 1),
+            'rss_mb_start': round(self.rss[0] / 2 ** 20, 1),
+            'rss_mb_max': round(max(self.rss) / 2 ** 20, 1),
+        }
+
+
+def wait_ready(url, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with status {process.returncode}')
+        try:
+            if requests.get(f'{url}/api/status', timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f'server not ready after {timeout}s')
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def print_report(report):
+    swarm, server = report['swarm'], report['server']
+    print(f"\n👥 Clients: {swarm['connected']}/{swarm['clients']} connected, "
+          f"{swarm['connect_failures']} failed, max concurrent {swarm['max_concurrent']}, "
+          f"transports {swarm['transports']}")
+    for name in ('connect', 'push_latency', 'request_round_trip'):
+        stats = swarm[name]
+        if stats:
+            print(f"⏱️ {name:>18}: p50 {stats['p50_ms']:>8.1f}ms  p95 {stats['p95_ms']:>8.1f}ms  "
+                  f"p99 {stats['p99_ms']:>8.1f}ms  max {stats['max_ms']:>8.1f}ms  (n={stats['count']})")
+        else:
+            print(f"⏱️ {name:>18}: no samples")
+    print(f"⚠️ Request timeouts: {swarm['request_timeouts']}, "
+          f"unexpected disconnects: {swarm['unexpected_disconnects']}")
+    if server:
+        print(f"🖥️ Server CPU: mean {server['cpu_percent_mean']}% max {server['cpu_percent_max']}%, "
+              f"RSS {server['rss_mb_start']} -> max {server['rss_mb_max']} MB")
+    standin = report['standin']
+    print(f"🌤️ Stand-in: {standin['requests']} requests, {standin['errors']} injected errors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765, help='port of the app server')
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--ramp', type=float, default=20.0, help='new clients per second')
+    parser.add_argument('--duration', type=float, default=60.0, help='seconds to run after the last connect')
+    parser.add_argument('--locations', type=int, default=20)
+    parser.add_argument('--per-client', type=int, default=3)
+    parser.add_argument('--request-interval', type=float, default=5.0)
+    parser.add_argument('--latency', type=float, default=0.05, help='stand-in seconds per response')
+    parser.add_argument('--error-rate', type=float, default=0.02, help='stand-in fraction of HTTP 500s')
+    parser.add_argument('--startup-timeout', type=float, default=120.0)
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='extra server environment, e.g. POLL_MIN_INTERVAL=5')
+    parser.add_argument('--output', help='write the report as JSON')
+    args = parser.parse_args()
+
+    standin = StandinServer(latency=args.latency, error_rate=args.error_rate).start()
+    workdir = tempfile.mkdtemp(prefix='weather-loadtest-')
+    env = dict(os.environ, **SERVER_ENV,
+               OPENWEATHER_URL=standin.url,
+               DATABASE_PATH=os.path.join(workdir, 'loadtest.db'),
+               PORT=str(args.port))
+    env.update(item.split('=', 1) for item in args.env)
+    url = f'http://127.0.0.1:{args.port}'
+
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    process = subprocess.Popen([sys.executable, APP], cwd=workdir, env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    sampler = None
+    try:
+        print(f"🚀 Starting server (pid {process.pid}) on {url}, upstream {standin.url}")
+        wait_ready(url, process, args.startup_timeout)
+        sampler = ProcessSampler(process.pid).start()
+        print(f"👥 {args.clients} clients at {args.ramp}/s, then {args.duration}s of traffic")
+        swarm = run_swarm(url, args.clients, args.ramp, args.duration, args.locations,
+                          args.per_client, args.request_interval)
+        sampler.stop()
+        try:
+            status = requests.get(f'{url}/api/status', timeout=5).json()
+        except (requests.RequestException, ValueError):
+            status = None
+
+        report = {
+            'config': vars(args),
+            'swarm': swarm,
+            'server': sampler.report(),
+            'standin': {'requests': standin.requests, 'errors': standin.errors},
+            'server_status': status,
+        }
+        print_report(report)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"📝 Report written to {args.output}")
+    except Exception as e:
+        print(f"❌ Load test failed: {e}")
+        log.flush()
+        with open(log.name) as f:
+            print(f.read()[-3000:])
+        sys.exit(1)
+    finally:
+        if sampler is not None:
+            sampler.stop()
+        stop_server(process)
+        log.close()
+        standin.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
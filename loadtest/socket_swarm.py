@@ -0,0 +1,196 @@
+"""Swarm of simulated Socket.IO clients for load testing.
+
+Each client connects, subscribes to a few locations and then, until the
+run ends, emits 'request_weather' every --request-interval seconds and
+waits for the 'weather_response'. It records:
+
+- connect time, and whether the connection succeeded
+- request round trip ('request_weather' -> 'weather_response')
+- push latency of every 'weather_delta' carrying a new reading: receive
+  time minus the reading's timestamp (taken when the server fetched it),
+  so it covers storage, prediction, fan-out and delivery
+
+Clients connect at --ramp per second so the connection capacity shows up as
+the point where connects start failing or slowing down.
+
+    python loadtest/socket_swarm.py --url http://127.0.0.1:8000 --clients 200 --duration 60
+
+python-socketio uses long-polling unless websocket-client is installed
+(pip install websocket-client); the report counts clients per transport.
+"""
+import argparse
+import importlib.util
+import json
+import random
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import socketio
+
+# Upgrading to WebSocket needs websocket-client; without it stay on polling
+TRANSPORTS = ['polling', 'websocket'] if importlib.util.find_spec('websocket') else ['polling']
+
+
+def percentiles(samples):
+    """p50/p95/p99/max in ms of samples in seconds, None without samples"""
+    if not samples:
+        return None
+    samples = np.array(samples) * 1000
+    return {
+        'count': len(samples),
+        'p50_ms': round(float(np.percentile(samples, 50)), 2),
+        'p95_ms': round(float(np.percentile(samples, 95)), 2),
+        'p99_ms': round(float(np.percentile(samples, 99)), 2),
+        'max_ms': round(float(samples.max()), 2),
+    }
+
+
+class SwarmStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connect_times = []
+        self.connect_failures = 0
+        self.disconnects = 0
+        self.connected = 0
+        self.max_connected = 0
+        self.push_latencies = []
+        self.snapshots = 0
+        self.round_trips = []
+        self.request_timeouts = 0
+        self.transports = {}
+
+    def add(self, name, value):
+        with self.lock:
+            getattr(self, name).append(value)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def on_connected(self, seconds, transport):
+        with self.lock:
+            self.connect_times.append(seconds)
+            self.connected += 1
+            self.max_connected = max(self.max_connected, self.connected)
+            self.transports[transport] = self.transports.get(transport, 0) + 1
+
+    def report(self, requested):
+        with self.lock:
+            return {
+                'clients': requested,
+                'connected': len(self.connect_times),
+                'connect_failures': self.connect_failures,
+                'max_concurrent': self.max_connected,
+                'unexpected_disconnects': self.disconnects,
+                'transports': dict(self.transports),
+                'connect': percentiles(self.connect_times),
+                'push_latency': percentiles(self.push_latencies),
+                'snapshots': self.snapshots,
+                'request_round_trip': percentiles(self.round_trips),
+                'request_timeouts': self.request_timeouts,
+            }
+
+
+class SwarmClient:
+    def __init__(self, url, locations, stats, request_interval, timeout=10.0):
+        self.url = url
+        self.locations = locations
+        self.stats = stats
+        self.request_interval = request_interval
+        self.timeout = timeout
+        self.sio = socketio.Client(reconnection=False)
+        self.response = threading.Event()
+        self.closing = False
+
+        self.sio.on('weather_snapshot', self.on_snapshot)
+        self.sio.on('weather_delta', self.on_delta)
+        self.sio.on('weather_response', self.on_response)
+        self.sio.on('disconnect', self.on_disconnect)
+
+    def on_snapshot(self, data):
+        self.stats.count('snapshots')
+
+    def on_delta(self, data):
+        received = datetime.now()
+        timestamp = (data.get('changes', {}).get('data') or {}).get('timestamp')
+        if timestamp:
+            self.stats.add('push_latencies', (received - datetime.fromisoformat(timestamp)).total_seconds())
+
+    def on_response(self, data):
+        self.response.set()
+
+    def on_disconnect(self, *args):
+        self.stats.count('connected', -1)
+        if not self.closing:
+            self.stats.count('disconnects')
+
+    def run(self, until):
+        start = time.perf_counter()
+        try:
+            self.sio.connect(self.url, transports=TRANSPORTS, wait_timeout=self.timeout)
+        except Exception:
+            self.stats.count('connect_failures')
+            return
+        self.stats.on_connected(time.perf_counter() - start, self.sio.transport())
+        try:
+            self.sio.emit('subscribe', {'locations': self.locations})
+            # Spread requests so the clients do not fire in lockstep
+            time.sleep(random.uniform(0, self.request_interval))
+            while time.monotonic() < until and self.sio.connected:
+                self.response.clear()
+                sent = time.perf_counter()
+                self.sio.emit('request_weather', {'location': random.choice(self.locations)})
+                if self.response.wait(self.timeout):
+                    self.stats.add('round_trips', time.perf_counter() - sent)
+                else:
+                    self.stats.count('request_timeouts')
+                time.sleep(max(0.0, min(self.request_interval, until - time.monotonic())))
+        except Exception:
+            pass
+        finally:
+            self.closing = True
+            try:
+                self.sio.disconnect()
+            except Exception:
+                pass
+
+
+def run_swarm(url, clients=100, ramp=20.0, duration=30.0, locations=20, per_client=3,
+              request_interval=5.0):
+    """Run the swarm and return its report; `duration` counts from the last connect"""
+    stats = SwarmStats()
+    names = [f'LoadCity{i}' for i in range(locations)]
+    until = time.monotonic() + clients / ramp + duration
+    threads = []
+    for i in range(clients):
+        client = SwarmClient(url, random.sample(names, min(per_client, len(names))), stats,
+                             request_interval)
+        thread = threading.Thread(target=client.run, args=(until,), name=f'swarm-{i}', daemon=True)
+        thread.start()
+        threads.append(thread)
+        time.sleep(1 / ramp)
+    for thread in threads:
+        thread.join(max(0.0, until - time.monotonic()) + 15)
+    return stats.report(clients)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--ramp', type=float, default=20.0, help='new clients per second')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to run after the last connect')
+    parser.add_argument('--locations', type=int, default=20, help='distinct locations in the swarm')
+    parser.add_argument('--per-client', type=int, default=3, help='locations each client subscribes to')
+    parser.add_argument('--request-interval', type=float, default=5.0)
+    args = parser.parse_args()
+
+    report = run_swarm(args.url, args.clients, args.ramp, args.duration, args.locations,
+                       args.per_client, args.request_interval)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
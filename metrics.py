@@ -0,0 +1,230 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms are kept in plain Python objects and
+rendered on demand by MetricsRegistry.render() (served on /metrics). An
+observation is a bisect over the bucket bounds plus two additions under a
+lock, about a microsecond including the timer, so the instrumentation stays
+on in production. Gauges can read their value from a callback at scrape time, so
+queue depths and client counts cost nothing between scrapes.
+"""
+import bisect
+import threading
+import time
+
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_SUBMITTED
+
+# Seconds; covers sub-millisecond queries up to multi-minute training runs
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Child metric for one combination of label values"""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _default(self):
+        # Metrics without labels act as their own single child
+        return self.labels()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def _render_child(self, values, child):
+        yield f'{self.name}_total{_label_text(self.labelnames, values)} {_number(child.value)}'
+
+
+class Gauge(_Metric):
+    """Gauge read from a callback at scrape time"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, callback):
+        super().__init__(name, documentation)
+        self.callback = callback
+
+    def render(self):
+        try:
+            value = float(self.callback())
+        except Exception:
+            return []  # subsystem not ready; skip rather than fail the scrape
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge',
+                f'{self.name} {_number(value)}']
+
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum', 'lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot: above the largest bound
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ('child', 'start')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        """Context manager observing the duration of its block"""
+        return self._default().time()
+
+    def _render_child(self, values, child):
+        with child.lock:
+            counts, total = list(child.counts), child.sum
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float('inf'),), counts):
+            cumulative += count
+            le = f'le="{_number(float(bound))}"'
+            yield f'{self.name}_bucket{_label_text(self.labelnames, values, le)} {cumulative}'
+        labels = _label_text(self.labelnames, values)
+        yield f'{self.name}_sum{labels} {_number(total)}'
+        yield f'{self.name}_count{labels} {cumulative}'
+
+
+class MetricsRegistry:
+    def __init__(self, namespace='smart_weather'):
+        self.namespace = namespace
+        self._metrics = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(f'{self.namespace}_{name}', documentation, labelnames))
+
+    def gauge(self, name, documentation, callback):
+        return self._register(Gauge(f'{self.namespace}_{name}', documentation, callback))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(f'{self.namespace}_{name}', documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class QueryTimer:
+    """ConnectionPool observer: query durations by query name ('other' if unnamed)"""
+
+    def __init__(self, histogram, names):
+        self.histogram = histogram
+        self.names = names  # SQL text -> name
+
+    def __call__(self, sql, seconds):
+        self.histogram.labels(self.names.get(sql, 'other')).observe(seconds)
+
+
+def instrument_scheduler(scheduler, lag, runtime, errors):
+    """Record APScheduler job lag (submitted vs scheduled time), run time and failures per job"""
+    started = {}
+
+    def on_submitted(event):
+        now = time.time()
+        started[event.job_id] = time.perf_counter()
+        if event.scheduled_run_times:
+            lag.labels(event.job_id).observe(max(0.0, now - event.scheduled_run_times[-1].timestamp()))
+
+    def on_finished(event):
+        start = started.pop(event.job_id, None)
+        if start is not None:
+            runtime.labels(event.job_id).observe(time.perf_counter() - start)
+        if event.exception is not None:
+            errors.labels(event.job_id).inc()
+
+    scheduler.add_listener(on_submitted, EVENT_JOB_SUBMITTED)
+    scheduler.add_listener(on_finished, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
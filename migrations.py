@@ -0,0 +1,224 @@
+"""Versioned schema migrations and query plan checks.
+
+The schema version is kept in SQLite's ``PRAGMA user_version``. Each
+migration runs in its own write transaction together with the version bump,
+so a database is always at a well defined version, and concurrent processes
+starting at the same time apply every migration exactly once.
+
+    python migrations.py                 # migrate DATABASE_PATH
+    python migrations.py --check-plans   # also verify hot queries use indexes
+"""
+import argparse
+import sqlite3
+import sys
+
+from counters import COUNTER_SCHEMA, LOCATION_COUNTER_SCHEMA
+from queries import HOT_QUERIES
+from rollups import rollup_table_sql
+
+MIGRATIONS = [
+    (1, 'base tables', [
+        '''CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            location TEXT NOT NULL,
+            preferences TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        '''CREATE TABLE IF NOT EXISTS weather_data (
+            data_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            location TEXT NOT NULL,
+            temperature REAL,
+            humidity REAL,
+            pressure REAL,
+            wind_speed REAL,
+            weather_condition TEXT,
+            precipitation REAL,
+            recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        '''CREATE TABLE IF NOT EXISTS user_activities (
+            activity_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            activity_type TEXT,
+            weather_condition TEXT,
+            duration_minutes INTEGER,
+            satisfaction_rating INTEGER,
+            activity_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            notes TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS weather_alerts (
+            alert_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            alert_type TEXT,
+            severity TEXT,
+            message TEXT,
+            trigger_conditions TEXT,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )''',
+    ]),
+    (2, 'hot query indexes', [
+        # get_historical_weather, profile weather history
+        'CREATE INDEX IF NOT EXISTS idx_weather_data_location_time ON weather_data (location, recorded_at)',
+        # incremental training: readings past the watermark
+        'CREATE INDEX IF NOT EXISTS idx_weather_data_location_id ON weather_data (location, data_id)',
+        # dashboard recent weather
+        'CREATE INDEX IF NOT EXISTS idx_weather_data_time ON weather_data (recorded_at)',
+        # /users location filter
+        'CREATE INDEX IF NOT EXISTS idx_users_location ON users (location)',
+        # profile activities, /users activity counts
+        'CREATE INDEX IF NOT EXISTS idx_user_activities_user_date ON user_activities (user_id, activity_date)',
+        # dashboard recent activities
+        'CREATE INDEX IF NOT EXISTS idx_user_activities_date ON user_activities (activity_date)',
+        # profile alerts
+        'CREATE INDEX IF NOT EXISTS idx_weather_alerts_user_created ON weather_alerts (user_id, created_at)',
+        # active alert counts and the /users join
+        'CREATE INDEX IF NOT EXISTS idx_weather_alerts_active_user ON weather_alerts (is_active, user_id)',
+    ]),
+    (3, 'weather rollups', [
+        rollup_table_sql('weather_hourly'),
+        rollup_table_sql('weather_daily'),
+        '''CREATE TABLE IF NOT EXISTS rollup_state (
+            name TEXT PRIMARY KEY,
+            last_data_id INTEGER NOT NULL
+        )''',
+    ]),
+    (4, 'dashboard counters', COUNTER_SCHEMA),
+    (5, 'cluster leases', [
+        # cluster.LeaderLease: which worker runs the scheduled jobs, and until when
+        '''CREATE TABLE IF NOT EXISTS cluster_leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )''',
+    ]),
+    (6, 'shared call budget', [
+        # poller.SharedTokenBucket: upstream API tokens left, shared by all workers
+        '''CREATE TABLE IF NOT EXISTS call_budget (
+            name TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )''',
+    ]),
+    # Scheduler poll list without scanning users (counters.py)
+    (7, 'location counters', LOCATION_COUNTER_SCHEMA),
+    (8, 'user search index', [
+        # /users ?q= substring search (queries.users_page_sql); external content, so
+        # the triggers keep it in step with users
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS users_search USING fts5(
+            username, email, content='users', content_rowid='user_id', tokenize='trigram'
+        )''',
+        '''CREATE TRIGGER IF NOT EXISTS users_search_insert AFTER INSERT ON users BEGIN
+            INSERT INTO users_search (rowid, username, email) VALUES (NEW.user_id, NEW.username, NEW.email);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS users_search_delete AFTER DELETE ON users BEGIN
+            INSERT INTO users_search (users_search, rowid, username, email)
+            VALUES ('delete', OLD.user_id, OLD.username, OLD.email);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS users_search_update AFTER UPDATE OF username, email ON users BEGIN
+            INSERT INTO users_search (users_search, rowid, username, email)
+            VALUES ('delete', OLD.user_id, OLD.username, OLD.email);
+            INSERT INTO users_search (rowid, username, email) VALUES (NEW.user_id, NEW.username, NEW.email);
+        END''',
+        "INSERT INTO users_search (users_search) VALUES ('rebuild')",
+    ]),
+    (9, 'ingestion dead letter', [
+        # ingestion.WriteBehindQueue: rows rejected by the database or out of retries
+        '''CREATE TABLE IF NOT EXISTS ingestion_dead_letter (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            row TEXT NOT NULL,
+            error TEXT,
+            failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn):
+    """Apply pending migrations. Returns the list of applied version numbers"""
+    applied = []
+    for version, name, statements in MIGRATIONS:
+        if schema_version(conn) >= version:
+            continue
+        # IMMEDIATE takes the write lock before re-checking the version, so
+        # another process migrating concurrently cannot apply it twice
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"🗄️ Applied schema migration {version}: {name}")
+        applied.append(version)
+    return applied
+
+
+def explain(conn, sql, params=()):
+    """EXPLAIN QUERY PLAN detail lines for a statement"""
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+
+
+def plan_problems(plan, allowed=()):
+    """Plan steps that read a whole table or index, or sort without an index.
+
+    A SCAN through an index still visits every entry (SQLite only stops early
+    for ORDER BY ... LIMIT), so those need an explicit entry in `allowed` too.
+    """
+    problems = []
+    for step in plan:
+        full_scan = step.startswith('SCAN')
+        temp_sort = step.startswith('USE TEMP B-TREE')
+        if (full_scan or temp_sort) and not any(allow in step for allow in allowed):
+            problems.append(step)
+    return problems
+
+
+def check_query_plans(conn, queries=HOT_QUERIES):
+    """Map of query name -> offending plan steps, for queries not served by an index"""
+    failures = {}
+    for name, (sql, params, allowed) in queries.items():
+        problems = plan_problems(explain(conn, sql, params), allowed)
+        if problems:
+            failures[name] = problems
+    return failures
+
+
+def main():
+    from db import DB_PATH
+
+    parser = argparse.ArgumentParser(description='Migrate the Smart Weather database')
+    parser.add_argument('--db', default=DB_PATH, help='database file (default: DATABASE_PATH)')
+    parser.add_argument('--check-plans', action='store_true',
+                        help='fail if a hot query is not served by an index')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    migrate(conn)
+    print(f"Schema version {schema_version(conn)}")
+
+    if args.check_plans:
+        failures = check_query_plans(conn)
+        for name, (sql, params, allowed) in HOT_QUERIES.items():
+            status = 'FAIL' if name in failures else 'ok'
+            print(f"{status:>4}  {name}: {' | '.join(explain(conn, sql, params))}")
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Versioned on-disk registry for trained WeatherAI models.
+
+Layout::
+
+    models/registry/
+        CURRENT             name of the live version, e.g. "v000007"
+        v000006/            model.joblib, scaler.joblib, manifest.json
+        v000007/
+
+A version is written into a private temporary directory and renamed into
+place only once every file is on disk, then CURRENT is switched with an
+atomic replace. A crash mid-publish leaves at most an orphaned temporary
+directory, removed at startup or after the next publish once it is older
+than ORPHAN_GRACE_SECONDS; readers always see a complete version. Artifacts
+are stored uncompressed so they can be opened with ``mmap_mode``. joblib
+(and, through unpickling, scikit-learn) is only imported when a model is
+saved or loaded.
+
+Memory-mapping does not make workers share a model: scikit-learn copies each
+tree's node and value arrays into private buffers when it unpickles them, so
+every process holds its own copy of the forest. It only saves the temporary
+read buffer, about half the per-worker memory right after a load
+(benchmarks/bench_model_load.py).
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+MODEL_FILE = 'model.joblib'
+SCALER_FILE = 'scaler.joblib'
+MANIFEST_FILE = 'manifest.json'
+CURRENT_FILE = 'CURRENT'
+TMP_PREFIX = '.tmp-'
+# Younger temporary files may belong to a publish still running in another process
+ORPHAN_GRACE_SECONDS = 3600
+
+
+def _fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class ModelRegistry:
+    def __init__(self, root, keep_versions=5):
+        self.root = root
+        self.keep_versions = keep_versions
+        os.makedirs(root, exist_ok=True)
+        self.remove_orphans()
+
+    def versions(self):
+        """Published version names, oldest first"""
+        return sorted(name for name in os.listdir(self.root)
+                      if name.startswith('v') and name[1:].isdigit())
+
+    def current_version(self):
+        """Name of the live version, or None when nothing has been published"""
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE)) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version if os.path.isdir(os.path.join(self.root, version)) else None
+
+    def manifest(self, version=None):
+        version = version or self.current_version()
+        if version is None:
+            return None
+        with open(os.path.join(self.root, version, MANIFEST_FILE)) as f:
+            return json.load(f)
+
+    def publish(self, model, scaler, metadata):
+        """Write a new version and make it current. Returns the version name"""
+        tmp_dir = tempfile.mkdtemp(prefix=TMP_PREFIX, dir=self.root)
+        try:
+            os.chmod(tmp_dir, 0o755)
+            import joblib
+            joblib.dump(model, os.path.join(tmp_dir, MODEL_FILE))
+            joblib.dump(scaler, os.path.join(tmp_dir, SCALER_FILE))
+
+            while True:
+                existing = self.versions()
+                number = int(existing[-1][1:]) + 1 if existing else 1
+                version = f'v{number:06d}'
+                manifest = dict(metadata, version=version,
+                                published_at=datetime.now().isoformat())
+                with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+                    json.dump(manifest, f, indent=2)
+
+                for name in (MODEL_FILE, SCALER_FILE, MANIFEST_FILE):
+                    _fsync_path(os.path.join(tmp_dir, name))
+                try:
+                    os.rename(tmp_dir, os.path.join(self.root, version))
+                    break
+                except OSError:
+                    # Another process published this version number first
+                    if not os.path.isdir(os.path.join(self.root, version)):
+                        raise
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        self._set_current(version)
+        self._prune()
+        return version
+
+    def load(self, version=None, mmap_mode='r'):
+        """Load (model, scaler, manifest) of a version, the current one by default.
+
+        With mmap_mode the NumPy arrays are read through a mapping instead of
+        a temporary buffer; the trees are still copied into this process.
+        """
+        version = version or self.current_version()
+        if version is None:
+            return None
+        import joblib
+        path = os.path.join(self.root, version)
+        model = joblib.load(os.path.join(path, MODEL_FILE), mmap_mode=mmap_mode)
+        scaler = joblib.load(os.path.join(path, SCALER_FILE), mmap_mode=mmap_mode)
+        return model, scaler, self.manifest(version)
+
+    def _set_current(self, version):
+        tmp_path = os.path.join(self.root, f'.{CURRENT_FILE}.{os.getpid()}')
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.root, CURRENT_FILE))
+        _fsync_path(self.root)
+
+    def remove_orphans(self, grace=ORPHAN_GRACE_SECONDS):
+        """Delete temporary directories and CURRENT files left by crashed publishes.
+
+        Returns the names removed.
+        """
+        removed = []
+        cutoff = time.time() - grace
+        for name in os.listdir(self.root):
+            if not (name.startswith(TMP_PREFIX) or name.startswith(f'.{CURRENT_FILE}.')):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(path) > cutoff:
+                    continue
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+                removed.append(name)
+            except OSError as e:
+                print(f"⚠️ Could not remove orphaned {path}: {e}")
+        if removed:
+            print(f"🧹 Removed {len(removed)} orphaned model registry files")
+        return removed
+
+    def _prune(self):
+        current = self.current_version()
+        stale = [version for version in self.versions() if version != current]
+        for version in stale[:max(0, len(stale) - (self.keep_versions - 1))]:
+            shutil.rmtree(os.path.join(self.root, version), ignore_errors=True)
+        self.remove_orphans()
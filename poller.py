@@ -0,0 +1,300 @@
+"""Adaptive per-location weather polling within an upstream call budget.
+
+Every location has its own polling interval. After each poll the interval
+shrinks when the reading moved a lot since the previous one and grows when
+it barely changed; locations somebody watches are polled at least every
+`watched_max_interval`, locations nobody watches at most every
+2 * `min_interval`. The next poll time gets +/- `jitter` so locations that
+started together drift apart instead of hitting the API in bursts.
+
+The scheduler ticks often and polls only the locations that are due, as
+many as the TokenBucket allows; the rest stay due (watched and most overdue
+first) and are picked up on a later tick.
+"""
+import random
+import threading
+import time
+
+# Change per metric between two polls that counts as "fast" (score 1.0)
+CHANGE_SCALES = {
+    'temperature': 0.5,
+    'humidity': 5.0,
+    'pressure': 1.0,
+    'wind_speed': 2.0,
+    'precipitation': 0.5,
+}
+
+FAST_CHANGE = 1.0     # score at or above: halve the interval
+STABLE_CHANGE = 0.25  # score below: grow the interval by half
+
+
+class TokenBucket:
+    """Upstream calls per minute, with up to one minute of burst.
+
+    try_consume() grants at most the whole tokens in the bucket and never
+    goes into debt, so the plan's quota holds whoever asks: the scheduler or
+    clients naming arbitrary locations.
+    """
+
+    def __init__(self, calls_per_minute, capacity=None, clock=time.monotonic):
+        self.rate = calls_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else calls_per_minute
+        self.clock = clock
+        self._tokens = float(self.capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self.consumed = 0
+        self.refused = 0
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def available(self):
+        """Whole calls that can be made now without exceeding the budget"""
+        with self._lock:
+            self._refill()
+            return max(int(self._tokens), 0)
+
+    def try_consume(self, calls=1):
+        """Take up to `calls` tokens; returns how many calls were granted"""
+        with self._lock:
+            self._refill()
+            granted = max(0, min(calls, int(self._tokens)))
+            self._tokens -= granted
+            self.consumed += granted
+            self.refused += calls - granted
+            return granted
+
+    def stats(self):
+        with self._lock:
+            self._refill()
+            return {
+                'calls_per_minute': round(self.rate * 60, 2),
+                'tokens': round(self._tokens, 2),
+                'consumed': self.consumed,
+                'refused': self.refused,
+            }
+
+
+class SharedTokenBucket:
+    """TokenBucket kept in SQLite (call_budget), so several workers draw from one quota.
+
+    Every grant is one IMMEDIATE transaction: refill from the wall clock,
+    grant, write back. A database error grants nothing, so the quota holds.
+    """
+
+    def __init__(self, connect, calls_per_minute, capacity=None, name='openweather', clock=time.time):
+        self.connect = connect
+        self.name = name
+        self.rate = calls_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else calls_per_minute
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.consumed = 0
+        self.refused = 0
+
+    def _connect(self):
+        try:
+            return self.connect()
+        except Exception as e:
+            print(f"Call budget error: {e}")
+            return None
+
+    def _tokens(self, conn, now):
+        row = conn.execute('SELECT tokens, updated_at FROM call_budget WHERE name = ?',
+                           (self.name,)).fetchone()
+        if row is None:
+            return float(self.capacity)
+        return min(self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+
+    def available(self):
+        """Whole calls that can be made now without exceeding the budget"""
+        conn = self._connect()
+        if conn is None:
+            return 0
+        try:
+            return max(int(self._tokens(conn, self.clock())), 0)
+        except Exception as e:
+            print(f"Call budget error: {e}")
+            return 0
+        finally:
+            conn.close()
+
+    def try_consume(self, calls=1):
+        """Take up to `calls` tokens; returns how many calls were granted"""
+        conn = self._connect()
+        granted = 0
+        if conn is not None:
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    now = self.clock()
+                    tokens = self._tokens(conn, now)
+                    granted = max(0, min(calls, int(tokens)))
+                    conn.execute('''
+                        INSERT INTO call_budget (name, tokens, updated_at) VALUES (?, ?, ?)
+                        ON CONFLICT (name) DO UPDATE SET tokens = excluded.tokens,
+                                                         updated_at = excluded.updated_at
+                    ''', (self.name, tokens - granted, now))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    granted = 0
+                    raise
+            except Exception as e:
+                print(f"Call budget error: {e}")
+            finally:
+                conn.close()
+        with self._lock:
+            self.consumed += granted
+            self.refused += calls - granted
+        return granted
+
+    def stats(self):
+        conn = self._connect()
+        tokens = None
+        if conn is not None:
+            try:
+                tokens = round(self._tokens(conn, self.clock()), 2)
+            except Exception:
+                pass
+            finally:
+                conn.close()
+        with self._lock:
+            return {
+                'calls_per_minute': round(self.rate * 60, 2),
+                'tokens': tokens,
+                'consumed': self.consumed,
+                'refused': self.refused,
+                'shared': True,
+            }
+
+
+def change_score(previous, reading):
+    """Largest change between two readings, in units of CHANGE_SCALES"""
+    score = 0.0
+    for metric, scale in CHANGE_SCALES.items():
+        old, new = previous.get(metric), reading.get(metric)
+        if isinstance(old, (int, float)) and isinstance(new, (int, float)):
+            score = max(score, abs(new - old) / scale)
+    return score
+
+
+class _Schedule:
+    __slots__ = ('interval', 'next_due', 'last_polled', 'last_reading', 'watched', 'polls')
+
+    def __init__(self, interval, next_due, watched):
+        self.interval = interval
+        self.next_due = next_due
+        self.last_polled = None
+        self.last_reading = None
+        self.watched = watched
+        self.polls = 0
+
+
+class AdaptivePoller:
+    def __init__(self, min_interval=60.0, max_interval=1800.0, watched_max_interval=300.0,
+                 initial_interval=120.0, jitter=0.1, clock=time.monotonic, rng=None):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.watched_max_interval = watched_max_interval
+        self.initial_interval = initial_interval
+        self.jitter = jitter
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self._schedules = {}
+        self._lock = threading.Lock()
+        self.polls = 0
+        self.deferred = 0
+
+    def _bounds(self, watched):
+        if watched:
+            return self.min_interval, self.watched_max_interval
+        return min(2 * self.min_interval, self.max_interval), self.max_interval
+
+    def _clamp(self, interval, watched):
+        low, high = self._bounds(watched)
+        return min(max(interval, low), high)
+
+    def _jittered(self, interval):
+        return interval * self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def sync(self, locations, watched):
+        """Track exactly these locations; `watched` is the subset with subscribers"""
+        now = self.clock()
+        with self._lock:
+            for location in set(self._schedules).difference(locations):
+                del self._schedules[location]
+            for location in locations:
+                is_watched = location in watched
+                schedule = self._schedules.get(location)
+                if schedule is None:
+                    # First poll soon, spread over one minimum interval
+                    self._schedules[location] = _Schedule(
+                        self._clamp(self.initial_interval, is_watched),
+                        now + self.rng.uniform(0, self.min_interval), is_watched)
+                elif schedule.watched != is_watched:
+                    schedule.watched = is_watched
+                    schedule.interval = self._clamp(schedule.interval, is_watched)
+                    if is_watched and schedule.last_polled is not None:
+                        # Someone started watching: do not leave them on a slow schedule
+                        schedule.next_due = min(schedule.next_due,
+                                                schedule.last_polled + schedule.interval)
+
+    def due(self, limit=None):
+        """Locations due for a poll, watched and most overdue first, at most `limit`"""
+        now = self.clock()
+        with self._lock:
+            ready = sorted((not schedule.watched, schedule.next_due, location)
+                           for location, schedule in self._schedules.items() if schedule.next_due <= now)
+            if limit is not None and len(ready) > limit:
+                self.deferred += len(ready) - limit
+                ready = ready[:max(limit, 0)]
+        return [location for _, _, location in ready]
+
+    def record(self, locations, readings):
+        """Adapt the intervals of polled locations to how much their readings moved"""
+        now = self.clock()
+        with self._lock:
+            for location, reading in zip(locations, readings):
+                schedule = self._schedules.get(location)
+                if schedule is None or reading is None:
+                    continue
+                interval = schedule.interval
+                if schedule.last_reading is not None:
+                    score = change_score(schedule.last_reading, reading)
+                    if score >= FAST_CHANGE:
+                        interval /= 2
+                    elif score < STABLE_CHANGE:
+                        interval *= 1.5
+                schedule.interval = self._clamp(interval, schedule.watched)
+                schedule.next_due = now + self._jittered(schedule.interval)
+                schedule.last_polled = now
+                schedule.last_reading = reading
+                schedule.polls += 1
+                self.polls += 1
+
+    def intervals(self):
+        with self._lock:
+            return {location: schedule.interval for location, schedule in self._schedules.items()}
+
+    def stats(self):
+        now = self.clock()
+        with self._lock:
+            intervals = sorted(schedule.interval for schedule in self._schedules.values())
+            due = sum(1 for schedule in self._schedules.values() if schedule.next_due <= now)
+            watched = sum(1 for schedule in self._schedules.values() if schedule.watched)
+        return {
+            'locations': len(intervals),
+            'watched': watched,
+            'due': due,
+            'polls': self.polls,
+            'deferred': self.deferred,
+            'interval_seconds': {
+                'min': round(intervals[0], 1),
+                'median': round(intervals[len(intervals) // 2], 1),
+                'max': round(intervals[-1], 1),
+            } if intervals else None,
+        }
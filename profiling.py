@@ -0,0 +1,166 @@
+"""Slow-query log and an on-demand sampling profiler.
+
+SlowQueryLog is a ConnectionPool observer: statements slower than the
+threshold are kept (most recent first, bounded) with their duration and the
+application code that ran them, and printed. sqlite3's trace callback
+reports a statement when it starts, without its duration, so the log hooks
+the timed execute() of pooled connections instead.
+
+SamplingProfiler samples the stacks of all threads (request handlers,
+scheduler jobs, the training dispatcher, ...) with sys._current_frames()
+every `interval` seconds for a bounded window. The result is in the folded
+stack format ("thread;outer;...;inner count" per line) that flamegraph.pl,
+speedscope and inferno read directly. It only sees this process: the forest
+fits run in the training pool's spawned processes, so a capture shows the
+dispatcher waiting on the fit, not the fit itself. Profile those with an
+external sampler attached to the pool process (py-spy record --pid ...).
+
+Both can be switched on and off while the app runs.
+"""
+import collections
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+# Frames from these files are skipped when looking for the code that ran a query
+_INTERNAL_FILES = {os.path.abspath(__file__), os.path.abspath(os.path.join(os.path.dirname(__file__), 'db.py')),
+                   os.path.abspath(os.path.join(os.path.dirname(__file__), 'metrics.py'))}
+
+
+def _caller():
+    """file:line (function) of the innermost frame outside the database plumbing"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if os.path.abspath(path) not in _INTERNAL_FILES and 'sqlite3' not in path:
+            return f'{os.path.basename(path)}:{frame.f_lineno} ({frame.f_code.co_name})'
+        frame = frame.f_back
+    return 'unknown'
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms=100.0, enabled=True, max_entries=200):
+        self.threshold_ms = threshold_ms
+        self.enabled = enabled
+        self._entries = collections.deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+        self.slow_queries = 0
+
+    def __call__(self, sql, seconds):
+        if not self.enabled or seconds * 1000 < self.threshold_ms:
+            return
+        entry = {
+            'at': datetime.now().isoformat(),
+            'duration_ms': round(seconds * 1000, 2),
+            'statement': ' '.join(sql.split())[:1000],
+            'caller': _caller(),
+            'thread': threading.current_thread().name,
+        }
+        with self._lock:
+            self._entries.appendleft(entry)
+            self.slow_queries += 1
+        print(f"🐢 Slow query ({entry['duration_ms']}ms) from {entry['caller']}: {entry['statement'][:200]}")
+
+    def configure(self, enabled=None, threshold_ms=None):
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if threshold_ms is not None:
+            self.threshold_ms = max(0.0, float(threshold_ms))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def entries(self):
+        with self._lock:
+            return list(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {'enabled': self.enabled, 'threshold_ms': self.threshold_ms,
+                    'slow_queries': self.slow_queries, 'kept': len(self._entries)}
+
+
+def _folded_stack(frame, thread_name):
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+        frame = frame.f_back
+    frames.append(thread_name)
+    return ';'.join(reversed(frames))
+
+
+class SamplingProfiler:
+    """Wall-clock stack sampler for every thread, one bounded window at a time"""
+
+    MAX_SECONDS = 300
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._counts = collections.Counter()
+        self.samples = 0
+        self.started_at = None
+        self.finished_at = None
+        self.seconds = 0
+        self.interval = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds=30.0, interval=0.01):
+        """Start a window of `seconds` (capped at MAX_SECONDS); False if one is running"""
+        with self._lock:
+            if self.running:
+                return False
+            self.seconds = min(max(float(seconds), 0.1), self.MAX_SECONDS)
+            self.interval = max(float(interval), 0.001)
+            self._counts = collections.Counter()
+            self.samples = 0
+            self.started_at = datetime.now().isoformat()
+            self.finished_at = None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        deadline = time.monotonic() + self.seconds
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = [_folded_stack(frame, names.get(ident, f'thread-{ident}'))
+                      for ident, frame in sys._current_frames().items() if ident != own]
+            with self._lock:
+                self._counts.update(stacks)
+                self.samples += 1
+            self._stop.wait(self.interval)
+        self.finished_at = datetime.now().isoformat()
+
+    def folded(self):
+        """Collected stacks in the folded format, heaviest first"""
+        with self._lock:
+            counts = self._counts.most_common()
+        return ''.join(f'{stack} {count}\n' for stack, count in counts)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': self.running,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'window_seconds': self.seconds,
+                'interval_ms': round(self.interval * 1000, 2),
+                'samples': self.samples,
+                'distinct_stacks': len(self._counts),
+            }
@@ -0,0 +1,146 @@
+"""Named SQL for the hot read paths of app_clean.py.
+
+Keeping these in one place lets migrations.check_query_plans() verify with
+EXPLAIN QUERY PLAN that every one of them is served by an index.
+"""
+from alerts import ACTIVE_RULES_SQL
+from rollups import HISTORY_SQL
+
+# Training history; columns match history_loader.RAW_DTYPE. The calendar
+# features are derived from recorded_at in NumPy, not with strftime() here.
+HISTORICAL_WEATHER = '''
+    SELECT data_id, temperature, humidity, pressure, wind_speed, recorded_at
+    FROM weather_data
+    WHERE location = ?
+    AND recorded_at >= datetime('now', ?)
+    ORDER BY recorded_at
+'''
+
+HISTORICAL_WEATHER_COUNT = '''
+    SELECT COUNT(*) FROM weather_data
+    WHERE location = ?
+    AND recorded_at >= datetime('now', ?)
+'''
+
+WEATHER_SINCE = '''
+    SELECT data_id, temperature, humidity, pressure, wind_speed, recorded_at
+    FROM weather_data
+    WHERE location = ?
+    AND data_id >= ?
+    ORDER BY data_id
+'''
+
+WEATHER_SINCE_COUNT = '''
+    SELECT COUNT(*) FROM weather_data
+    WHERE location = ?
+    AND data_id >= ?
+'''
+
+# One row per location with users, maintained by triggers (counters.py)
+USER_LOCATIONS = 'SELECT location FROM location_counters'
+
+RECENT_ACTIVITIES = '''
+    SELECT u.username, ua.activity_type, ua.weather_condition, ua.activity_date
+    FROM user_activities ua
+    JOIN users u ON ua.user_id = u.user_id
+    ORDER BY ua.activity_date DESC LIMIT 5
+'''
+
+RECENT_WEATHER = '''
+    SELECT location, temperature, weather_condition, recorded_at
+    FROM weather_data
+    ORDER BY recorded_at DESC
+    LIMIT 3
+'''
+
+
+
+def users_page_sql(by_location=False, search=False):
+    """One keyset page of users with their counts: rows after a user_id cursor, in user_id order.
+
+    Per-user counts come from the trigger-maintained user_counters (counters.py).
+
+    Parameters: cursor, [location], [search phrase], limit. Each page is an
+    index range read, so its cost follows the page size, not the number of users.
+    Searches are driven by the users_search trigram index (migration 8), which
+    returns matches in user_id order; see search_phrase() for the query value.
+    """
+    key = 's.rowid' if search else 'u.user_id'
+    conditions = [f'{key} > ?']
+    if by_location:
+        conditions.append('u.location = ?')
+    if search:
+        conditions.append('users_search MATCH ?')
+    source = 'users_search s JOIN users u ON u.user_id = s.rowid' if search else 'users u'
+    return f'''
+    SELECT u.user_id, u.username, u.email, u.location, u.created_at,
+           c.activity_count, c.alert_count
+    FROM {source}
+    LEFT JOIN user_counters c ON c.user_id = u.user_id
+    WHERE {' AND '.join(conditions)}
+    ORDER BY {key}
+    LIMIT ?
+'''
+
+
+USERS_PAGE = {
+    (by_location, search): users_page_sql(by_location, search)
+    for by_location in (False, True) for search in (False, True)
+}
+
+# The trigram tokenizer indexes 3-character substrings; shorter terms match nothing
+SEARCH_MIN_LENGTH = 3
+
+
+def search_phrase(term):
+    """MATCH value for a case-insensitive substring search of username or email"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+USER_BY_ID = 'SELECT * FROM users WHERE user_id = ?'
+
+USER_ACTIVITIES = '''
+    SELECT * FROM user_activities
+    WHERE user_id = ?
+    ORDER BY activity_date DESC
+    LIMIT 10
+'''
+
+USER_ALERTS = '''
+    SELECT * FROM weather_alerts
+    WHERE user_id = ?
+    ORDER BY created_at DESC
+'''
+
+LOCATION_RECENT_WEATHER = '''
+    SELECT * FROM weather_data
+    WHERE location = ?
+    ORDER BY recorded_at DESC
+    LIMIT 5
+'''
+
+# name -> (sql, sample parameters, plan steps that are expected and allowed)
+# Every allowed SCAN is bounded by something other than the size of a growing table.
+HOT_QUERIES = {
+    'historical_weather': (HISTORICAL_WEATHER, ('London', '-168 hours'), ()),
+    'historical_weather_count': (HISTORICAL_WEATHER_COUNT, ('London', '-168 hours'), ()),
+    'weather_since': (WEATHER_SINCE, ('London', 0), ()),
+    'weather_since_count': (WEATHER_SINCE_COUNT, ('London', 0), ()),
+    # Reads every location, but there is one row per location rather than per user
+    'user_locations': (USER_LOCATIONS, (), ('SCAN location_counters',)),
+    # Walk the date index backwards and stop after LIMIT rows
+    'recent_activities': (RECENT_ACTIVITIES, (), ('SCAN ua USING INDEX idx_user_activities_date',)),
+    'recent_weather': (RECENT_WEATHER, (), ('SCAN weather_data USING INDEX idx_weather_data_time',)),
+    'users_page': (USERS_PAGE[False, False], (0, 50), ()),
+    'users_page_by_location': (USERS_PAGE[True, False], (0, 'London', 50), ()),
+    # Full-text index lookup; FTS5 reports it as a SCAN of the virtual table
+    'users_page_search': (USERS_PAGE[False, True], (0, search_phrase('ali'), 50), ('VIRTUAL TABLE INDEX',)),
+    'user_by_id': (USER_BY_ID, (1,), ()),
+    'user_activities': (USER_ACTIVITIES, (1,), ()),
+    'user_alerts': (USER_ALERTS, (1,), ()),
+    'location_recent_weather': (LOCATION_RECENT_WEATHER, ('London',), ()),
+    'active_alert_rules': (ACTIVE_RULES_SQL, (0,), ()),
+    'history_raw': (HISTORY_SQL['raw'], ('London', '2024-01-01 00:00:00'), ()),
+    'history_hourly': (HISTORY_SQL['hourly'], ('London', '2024-01-01 00:00:00'), ()),
+    'history_daily': (HISTORY_SQL['daily'], ('London', '2024-01-01'), ()),
+}
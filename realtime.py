@@ -0,0 +1,173 @@
+"""Per-location Socket.IO rooms and push updates.
+
+Clients subscribe to the locations they display and are put in one room per
+location; weather updates, predictions and alerts are emitted to that room
+only. SubscriptionRegistry mirrors room membership so the scheduler knows
+which locations have viewers at all: locations nobody watches are neither
+serialized nor sent. LocationFeed turns successive states of a location
+into a snapshot plus sequence-numbered deltas.
+"""
+import threading
+
+MAX_SUBSCRIPTIONS = 20  # per client
+
+
+def room_for(location, encoding='json'):
+    """Room of a location's subscribers; one per payload encoding"""
+    if encoding == 'json':
+        return f'location:{location}'
+    return f'location:{location}#{encoding}'
+
+
+def clean_locations(data):
+    """Location names from a subscribe/unsubscribe payload ({location} or {locations: [...]})"""
+    if isinstance(data, str):
+        data = {'location': data}
+    data = data or {}
+    names = data.get('locations')
+    if names is None:
+        names = [data.get('location')]
+    if isinstance(names, str):
+        names = [names]
+    locations = []
+    for name in names:
+        if isinstance(name, str) and name.strip() and name.strip() not in locations:
+            locations.append(name.strip()[:100])
+    return locations
+
+
+class SubscriptionRegistry:
+    def __init__(self, max_per_client=MAX_SUBSCRIPTIONS):
+        self.max_per_client = max_per_client
+        self._by_sid = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, sid, locations):
+        """Record subscriptions; returns the locations actually added (within the per-client limit)"""
+        added = []
+        with self._lock:
+            current = self._by_sid.setdefault(sid, set())
+            for location in locations:
+                if location in current:
+                    continue
+                if len(current) >= self.max_per_client:
+                    break
+                current.add(location)
+                self._counts[location] = self._counts.get(location, 0) + 1
+                added.append(location)
+        return added
+
+    def unsubscribe(self, sid, locations):
+        removed = []
+        with self._lock:
+            current = self._by_sid.get(sid, set())
+            for location in locations:
+                if location in current:
+                    current.discard(location)
+                    self._release(location)
+                    removed.append(location)
+            if not current:
+                self._by_sid.pop(sid, None)
+        return removed
+
+    def drop(self, sid):
+        """Forget a disconnected client; returns the locations it was subscribed to"""
+        with self._lock:
+            locations = self._by_sid.pop(sid, set())
+            for location in locations:
+                self._release(location)
+        return sorted(locations)
+
+    def _release(self, location):
+        remaining = self._counts.get(location, 0) - 1
+        if remaining > 0:
+            self._counts[location] = remaining
+        else:
+            self._counts.pop(location, None)
+
+    def locations_of(self, sid):
+        with self._lock:
+            return sorted(self._by_sid.get(sid, ()))
+
+    def watched(self):
+        """Locations with at least one subscriber"""
+        with self._lock:
+            return set(self._counts)
+
+    def is_watched(self, location):
+        with self._lock:
+            return location in self._counts
+
+    def stats(self):
+        with self._lock:
+            return {
+                'clients': len(self._by_sid),
+                'locations': len(self._counts),
+                'subscriptions': sum(self._counts.values()),
+                'max_per_client': self.max_per_client,
+            }
+
+
+def diff_state(previous, current):
+    """Fields of current that differ from previous, one level into nested dicts.
+
+    Keys missing from current are reported as None.
+    """
+    changes = {}
+    for key in previous.keys() | current.keys():
+        old, new = previous.get(key), current.get(key)
+        if isinstance(old, dict) and isinstance(new, dict):
+            nested = diff_state(old, new)
+            if nested:
+                changes[key] = nested
+        elif old != new:
+            changes[key] = new
+    return changes
+
+
+class LocationFeed:
+    """Latest state pushed for every location, with a sequence number per location.
+
+    Subscribers get the full state once ('weather_snapshot') and afterwards
+    only the changed fields ('weather_delta'). Every published change bumps
+    the sequence number by one, so a client that sees a gap asks for a
+    fresh snapshot ('resync').
+    """
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+        self.snapshots = 0
+        self.updates = 0
+
+    def publish(self, location, state):
+        """Store a new state; returns (seq, changes), or None if nothing changed"""
+        with self._lock:
+            seq, previous = self._states.get(location, (0, None))
+            changes = state if previous is None else diff_state(previous, state)
+            if not changes:
+                return None
+            seq += 1
+            self._states[location] = (seq, state)
+            self.updates += 1
+            return seq, changes
+
+    def restore(self, location, seq, state):
+        """Adopt a state published by another worker, unless ours is newer"""
+        with self._lock:
+            current = self._states.get(location)
+            if current is None or current[0] <= seq:
+                self._states[location] = (seq, state)
+
+    def snapshot(self, location):
+        """(seq, state) of a location, None if nothing was published yet"""
+        with self._lock:
+            entry = self._states.get(location)
+            if entry is not None:
+                self.snapshots += 1
+            return entry
+
+    def stats(self):
+        with self._lock:
+            return {'locations': len(self._states), 'snapshots': self.snapshots, 'updates': self.updates}
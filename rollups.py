@@ -0,0 +1,175 @@
+"""Hourly and daily weather rollups and raw data retention.
+
+weather_hourly and weather_daily hold, per location and time bucket, the
+sample count and the min/max/sum of every metric. They are maintained
+incrementally: each refresh aggregates only weather_data rows above the
+watermark in rollup_state and merges them into the existing buckets, so the
+cost follows the number of new readings. Late rows (backfills) land in the
+bucket of their own recorded_at.
+
+Once rolled up, raw rows older than the retention period can be deleted;
+long-range history is then served from the rollups.
+"""
+from datetime import datetime, timedelta
+
+METRICS = ['temperature', 'humidity', 'pressure', 'wind_speed', 'precipitation']
+
+ROLLUPS = {
+    'weather_hourly': "strftime('%Y-%m-%d %H:00:00', recorded_at)",
+    'weather_daily': "date(recorded_at)",
+}
+
+# Longest span served from raw rows, then from hourly rollups; longer spans use daily rollups
+RAW_MAX_HOURS = 48
+HOURLY_MAX_HOURS = 24 * 31
+
+PRUNE_BATCH = 5000
+
+
+def rollup_table_sql(table):
+    """CREATE TABLE statement for a rollup table (used by the schema migration)"""
+    columns = ',\n'.join(f'            {metric}_min REAL, {metric}_max REAL, {metric}_sum REAL'
+                         for metric in METRICS)
+    return f'''CREATE TABLE IF NOT EXISTS {table} (
+            location TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            samples INTEGER NOT NULL,
+{columns},
+            PRIMARY KEY (location, bucket)
+        ) WITHOUT ROWID'''
+
+
+def _merge_sql(table, bucket_expr):
+    aggregates = ', '.join(f'MIN({m}), MAX({m}), SUM({m})' for m in METRICS)
+    columns = ', '.join(f'{m}_min, {m}_max, {m}_sum' for m in METRICS)
+    # min()/max() with two arguments return NULL if either is NULL, hence the coalesces
+    updates = ',\n'.join(
+        f'{m}_min = min(coalesce({m}_min, excluded.{m}_min), coalesce(excluded.{m}_min, {m}_min)), '
+        f'{m}_max = max(coalesce({m}_max, excluded.{m}_max), coalesce(excluded.{m}_max, {m}_max)), '
+        f'{m}_sum = coalesce({m}_sum, 0) + coalesce(excluded.{m}_sum, 0)'
+        for m in METRICS
+    )
+    return f'''
+        INSERT INTO {table} (location, bucket, samples, {columns})
+        SELECT location, {bucket_expr}, COUNT(*), {aggregates}
+        FROM weather_data
+        WHERE data_id > ? AND data_id <= ?
+        GROUP BY 1, 2
+        ON CONFLICT (location, bucket) DO UPDATE SET
+            samples = samples + excluded.samples,
+            {updates}
+    '''
+
+
+MERGE_SQL = {table: _merge_sql(table, bucket_expr) for table, bucket_expr in ROLLUPS.items()}
+
+
+def rollup_watermark(conn):
+    row = conn.execute("SELECT last_data_id FROM rollup_state WHERE name = 'weather_data'").fetchone()
+    return row[0] if row else 0
+
+
+def refresh_rollups(conn):
+    """Fold weather_data rows newer than the watermark into the rollups. Returns rows folded"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        low = rollup_watermark(conn)
+        high = conn.execute('SELECT MAX(data_id) FROM weather_data').fetchone()[0]
+        if high is None or high <= low:
+            conn.rollback()
+            return 0
+
+        folded = conn.execute('SELECT COUNT(*) FROM weather_data WHERE data_id > ? AND data_id <= ?',
+                              (low, high)).fetchone()[0]
+        for sql in MERGE_SQL.values():
+            conn.execute(sql, (low, high))
+        conn.execute('''
+            INSERT INTO rollup_state (name, last_data_id) VALUES ('weather_data', ?)
+            ON CONFLICT (name) DO UPDATE SET last_data_id = excluded.last_data_id
+        ''', (high,))
+        conn.commit()
+        return folded
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def prune_raw_weather(conn, retention_days, hourly_retention_days=None):
+    """Delete raw readings older than retention_days that are already rolled up.
+
+    Deletes in small batches so the write lock is never held for long.
+    Returns the number of raw rows deleted.
+    """
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).strftime('%Y-%m-%d %H:%M:%S')
+    watermark = rollup_watermark(conn)
+    deleted = 0
+    while True:
+        with conn:
+            cursor = conn.execute('''
+                DELETE FROM weather_data WHERE data_id IN (
+                    SELECT data_id FROM weather_data
+                    WHERE recorded_at < ? AND data_id <= ?
+                    LIMIT ?
+                )
+            ''', (cutoff, watermark, PRUNE_BATCH))
+        deleted += cursor.rowcount
+        if cursor.rowcount < PRUNE_BATCH:
+            break
+
+    if hourly_retention_days:
+        hourly_cutoff = (datetime.utcnow() - timedelta(days=hourly_retention_days)).strftime('%Y-%m-%d %H:00:00')
+        with conn:
+            conn.execute('DELETE FROM weather_hourly WHERE bucket < ?', (hourly_cutoff,))
+    return deleted
+
+
+def history_resolution(hours):
+    """Which table serves a history query spanning `hours`"""
+    if hours <= RAW_MAX_HOURS:
+        return 'raw'
+    if hours <= HOURLY_MAX_HOURS:
+        return 'hourly'
+    return 'daily'
+
+
+def _rollup_history_sql(table):
+    metrics = ', '.join(f'{m}_min, {m}_max, {m}_sum / samples AS {m}_mean' for m in METRICS)
+    return f'''
+        SELECT bucket, samples, {metrics}
+        FROM {table}
+        WHERE location = ? AND bucket >= ?
+        ORDER BY bucket
+    '''
+
+
+RAW_HISTORY_SQL = f'''
+    SELECT recorded_at AS bucket, 1 AS samples,
+           {', '.join(f'{m} AS {m}_min, {m} AS {m}_max, {m} AS {m}_mean' for m in METRICS)}
+    FROM weather_data
+    WHERE location = ? AND recorded_at >= ?
+    ORDER BY recorded_at
+'''
+
+HISTORY_SQL = {
+    'raw': RAW_HISTORY_SQL,
+    'hourly': _rollup_history_sql('weather_hourly'),
+    'daily': _rollup_history_sql('weather_daily'),
+}
+
+
+def weather_history(conn, location, hours):
+    """Per-bucket min/max/mean history for location over the last `hours`.
+
+    Returns (resolution, rows); short spans come from raw readings, longer
+    ones from the hourly or daily rollups.
+    """
+    resolution = history_resolution(hours)
+    since = datetime.utcnow() - timedelta(hours=hours)
+    if resolution == 'daily':
+        since_text = since.strftime('%Y-%m-%d')
+    elif resolution == 'hourly':
+        since_text = since.strftime('%Y-%m-%d %H:00:00')
+    else:
+        since_text = since.strftime('%Y-%m-%d %H:%M:%S')
+    rows = conn.execute(HISTORY_SQL[resolution], (location, since_text)).fetchall()
+    return resolution, [dict(row) for row in rows]
@@ -0,0 +1,135 @@
+"""Run several app_clean.py workers that share one database, model registry and message queue.
+
+Usage:
+    python run-production.py [--workers 4] [--port 8001] [--host 0.0.0.0]
+                             [--message-queue redis://localhost:6379/0 | --broker-port 5680]
+
+Worker i listens on --port + i. Without --message-queue the launcher starts
+the stand-in broker from cluster.py (tcp://127.0.0.1:--broker-port), which
+is enough for every worker on one host; use redis:// across hosts.
+
+The workers elect one scheduler leader through a lease in the database
+(see cluster.py): it polls OpenWeatherMap, trains and publishes models, the
+others reload them. Each worker gets WORKER_ID, PORT, DEBUG=false and
+SOCKETIO_MESSAGE_QUEUE; the rest of the environment is passed through.
+OPENWEATHER_CALLS_PER_MINUTE is the budget of all workers together: they
+draw from one token bucket in the database (poller.SharedTokenBucket).
+
+Socket.IO long-polling needs every request of a session to reach the same
+worker, so put a load balancer with sticky sessions in front, e.g. nginx:
+
+    upstream smart_weather {
+        ip_hash;
+        server 127.0.0.1:8001;
+        server 127.0.0.1:8002;
+    }
+
+Workers that exit are restarted (with backoff if they keep crashing);
+SIGINT/SIGTERM stops all of them.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(REPO, 'app_clean.py')
+sys.path.insert(0, REPO)
+
+from cluster import DEFAULT_BROKER_PORT, MessageBroker  # noqa: E402
+
+MAX_BACKOFF = 30.0
+
+
+class Worker:
+    def __init__(self, index, host, port, message_queue):
+        self.index = index
+        self.port = port
+        self.env = dict(os.environ, HOST=host, PORT=str(port), DEBUG='false',
+                        SOCKETIO_MESSAGE_QUEUE=message_queue, WORKER_ID=f'worker-{index}')
+        self.process = None
+        self.started_at = 0.0
+        self.backoff = 1.0
+        self.restart_at = None
+
+    def start(self):
+        self.process = subprocess.Popen([sys.executable, APP], cwd=REPO, env=self.env)
+        self.started_at = time.monotonic()
+        self.restart_at = None
+        print(f"🚀 worker-{self.index} (pid {self.process.pid}) on port {self.port}")
+
+    def check(self):
+        """Restart the worker if it exited; backs off while it keeps crashing"""
+        now = time.monotonic()
+        if self.restart_at is not None:
+            if now >= self.restart_at:
+                self.start()
+            return
+        status = self.process.poll()
+        if status is None:
+            return
+        # A worker that ran for a while gets restarted right away
+        self.backoff = 1.0 if now - self.started_at > 60 else min(self.backoff * 2, MAX_BACKOFF)
+        self.restart_at = now + self.backoff
+        print(f"⚠️ worker-{self.index} exited with status {status}, restarting in {self.backoff:.0f}s")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+
+    def wait(self, timeout):
+        if self.process is None:
+            return
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=8001, help='port of the first worker')
+    parser.add_argument('--message-queue', default=os.environ.get('SOCKETIO_MESSAGE_QUEUE'),
+                        help='tcp://host:port or redis:// url; default: start the stand-in broker')
+    parser.add_argument('--broker-port', type=int, default=DEFAULT_BROKER_PORT)
+    args = parser.parse_args()
+    # Keep launcher lines in order with the workers' output under a service manager
+    sys.stdout.reconfigure(line_buffering=True)
+
+    broker = None
+    message_queue = args.message_queue
+    if not message_queue:
+        broker = MessageBroker('127.0.0.1', args.broker_port).start()
+        message_queue = broker.url
+        print(f"📮 Message broker on {message_queue}")
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    workers = [Worker(i, args.host, args.port + i, message_queue) for i in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    try:
+        while not stop.wait(1.0):
+            for worker in workers:
+                worker.check()
+    finally:
+        print("🛑 Stopping workers...")
+        for worker in workers:
+            worker.stop()
+        for worker in workers:
+            worker.wait(15)
+        if broker is not None:
+            broker.stop()
+        print("✅ All workers stopped")
+
+
+if __name__ == '__main__':
+    main()
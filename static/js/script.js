@@ -2,6 +2,12 @@
 class WeatherSystem {
     constructor() {
         this.socket = io();
+        // Locations whose room this page is in; re-joined after a reconnect
+        this.subscriptions = new Set(this.getUserLocations());
+        // Last known state per location: { seq, data, prediction }
+        this.feeds = {};
+        // Field code table when payloads arrive as MessagePack (see codec.py)
+        this.fields = null;
         this.initializeSocket();
         this.initializeApp();
     }
@@ -11,6 +17,24 @@ class WeatherSystem {
         this.socket.on('connect', () => {
             this.showNotification('✅ Connected to weather service', 'success');
             this.updateConnectionStatus(true);
+            // Rooms do not survive a reconnect; join them again and start from fresh snapshots
+            this.feeds = {};
+            this.fields = null;
+            if (window.MessagePack) {
+                // Subscribe once the encoding is settled so the rooms match it
+                this.socket.emit('negotiate_encoding', { accept: ['msgpack', 'json'] });
+            } else {
+                this.socket.emit('subscribe', { locations: [...this.subscriptions] });
+            }
+        });
+
+        this.socket.on('encoding', (data) => {
+            this.fields = data.fields;
+            this.socket.emit('subscribe', { locations: [...this.subscriptions] });
+        });
+
+        this.socket.on('subscribed', (data) => {
+            console.log('Subscribed locations:', data.locations);
         });
 
         this.socket.on('disconnect', () => {
@@ -22,16 +46,31 @@ class WeatherSystem {
             console.log('Server:', data.message);
         });
 
-        // Real-time weather updates
-        this.socket.on('weather_update', (data) => {
-            this.updateWeatherDisplay(data);
-            this.checkAlerts(data);
+        // Pushed weather: a full snapshot on subscribe, then only changed fields
+        this.on('weather_snapshot', (snapshot) => {
+            this.applySnapshot(snapshot);
         });
 
-        this.socket.on('weather_response', (data) => {
+        this.on('weather_delta', (delta) => {
+            this.applyDelta(delta);
+        });
+
+        this.on('weather_response', (data) => {
             this.displayWeatherData(data);
         });
 
+        this.on('weather_batch_response', (items) => {
+            items.forEach(data => this.displayWeatherData(data));
+        });
+
+        // User alert rules triggered by the latest readings
+        this.on('alert_triggered', (alert) => {
+            const type = alert.severity === 'High' ? 'danger' : alert.severity === 'Medium' ? 'warning' : 'info';
+            // Rule text is user supplied and showNotification renders HTML
+            this.showAlert(this.escapeHtml(`${alert.alert_type} alert (${alert.location})`),
+                           this.escapeHtml(alert.message), type);
+        });
+
         // AI prediction updates
         this.socket.on('prediction_update', (data) => {
             this.updatePredictions(data);
@@ -45,11 +84,7 @@ class WeatherSystem {
         // Initialize animations
         this.initializeAnimations();
         
-        // Load initial weather data
-        this.loadInitialWeather();
-        
-        // Set up periodic updates
-        this.setupPeriodicUpdates();
+        // Weather data is pushed by the server for subscribed locations; no polling
     }
 
     startRealTimeClock() {
@@ -119,15 +154,26 @@ class WeatherSystem {
         });
     }
 
-    loadInitialWeather() {
-        // Request initial weather data for default location
-        this.socket.emit('request_weather', { location: 'London' });
-        
-        // Load user locations if available
-        const userLocations = this.getUserLocations();
-        userLocations.forEach(location => {
-            this.socket.emit('request_weather', { location: location });
+    // Register a handler for a data event; MessagePack payloads are decoded first
+    on(event, handler) {
+        this.socket.on(event, (payload) => handler(this.decode(payload)));
+    }
+
+    decode(payload) {
+        if (!(payload instanceof ArrayBuffer) || !window.MessagePack) return payload;
+        return this.expandFields(MessagePack.decode(new Uint8Array(payload)));
+    }
+
+    // Integer keys back to field names; timestamps stay epoch milliseconds
+    expandFields(value) {
+        if (Array.isArray(value)) return value.map(item => this.expandFields(item));
+        if (!value || typeof value !== 'object') return value;
+        const result = {};
+        Object.entries(value).forEach(([key, item]) => {
+            const name = this.fields && /^\d+$/.test(key) ? this.fields[Number(key)] : key;
+            result[name === undefined ? key : name] = this.expandFields(item);
         });
+        return result;
     }
 
     getUserLocations() {
@@ -135,47 +181,37 @@ class WeatherSystem {
         return ['London', 'New York', 'Tokyo'];
     }
 
-    setupPeriodicUpdates() {
-        // Refresh weather every 2 minutes
-        setInterval(() => {
-            const userLocations = this.getUserLocations();
-            userLocations.forEach(location => {
-                this.socket.emit('request_weather', { location: location });
-            });
-        }, 120000);
-
-        // Simulate data updates for demo
-        this.simulateLiveUpdates();
-    }
-
-    simulateLiveUpdates() {
-        // Simulate temperature fluctuations for demo
-        setInterval(() => {
-            this.updateDemoTemperatures();
-        }, 30000);
+    applySnapshot(snapshot) {
+        const state = { seq: snapshot.seq, data: snapshot.data, prediction: snapshot.prediction };
+        this.feeds[snapshot.location] = state;
+        this.renderLocation(snapshot.location, state);
     }
 
-    updateDemoTemperatures() {
-        const tempElements = document.querySelectorAll('.temperature');
-        tempElements.forEach(element => {
-            if (element.dataset.originalTemp === undefined) {
-                element.dataset.originalTemp = parseFloat(element.textContent);
+    applyDelta(delta) {
+        const state = this.feeds[delta.location];
+        // No snapshot yet (it is on its way) or an update we already have
+        if (!state || delta.seq <= state.seq) return;
+        if (delta.seq !== state.seq + 1) {
+            // Missed an update: ask for the full state again
+            delete this.feeds[delta.location];
+            this.socket.emit('resync', { location: delta.location });
+            return;
+        }
+        Object.entries(delta.changes).forEach(([key, value]) => {
+            if (value && typeof value === 'object' && state[key] && typeof state[key] === 'object') {
+                Object.assign(state[key], value);
+            } else {
+                state[key] = value;
             }
-            
-            const originalTemp = parseFloat(element.dataset.originalTemp);
-            const variation = (Math.random() - 0.5) * 2; // -1 to +1
-            const newTemp = (originalTemp + variation).toFixed(1);
-            
-            // Add visual feedback
-            element.classList.add('temp-updating');
-            setTimeout(() => {
-                element.textContent = newTemp + '°C';
-                element.classList.remove('temp-updating');
-                
-                // Update temperature color class
-                this.updateTemperatureColor(element, newTemp);
-            }, 300);
         });
+        state.seq = delta.seq;
+        this.renderLocation(delta.location, state);
+    }
+
+    renderLocation(location, state) {
+        const data = { location: location, data: state.data, prediction: state.prediction };
+        this.updateWeatherDisplay(data);
+        this.checkAlerts(data);
     }
 
     updateTemperatureColor(element, temperature) {
@@ -217,6 +253,21 @@ class WeatherSystem {
             conditionElement.textContent = data.data.condition;
             conditionElement.className = 'weather-condition ' + this.getWeatherClass(data.data.condition);
         }
+
+        // Details and prediction, where the card has them
+        const details = {
+            '.humidity': `${data.data.humidity}%`,
+            '.wind': `${data.data.wind_speed} km/h`,
+            '.pressure': `${data.data.pressure} hPa`,
+            '.update-time': `Last update: ${new Date(data.data.timestamp).toLocaleTimeString()}`
+        };
+        if (data.prediction) {
+            details['.prediction'] = `${data.prediction.predicted_temperature}°C`;
+        }
+        Object.entries(details).forEach(([selector, text]) => {
+            const element = card.querySelector(selector);
+            if (element) element.textContent = text;
+        });
         
         setTimeout(() => {
             card.classList.remove('weather-updating');
@@ -293,6 +344,12 @@ class WeatherSystem {
         }
     }
 
+    escapeHtml(text) {
+        const div = document.createElement('div');
+        div.textContent = text == null ? '' : String(text);
+        return div.innerHTML;
+    }
+
     showAlert(title, message, type = 'warning') {
         this.showNotification(`⚠️ ${title}: ${message}`, type);
     }
@@ -337,6 +394,22 @@ class WeatherSystem {
         }
     }
 
+    // Receive pushed updates and alerts for these locations
+    subscribe(locations) {
+        const added = [].concat(locations).filter(location => !this.subscriptions.has(location));
+        added.forEach(location => this.subscriptions.add(location));
+        if (added.length && this.socket.connected) {
+            this.socket.emit('subscribe', { locations: added });
+        }
+    }
+
+    unsubscribe(locations) {
+        const removed = [].concat(locations).filter(location => this.subscriptions.delete(location));
+        if (removed.length && this.socket.connected) {
+            this.socket.emit('unsubscribe', { locations: removed });
+        }
+    }
+
     // Method to request weather for specific location
     requestWeather(location) {
         this.socket.emit('request_weather', { location: location });
@@ -0,0 +1,77 @@
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alerts import AlertEngine, RuleSet  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+NAN = np.nan
+
+
+def rule_set(*thresholds):
+    n = len(thresholds)
+    details = np.empty(n, dtype=object)
+    details[:] = [('weather', 'high', f'rule {i}') for i in range(n)]
+    return RuleSet(np.arange(1, n + 1), np.arange(1, n + 1),
+                   np.array(thresholds, dtype=np.float64), details)
+
+
+def values(temperature=NAN, wind_speed=NAN, precipitation=NAN):
+    return np.array([temperature, wind_speed, precipitation])
+
+
+def test_rule_fires_once_until_every_metric_drops_below_hysteresis():
+    rules = rule_set([30.0, NAN, NAN])
+
+    assert list(rules.evaluate(values(29.9), now=0, cooldown=0)) == []
+    assert list(rules.evaluate(values(30.0), now=1, cooldown=0)) == [0]
+    # Hovering around the threshold (HYSTERESIS is 1.0 for temperature) does not re-fire
+    for now, temperature in enumerate([29.5, 30.5, 29.1, 31.0], start=2):
+        assert list(rules.evaluate(values(temperature), now=now, cooldown=0)) == []
+    # Re-armed only after dropping below 29.0
+    assert list(rules.evaluate(values(28.9), now=10, cooldown=0)) == []
+    assert list(rules.evaluate(values(30.0), now=11, cooldown=0)) == [0]
+
+
+def test_rule_does_not_fire_again_within_cooldown():
+    rules = rule_set([NAN, 50.0, NAN])
+
+    assert list(rules.evaluate(values(wind_speed=60.0), now=0, cooldown=900)) == [0]
+    assert list(rules.evaluate(values(wind_speed=10.0), now=100, cooldown=900)) == []
+    assert list(rules.evaluate(values(wind_speed=60.0), now=200, cooldown=900)) == []
+    assert list(rules.evaluate(values(wind_speed=10.0), now=300, cooldown=900)) == []
+    assert list(rules.evaluate(values(wind_speed=60.0), now=900, cooldown=900)) == [0]
+
+
+def test_missing_conditions_and_readings_never_trip():
+    rules = rule_set([NAN, NAN, 5.0], [30.0, 50.0, NAN])
+
+    assert list(rules.evaluate(values(temperature=40.0), now=0, cooldown=0)) == [1]
+    assert list(rules.evaluate(values(precipitation=5.0), now=1, cooldown=0)) == [0]
+
+
+def test_engine_keeps_firing_state_across_reload(tmp_path):
+    path = tmp_path / 'alerts.db'
+    conn = sqlite3.connect(path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        migrate(conn)
+    conn.execute("INSERT INTO users (username, email, location) VALUES ('ann', 'ann@example.com', 'London')")
+    conn.execute('INSERT INTO weather_alerts (user_id, alert_type, severity, message, trigger_conditions) '
+                 "VALUES (1, 'heat', 'high', 'Hot', ?)", (json.dumps({'temperature': 30}),))
+    conn.commit()
+    conn.close()
+    engine = AlertEngine(lambda: sqlite3.connect(path), cooldown=0)
+
+    fired = engine.evaluate(['London', 'Paris'], [{'temperature': 31.0}, {'temperature': 40.0}], now=0)
+    assert [(alert['alert_id'], alert['exceeded']) for alert in fired] == [(1, ['temperature'])]
+
+    engine.reload()
+    assert engine.evaluate(['London'], [{'temperature': 31.0}], now=1) == []
+    assert engine.stats()['firing'] == 1
@@ -0,0 +1,81 @@
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingestion import WriteBehindQueue  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+INSERT_SQL = 'INSERT INTO weather_data (location, temperature, recorded_at) VALUES (?, ?, ?)'
+
+
+def database(tmp_path):
+    path = tmp_path / 'ingest.db'
+    conn = sqlite3.connect(path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        migrate(conn)
+    conn.close()
+    return lambda: sqlite3.connect(path)
+
+
+def reading(location, temperature=20.0):
+    return (location, temperature, '2024-01-01 00:00:00')
+
+
+def locations(connect):
+    conn = connect()
+    try:
+        return [row[0] for row in conn.execute('SELECT location FROM weather_data ORDER BY data_id')]
+    finally:
+        conn.close()
+
+
+def test_rejected_row_does_not_block_later_rows(tmp_path):
+    connect = database(tmp_path)
+    ingest = WriteBehindQueue(connect, INSERT_SQL)
+    # location is NOT NULL, and the last row has too few values
+    ingest.put_many([reading('London'), reading(None), reading('Paris'), ('Oslo', 1.0)])
+    ingest.flush()
+    ingest.put(reading('Berlin'))
+    ingest.flush()
+
+    assert locations(connect) == ['London', 'Paris', 'Berlin']
+    assert ingest.stats()['queue_depth'] == 0
+    assert ingest.dead_lettered == 2
+    conn = connect()
+    assert conn.execute('SELECT COUNT(*) FROM ingestion_dead_letter').fetchone()[0] == 2
+    conn.close()
+
+
+def test_transient_errors_are_retried_then_dead_lettered(tmp_path):
+    connect = database(tmp_path)
+    outages = {'left': 2}
+
+    def flaky_connect():
+        if outages['left']:
+            outages['left'] -= 1
+            raise sqlite3.OperationalError('database is locked')
+        return connect()
+
+    ingest = WriteBehindQueue(flaky_connect, INSERT_SQL, max_retries=3)
+    ingest.put(reading('London'))
+    ingest.flush()
+    ingest.put(reading('Paris'))
+    ingest.flush()
+    # London failed again, so Paris stays buffered behind it
+    assert ingest.stats()['retry_batches'] == 1
+    assert ingest.stats()['queue_depth'] == 1
+    ingest.flush()
+    # The retried batch goes in first, so the order is kept
+    assert locations(connect) == ['London', 'Paris']
+    assert ingest.stats()['retry_batches'] == 0
+
+    outages['left'] = 10
+    ingest.put(reading('Oslo'))
+    for _ in range(4):
+        ingest.flush()
+    assert ingest.stats()['retry_batches'] == 0
+    assert ingest.dead_lettered == 1
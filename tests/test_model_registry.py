@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_registry import ORPHAN_GRACE_SECONDS, ModelRegistry  # noqa: E402
+
+
+def publish(registry, n):
+    return registry.publish({'trees': n}, {'scale': n}, {'n': n})
+
+
+def age(path, seconds):
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_publish_switches_current_and_prunes_old_versions(tmp_path):
+    registry = ModelRegistry(str(tmp_path), keep_versions=2)
+
+    assert registry.current_version() is None
+    assert registry.load() is None
+    versions = [publish(registry, n) for n in range(4)]
+
+    assert versions == ['v000001', 'v000002', 'v000003', 'v000004']
+    assert registry.versions() == ['v000003', 'v000004']
+    assert registry.current_version() == 'v000004'
+    model, scaler, manifest = registry.load()
+    assert (model, scaler) == ({'trees': 3}, {'scale': 3})
+    assert manifest['n'] == 3 and manifest['version'] == 'v000004'
+    assert registry.load('v000003')[0] == {'trees': 2}
+
+
+def test_old_orphans_are_removed_and_recent_ones_kept(tmp_path):
+    root = str(tmp_path)
+    crashed = os.path.join(root, '.tmp-crashed')
+    running = os.path.join(root, '.tmp-running')
+    for path in (crashed, running):
+        os.mkdir(path)
+        open(os.path.join(path, 'model.joblib'), 'w').close()
+    current_tmp = os.path.join(root, '.CURRENT.1234')
+    open(current_tmp, 'w').close()
+    age(crashed, ORPHAN_GRACE_SECONDS + 60)
+    age(current_tmp, ORPHAN_GRACE_SECONDS + 60)
+
+    registry = ModelRegistry(root)
+
+    assert not os.path.exists(crashed)
+    assert not os.path.exists(current_tmp)
+    assert os.path.isdir(running)
+
+    age(running, ORPHAN_GRACE_SECONDS + 60)
+    publish(registry, 1)
+    assert sorted(os.listdir(root)) == ['CURRENT', 'v000001']
@@ -0,0 +1,96 @@
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import migrate  # noqa: E402
+from poller import SharedTokenBucket, TokenBucket  # noqa: E402
+from weather_cache import WeatherCache  # noqa: E402
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def database(tmp_path):
+    path = tmp_path / 'budget.db'
+    conn = sqlite3.connect(path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        migrate(conn)
+    conn.close()
+    return lambda: sqlite3.connect(path)
+
+
+def test_bucket_grants_what_it_has_and_refills_with_time():
+    clock = Clock()
+    bucket = TokenBucket(60, clock=clock)
+
+    assert bucket.try_consume(50) == 50
+    assert bucket.try_consume(20) == 10
+    assert bucket.try_consume(1) == 0
+    assert bucket.available() == 0
+
+    clock.now += 5
+    assert bucket.available() == 5
+    assert bucket.try_consume(3) == 3
+    # Never refills beyond one minute of burst
+    clock.now += 3600
+    assert bucket.available() == 60
+    assert (bucket.consumed, bucket.refused) == (63, 11)
+
+
+def test_shared_bucket_is_one_quota_across_instances(tmp_path):
+    connect = database(tmp_path)
+    clock = Clock()
+    first = SharedTokenBucket(connect, 60, clock=clock)
+    second = SharedTokenBucket(connect, 60, clock=clock)
+
+    assert first.try_consume(40) == 40
+    assert second.try_consume(40) == 20
+    assert first.available() == second.available() == 0
+
+    clock.now += 10
+    assert second.try_consume(15) == 10
+    assert (second.consumed, second.refused) == (30, 25)
+
+
+def test_shared_bucket_grants_nothing_without_a_database():
+    def connect():
+        raise sqlite3.OperationalError('unable to open database file')
+
+    bucket = SharedTokenBucket(connect, 60)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert bucket.try_consume(5) == 0
+        assert bucket.available() == 0
+    assert bucket.refused == 5
+
+
+def test_cache_does_not_fetch_beyond_the_budget():
+    class Client:
+        def __init__(self):
+            self.calls = []
+
+        def fetch_many(self, locations):
+            self.calls.append(list(locations))
+            return [{'location': location, 'temperature': 10.0} for location in locations]
+
+    client = Client()
+    clock = Clock()
+    cache = WeatherCache(client, ttl=60, budget=TokenBucket(60, capacity=2, clock=clock),
+                         last_known=lambda location: {'location': location, 'temperature': 8.0})
+
+    readings = cache.get_many(['London', 'Paris', 'Oslo'])
+
+    assert client.calls == [['London', 'Paris']]
+    assert [reading.get('stale') for reading in readings] == [None, None, True]
+    assert cache.stats()['over_budget'] == 1
+    # The refused location was not cached and is fetched once the budget refills
+    clock.now += 1
+    assert cache.get('Oslo') == {'location': 'Oslo', 'temperature': 10.0}
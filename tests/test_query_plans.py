@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import counters  # noqa: E402
+import queries  # noqa: E402
+from migrations import check_query_plans, migrate, plan_problems  # noqa: E402
+
+
+def migrated(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'plans.db')
+    migrate(conn)
+    return conn
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    conn = migrated(tmp_path)
+    assert check_query_plans(conn) == {}
+
+
+def test_full_index_scan_is_a_problem():
+    plan = ['SCAN users USING COVERING INDEX idx_users_location']
+    assert plan_problems(plan) == plan
+    assert plan_problems(plan, allowed=('SCAN users USING COVERING INDEX',)) == []
+    assert plan_problems(['SEARCH users USING INTEGER PRIMARY KEY (rowid=?)']) == []
+
+
+def test_user_locations_follow_user_changes(tmp_path):
+    conn = migrated(tmp_path)
+    add = 'INSERT INTO users (username, email, location) VALUES (?, ?, ?)'
+    conn.execute(add, ('a', 'a@example.com', 'London'))
+    conn.execute(add, ('b', 'b@example.com', 'London'))
+    conn.execute(add, ('c', 'c@example.com', 'Paris'))
+    conn.execute("UPDATE users SET location = 'Oslo' WHERE username = 'c'")
+    conn.execute("DELETE FROM users WHERE username = 'a'")
+    conn.commit()
+
+    assert sorted(row[0] for row in conn.execute(queries.USER_LOCATIONS)) == ['London', 'Oslo']
+    assert counters.check(conn)['locations'] == {}
+
+
+def test_user_search_matches_substrings(tmp_path):
+    conn = migrated(tmp_path)
+    add = 'INSERT INTO users (username, email, location) VALUES (?, ?, ?)'
+    conn.execute(add, ('alice', 'alice@example.com', 'London'))
+    conn.execute(add, ('Malik', 'malik@example.org', 'Paris'))
+    conn.execute(add, ('carol', 'c@example.com', 'London'))
+    conn.execute("UPDATE users SET username = 'roberta' WHERE username = 'carol'")
+    conn.execute("DELETE FROM users WHERE username = 'alice'")
+    conn.commit()
+
+    def search(term, location=None):
+        sql = queries.USERS_PAGE[location is not None, True]
+        params = [0] + ([location] if location else []) + [queries.search_phrase(term), 50]
+        return [row[1] for row in conn.execute(sql, params)]
+
+    assert search('LIK') == ['Malik']
+    assert search('ali') == ['Malik']
+    assert search('berta') == ['roberta']
+    assert search('carol') == []
+    assert search('example', location='London') == ['roberta']
+    assert search('"x') == []
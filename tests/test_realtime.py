@@ -0,0 +1,43 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from realtime import LocationFeed, diff_state  # noqa: E402
+
+
+def weather(temperature, humidity=60, prediction=None):
+    return {'location': 'London', 'weather': {'temperature': temperature, 'humidity': humidity},
+            'prediction': prediction}
+
+
+def test_first_publish_is_full_state_then_only_changes():
+    feed = LocationFeed()
+
+    assert feed.snapshot('London') is None
+    assert feed.publish('London', weather(12.0)) == (1, weather(12.0))
+    assert feed.publish('London', weather(12.0)) is None
+    assert feed.publish('London', weather(13.0)) == (2, {'weather': {'temperature': 13.0}})
+    assert feed.publish('London', weather(13.0, prediction=14.5)) == (3, {'prediction': 14.5})
+
+    assert feed.snapshot('London') == (3, weather(13.0, prediction=14.5))
+    assert feed.publish('Paris', weather(20.0))[0] == 1
+    assert feed.stats() == {'locations': 2, 'snapshots': 1, 'updates': 4}
+
+
+def test_removed_fields_are_reported_as_none():
+    assert diff_state({'a': 1, 'b': {'c': 2, 'd': 3}}, {'b': {'c': 2}}) == {'a': None, 'b': {'d': None}}
+
+
+def test_restore_keeps_the_newer_state():
+    feed = LocationFeed()
+    feed.publish('London', weather(12.0))
+    feed.publish('London', weather(13.0))
+
+    feed.restore('London', 1, weather(10.0))
+    assert feed.snapshot('London') == (2, weather(13.0))
+
+    feed.restore('London', 5, weather(15.0))
+    assert feed.snapshot('London') == (5, weather(15.0))
+    # Numbering continues from the restored sequence
+    assert feed.publish('London', weather(16.0)) == (6, {'weather': {'temperature': 16.0}})
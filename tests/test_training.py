@@ -0,0 +1,81 @@
+import copy
+import os
+import sys
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from training import TrainingExecutor, fit_full, fit_increment, merge_trees  # noqa: E402
+
+N_ESTIMATORS = 50
+INCREMENTAL_TREES = 5
+MAX_TREES = 100
+MAX_DEPTH = 10
+
+
+def readings(rng, rows):
+    X = rng.normal(size=(rows, 6))
+    y = 3 * X[:, 0] - 2 * X[:, 1] * X[:, 2] + np.sin(X[:, 3]) + rng.normal(scale=0.3, size=rows)
+    return X, y
+
+
+def test_merge_trees_keeps_pinned_trees():
+    forest = merge_trees(['f1', 'f2', 'i1', 'i2'], ['i3', 'i4'], pinned=2, max_trees=5)
+    assert forest == ['f1', 'f2', 'i2', 'i3', 'i4']
+    assert merge_trees(['f1', 'f2'], ['i1'], pinned=2, max_trees=5) == ['f1', 'f2', 'i1']
+
+
+def test_increments_keep_holdout_score():
+    rng = np.random.default_rng(0)
+    X, y = readings(rng, 2000)
+    X_holdout, y_holdout = readings(rng, 1000)
+    model, scaler, _ = fit_full(X, y, N_ESTIMATORS, MAX_DEPTH)
+    full_trees = list(model.estimators_)
+    full_score = model.score(scaler.transform(X_holdout), y_holdout)
+
+    # A month of hourly runs on small batches, enough to rotate the forest several times
+    for run in range(40):
+        X_new, y_new = readings(rng, 15)
+        increment = fit_increment(scaler.transform(X_new), y_new, INCREMENTAL_TREES, MAX_DEPTH, run)
+        grown = copy.copy(model)
+        grown.estimators_ = merge_trees(model.estimators_, increment.estimators_, N_ESTIMATORS, MAX_TREES)
+        grown.n_estimators = len(grown.estimators_)
+        model = grown
+
+    assert len(model.estimators_) == MAX_TREES
+    assert model.estimators_[:N_ESTIMATORS] == full_trees
+    assert model.score(scaler.transform(X_holdout), y_holdout) >= full_score - 0.1
+
+
+def exit_once(marker):
+    """Kill the worker process the first time, like an OOM kill"""
+    if not os.path.exists(marker):
+        open(marker, 'w').close()
+        os._exit(1)
+    return os.getpid()
+
+
+def exit_always():
+    os._exit(1)
+
+
+def run_job(executor, fn, *args):
+    future, _ = executor.submit('test', lambda job: job.run_in_pool(fn, *args))
+    return future.result(timeout=120)
+
+
+def test_dead_worker_is_replaced(tmp_path):
+    executor = TrainingExecutor()
+    try:
+        # The first worker dies; the call is retried in a new pool
+        assert run_job(executor, exit_once, str(tmp_path / 'marker')) != os.getpid()
+
+        # A worker that keeps dying fails that job only
+        with pytest.raises(BrokenProcessPool):
+            run_job(executor, exit_always)
+        assert run_job(executor, exit_once, str(tmp_path / 'marker')) != os.getpid()
+    finally:
+        executor.shutdown()
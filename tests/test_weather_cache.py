@@ -0,0 +1,143 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_cache import WeatherCache  # noqa: E402
+
+
+class FakeClient:
+    """fetch_many() answering from a dict; missing locations fail (None)"""
+
+    def __init__(self, readings):
+        self.readings = readings
+        self.calls = []
+
+    def fetch_many(self, locations):
+        self.calls.append(list(locations))
+        return [self.readings.get(location) for location in locations]
+
+
+class BlockingClient(FakeClient):
+    """FakeClient whose fetch_many() waits until release is set"""
+
+    def __init__(self, readings):
+        super().__init__(readings)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def fetch_many(self, locations):
+        self.started.set()
+        assert self.release.wait(5)
+        return super().fetch_many(locations)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def reading(location, temperature):
+    return {'location': location, 'temperature': temperature}
+
+
+def test_readings_are_reused_until_ttl_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('weather_cache.time.monotonic', lambda: now[0])
+    client = FakeClient({'London': reading('London', 12.0)})
+    cache = WeatherCache(client, ttl=60)
+
+    assert cache.get('London') == reading('London', 12.0)
+    now[0] += 59
+    assert cache.get('London') == reading('London', 12.0)
+    assert client.calls == [['London']]
+
+    now[0] += 2
+    client.readings['London'] = reading('London', 14.0)
+    assert cache.get('London') == reading('London', 14.0)
+    assert client.calls == [['London'], ['London']]
+    assert cache.get_many(['London'], refresh=True) == [reading('London', 14.0)]
+    assert len(client.calls) == 3
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 3
+
+
+def test_concurrent_misses_share_one_fetch():
+    client = BlockingClient({'London': reading('London', 12.0)})
+    cache = WeatherCache(client, ttl=60)
+    results = []
+
+    def get():
+        results.append(cache.get('London'))
+
+    owner = threading.Thread(target=get)
+    owner.start()
+    assert client.started.wait(5)
+    waiters = [threading.Thread(target=get) for _ in range(5)]
+    for thread in waiters:
+        thread.start()
+    wait_for(lambda: cache.stats()['coalesced'] == 5)
+    client.release.set()
+    for thread in [owner] + waiters:
+        thread.join(5)
+
+    assert results == [reading('London', 12.0)] * 6
+    assert client.calls == [['London']]
+    stats = cache.stats()
+    assert (stats['misses'], stats['coalesced'], stats['in_flight']) == (1, 5, 0)
+
+
+def test_waiters_are_released_when_the_fetch_raises():
+    class FailingClient(BlockingClient):
+        def fetch_many(self, locations):
+            super().fetch_many(locations)
+            raise RuntimeError('upstream down')
+
+    client = FailingClient({})
+    cache = WeatherCache(client, ttl=60)
+    errors = []
+    results = []
+
+    def owner():
+        try:
+            cache.get('London')
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=owner)
+    thread.start()
+    assert client.started.wait(5)
+    waiter = threading.Thread(target=lambda: results.append(cache.get('London')))
+    waiter.start()
+    wait_for(lambda: cache.stats()['coalesced'] == 1)
+    client.release.set()
+    thread.join(5)
+    waiter.join(5)
+
+    assert len(errors) == 1 and results == [None]
+    assert cache.stats()['in_flight'] == 0
+    with pytest.raises(RuntimeError):
+        cache.get('London')
+
+
+def test_failed_fetch_is_not_cached_or_served_as_fresh():
+    client = FakeClient({})
+    cache = WeatherCache(client, ttl=60, last_known=lambda location: reading(location, 12.0))
+
+    assert cache.get('London') == dict(reading('London', 12.0), stale=True)
+    assert cache.stats()['upstream_errors'] == 1
+
+    # Nothing was cached, so the next call goes upstream again
+    client.readings['London'] = reading('London', 15.0)
+    assert cache.get('London') == reading('London', 15.0)
+    assert client.calls == [['London'], ['London']]
+
+
+def test_failed_fetch_without_history_is_none():
+    cache = WeatherCache(FakeClient({}), ttl=60)
+    assert cache.get_many(['London', 'Paris'], refresh=True) == [None, None]
@@ -0,0 +1,195 @@
+"""Off-thread training for WeatherAI.
+
+Training jobs run one at a time on a dedicated dispatcher thread. The CPU
+heavy forest fitting is shipped to a process pool so it never holds the
+server's GIL; the dispatcher only loads data, waits for the fit and swaps the
+result into the live model. Requests for a job that is already queued or
+running join that job instead of starting another one.
+
+scikit-learn is imported inside the fit functions, not at module import, so
+importing the app does not pay for it (about 1.5 s).
+
+A spawned process re-runs the parent's __main__ script before it takes work.
+For the server that is all of app_clean.py (imports, connection pool,
+scheduler, atexit hooks), so the pool's processes are started with this
+module standing in as __main__; the fit functions are all they need.
+"""
+import contextlib
+import multiprocessing
+import queue
+import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+def fit_full(X, y, n_estimators, max_depth):
+    """Fit scaler and forest from scratch. Returns (model, scaler, test R² score)"""
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X_scaled, y, test_size=0.2, random_state=42
+    )
+
+    model = RandomForestRegressor(n_estimators=n_estimators, random_state=42, max_depth=max_depth)
+    model.fit(X_train, y_train)
+    return model, scaler, model.score(X_test, y_test)
+
+
+def fit_increment(X_scaled, y, n_estimators, max_depth, random_state):
+    """Fit a small forest on already-scaled new readings; its trees get merged by the caller"""
+    from sklearn.ensemble import RandomForestRegressor
+
+    model = RandomForestRegressor(n_estimators=n_estimators, random_state=random_state,
+                                  max_depth=max_depth)
+    model.fit(X_scaled, y)
+    return model
+
+
+def merge_trees(estimators, new_trees, pinned, max_trees):
+    """Forest after an increment: the first `pinned` trees (the last full fit)
+    always stay; the incremental trees after them rotate oldest-first so the
+    forest keeps at most `max_trees` trees."""
+    room = max(max_trees - pinned, 0)
+    incremental = list(estimators[pinned:]) + list(new_trees)
+    if len(incremental) > room:
+        incremental = incremental[len(incremental) - room:]
+    return list(estimators[:pinned]) + incremental
+
+
+@contextlib.contextmanager
+def _workers_main():
+    """Make this module the __main__ that newly spawned workers re-run"""
+    main = sys.modules['__main__']
+    sys.modules['__main__'] = sys.modules[__name__]
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = main
+
+
+def run_inline(fn, *args):
+    """Runner used when training synchronously on the calling thread"""
+    return fn(*args)
+
+
+class TrainingJob:
+    """Handle passed to a job function while it runs on the dispatcher thread"""
+
+    def __init__(self, executor, key):
+        self.executor = executor
+        self.key = key
+
+    def progress(self, stage, **info):
+        """Report a progress stage (loading, fitting, complete, ...)"""
+        if self.executor.on_progress:
+            try:
+                self.executor.on_progress(self.key, stage, info)
+            except Exception as e:
+                print(f"Training progress callback error: {e}")
+
+    def run_in_pool(self, fn, *args):
+        """Run fn(*args) in the worker process and wait for its result.
+
+        A worker that dies (OOM kill, crash in native code) breaks the whole
+        pool; it is replaced and the call retried once in a fresh one.
+        """
+        for attempt in range(2):
+            pool = self.executor.pool()
+            try:
+                # submit() starts the worker processes on demand; only the dispatcher
+                # thread submits, so the __main__ swap is confined to that call
+                with _workers_main():
+                    future = pool.submit(fn, *args)
+                return future.result()
+            except BrokenProcessPool:
+                self.executor.discard_pool(pool)
+                if attempt:
+                    raise
+                print("⚠️ Training worker process died, retrying in a new one")
+
+
+class TrainingExecutor:
+    """Serial training job queue backed by a process pool"""
+
+    def __init__(self, max_workers=1, on_progress=None):
+        self.max_workers = max_workers
+        self.on_progress = on_progress
+        self._queue = queue.Queue()
+        self._jobs = {}  # key -> Future of the queued or running job
+        self._lock = threading.Lock()
+        self._pool = None
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch, name='training-dispatcher',
+                                                daemon=True)
+                self._thread.start()
+
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn rather than fork: the server process is multi-threaded
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def discard_pool(self, pool):
+        """Drop a broken pool so the next pool() call starts a new one"""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, key, job, *args):
+        """Queue job(TrainingJob, *args) under key.
+
+        Returns (future, created); created is False when a job with the same
+        key was already queued or running and the caller joined it.
+        """
+        self.start()
+        with self._lock:
+            if key in self._jobs:
+                return self._jobs[key], False
+            future = Future()
+            self._jobs[key] = future
+        self._queue.put((key, job, args, future))
+        return future, True
+
+    def is_busy(self, key=None):
+        with self._lock:
+            return bool(self._jobs) if key is None else key in self._jobs
+
+    def _dispatch(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            key, job, args, future = item
+            if not future.set_running_or_notify_cancel():
+                self._forget(key)
+                continue
+            try:
+                future.set_result(job(TrainingJob(self, key), *args))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                self._forget(key)
+
+    def _forget(self, key):
+        with self._lock:
+            self._jobs.pop(key, None)
+
+    def shutdown(self):
+        """Stop the dispatcher after queued jobs finish and stop the worker processes"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=30)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,142 @@
+"""Shared per-location cache in front of the weather client.
+
+Readings are reused for `ttl` seconds. Concurrent misses for the same
+location collapse into a single in-flight upstream request (single-flight):
+the first caller fetches, everyone else waits for its result.
+Every upstream fetch is charged to the optional call budget (poller.TokenBucket).
+Misses the budget does not cover are not fetched, and fetches that fail
+(the client returns None) are not cached: both get the expired cached
+reading, else `last_known(location)` (the last stored reading), marked with
+'stale': True, or None when there is neither.
+"""
+import threading
+import time
+
+
+class _Flight:
+    """An upstream fetch in progress that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.reading = None
+
+
+class WeatherCache:
+    def __init__(self, client, ttl=60, max_entries=10000, budget=None, last_known=None):
+        self.client = client
+        self.budget = budget
+        self.last_known = last_known
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}  # location -> (expires_at, reading)
+        self._flights = {}  # location -> _Flight
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.over_budget = 0
+        self.upstream_errors = 0
+
+    def get(self, location):
+        """Cached reading for location, fetching it on a miss"""
+        return self.get_many([location])[0]
+
+    def get_many(self, locations, refresh=False):
+        """Readings for many locations in order; misses are fetched concurrently.
+
+        With refresh=True cached entries are ignored (but in-flight fetches
+        are still shared), which is what the scheduler wants every cycle.
+        """
+        now = time.monotonic()
+        results = {}
+        owned = {}    # fetched by this call
+        waiting = {}  # fetched by another caller
+        with self._lock:
+            for location in dict.fromkeys(locations):
+                entry = self._entries.get(location)
+                if not refresh and entry and entry[0] > now:
+                    self.hits += 1
+                    results[location] = entry[1]
+                elif location in self._flights:
+                    self.coalesced += 1
+                    waiting[location] = self._flights[location]
+                else:
+                    self.misses += 1
+                    owned[location] = self._flights[location] = _Flight()
+
+        if owned:
+            names = list(owned)
+            granted = len(names) if self.budget is None else self.budget.try_consume(len(names))
+            readings = [None] * len(names)
+            try:
+                if granted:
+                    readings[:granted] = self.client.fetch_many(names[:granted])
+                failed = [i for i, reading in enumerate(readings[:granted]) if reading is None]
+                for i in failed:
+                    readings[i] = self._stale(names[i])
+                readings[granted:] = [self._stale(location) for location in names[granted:]]
+                with self._lock:
+                    self.upstream_errors += len(failed)
+                    self.over_budget += len(names) - granted
+            finally:
+                # Always release waiters, even if the fetch raised
+                self._complete(owned, readings)
+            for location, reading in zip(owned, readings):
+                results[location] = reading
+
+        for location, flight in waiting.items():
+            flight.done.wait()
+            results[location] = flight.reading
+
+        return [results[location] for location in locations]
+
+    def put(self, location, reading):
+        """Store a reading obtained elsewhere"""
+        with self._lock:
+            self._store(location, reading, time.monotonic())
+
+    def _stale(self, location):
+        """Reading for a miss that was not fetched, without an upstream call"""
+        with self._lock:
+            entry = self._entries.get(location)
+        reading = entry[1] if entry else None
+        if reading is None and self.last_known is not None:
+            reading = self.last_known(location)
+        return None if reading is None else dict(reading, stale=True)
+
+    def _complete(self, owned, readings):
+        now = time.monotonic()
+        with self._lock:
+            for (location, flight), reading in zip(owned.items(), readings):
+                # Only fresh upstream readings are cached; stale ones keep their old entry
+                if reading is not None and not reading.get('stale'):
+                    self._store(location, reading, now)
+                flight.reading = reading
+                del self._flights[location]
+                flight.done.set()
+
+    def _store(self, location, reading, now):
+        self._entries.pop(location, None)
+        self._entries[location] = (now + self.ttl, reading)
+        if len(self._entries) > self.max_entries:
+            expired = [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]
+            for key in expired:
+                del self._entries[key]
+            # Still full: drop the least recently stored entries
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'ttl_seconds': self.ttl,
+                'entries': len(self._entries),
+                'in_flight': len(self._flights),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'over_budget': self.over_budget,
+                'upstream_errors': self.upstream_errors,
+                'hit_ratio': round((self.hits + self.coalesced) / lookups, 3) if lookups else None,
+            }
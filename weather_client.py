@@ -0,0 +1,122 @@
+"""OpenWeatherMap client with a pooled session and concurrent fetching.
+
+All requests share one requests.Session, so TLS connections to the API are
+kept alive and reused. fetch_many() fans out over a bounded thread pool and
+gives the whole batch a deadline; a slow upstream response only costs the
+location it belongs to. A location whose request fails or misses the
+deadline gets None, never a made-up reading: callers (weather_cache) decide
+what to serve instead. Simulated readings are only returned in demo mode.
+"""
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def demo_reading(location):
+    """Simulated reading used when no API key is configured"""
+    temp_variation = (hash(location) % 20) - 5  # Random temp between 15-25
+    return {
+        'temperature': 20 + temp_variation,
+        'humidity': 60 + (hash(location) % 30),
+        'pressure': 1010 + (hash(location) % 20),
+        'wind_speed': 5 + (hash(location) % 15),
+        'condition': ['Sunny', 'Cloudy', 'Rainy'][hash(location) % 3],
+        'location': location,
+        'timestamp': datetime.now().isoformat()
+    }
+
+
+def parse_response(location, data):
+    """Convert an OpenWeatherMap /data/2.5/weather payload into a reading"""
+    return {
+        'temperature': data['main']['temp'],
+        'humidity': data['main']['humidity'],
+        'pressure': data['main']['pressure'],
+        'wind_speed': data['wind']['speed'],
+        'condition': data['weather'][0]['main'],
+        'location': location,
+        'timestamp': datetime.now().isoformat()
+    }
+
+
+class WeatherClient:
+    def __init__(self, api_key, url, max_concurrency=16, connect_timeout=3.05,
+                 read_timeout=10, deadline=15):
+        self.api_key = api_key
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.timeout = (connect_timeout, read_timeout)
+        self.deadline = deadline
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_concurrency, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def demo_mode(self):
+        return self.api_key == 'demo_key'
+
+    def fetch(self, location):
+        """Fetch one location; None on any error"""
+        try:
+            if self.demo_mode:
+                # Return demo data if no API key
+                return demo_reading(location)
+
+            params = {
+                'q': location,
+                'appid': self.api_key,
+                'units': 'metric'
+            }
+
+            response = self.session.get(self.url, params=params, timeout=self.timeout)
+            if response.status_code == 200:
+                return parse_response(location, response.json())
+            print(f"Weather API error for {location}: HTTP {response.status_code}")
+        except Exception as e:
+            print(f"Weather API error for {location}: {e}")
+
+        return None
+
+    def fetch_many(self, locations, deadline=None):
+        """Fetch many locations in parallel. Returns readings in the order of locations.
+
+        Locations that failed or have not answered when the deadline expires
+        get None; late requests are left to finish in the background.
+        """
+        if self.demo_mode or len(locations) <= 1:
+            return [self.fetch(location) for location in locations]
+
+        futures = [self._get_executor().submit(self.fetch, location) for location in locations]
+        done, not_done = wait(futures, timeout=deadline or self.deadline)
+
+        readings = []
+        for location, future in zip(locations, futures):
+            if future in done:
+                readings.append(future.result())
+            else:
+                future.cancel()
+                readings.append(None)
+
+        if not_done:
+            print(f"Weather API deadline exceeded for {len(not_done)} of {len(locations)} locations")
+        return readings
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                    thread_name_prefix='weather-fetch')
+            return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()